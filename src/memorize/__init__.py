@@ -9,6 +9,7 @@ foreign language words.
 import sys
 import argparse
 
+from memorize import commands
 from memorize.config import ConfigManager
 
 def main(argv=sys.argv[1:]):
@@ -19,18 +20,19 @@ def main(argv=sys.argv[1:]):
     parser.add_argument(
             u'-c', u'--config', metavar=u'CONFIG_FILE', type=file,
             dest=u'config_file', help=u'Location of config file.')
+    commands.add_parsers(parser.add_subparsers(title=u'commands'))
 
-    args = parser.parse_args(argv)
+    args = commands.parse_arguments(parser, argv)
 
     if args.config_file is None:
         config = {}
     else:
         exec(args.config_file)
         args.config_file.close()
+    # Database is opened by the first command, which needs it.
     config = ConfigManager(config)
-
-    config.connect()
+    return commands.execute(config, args)
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
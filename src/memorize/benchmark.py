@@ -0,0 +1,385 @@
+#!/usr/bin/python
+
+
+""" Benchmarks of :py:class:`TagTree <memorize.tag_tree.TagTree>`
+operations on synthetic decks.
+
+A deck is generated from settings (see :py:data:`DEFAULT_SETTINGS`):
+a tag hierarchy of ``depth`` levels, in which each node has ``fanout``
+children, and ``objects`` objects, each tagged by ``tags_per_object``
+random leaf tags. The same ``seed`` gives the same deck and the same
+queries. Each operation is timed separately (commits of changing
+operations as ``<operation>_commit``) and results contain latency
+percentiles, number of objects loaded from storage and peak memory of
+process:
+
+>>> results = run({'objects': 20, 'depth': 2, 'fanout': 2, 'queries': 5})
+>>> results['benchmarks']['assign']['count']
+20
+>>> sorted(results['benchmarks']['get_objects_tag'])
+['bytes', 'count', 'loads', 'max', 'max_rss_kb', 'mean', 'p50', 'p90', \
+'p99', 'total']
+
+Results are stored as JSON and can be compared with results of
+previous run to find regressions::
+
+    python -m memorize.benchmark --objects 100000 --backend file \\
+        --output current.json --compare baseline.json
+
+"""
+
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import resource
+import tempfile
+import platform
+
+import transaction
+from ZODB.DB import DB
+
+from memorize import db
+from memorize.instrumentation import Stats, InstrumentedStorage
+from memorize.tag_tree import TagTree, TaggedObject, Tag, TagList
+
+
+DEFAULT_SETTINGS = {
+    'objects': 10000,               # Number of objects in deck.
+    'depth': 3,                     # Levels of tag hierarchy.
+    'fanout': 5,                    # Children of each tag node.
+    'tags_per_object': 3,           # Leaf tags of each object.
+    'queries': 200,                 # Number of timed queries of each kind.
+    'deletions': 10,                # Number of deleted leaf tags.
+    'chunk_size': 1000,             # Objects per committed transaction.
+    'backend': 'memory',            # Storage: memory or file.
+    'seed': 0,
+    }
+
+PERCENTILES = (50, 90, 99)
+DEFAULT_THRESHOLD = 0.2             # Allowed slowdown in comparison.
+
+
+class BenchmarkObject(TaggedObject):
+    """ Object of synthetic deck.
+    """
+
+    def __init__(self, value):
+        super(BenchmarkObject, self).__init__()
+        self.value = value
+
+
+def generate_tags(depth, fanout):
+    """ Returns list of all tags of hierarchy with ``depth`` levels, in
+    which each node has ``fanout`` children. Parents precede children.
+    """
+
+    tags = []
+    level = [()]
+    for i in range(depth):
+        level = [
+                levels + (u'n{0}'.format(j),)
+                for levels in level
+                for j in range(fanout)]
+        tags.extend([Tag(levels) for levels in level])
+    return tags
+
+
+def percentile(values, percent):
+    """ Returns ``percent`` percentile of sorted ``values`` (nearest
+    rank method).
+    """
+
+    if not values:
+        return None
+    rank = int(math.ceil(percent / 100.0 * len(values))) - 1
+    return values[min(max(rank, 0), len(values) - 1)]
+
+
+def summarize(durations):
+    """ Returns dict with statistics of durations (in seconds).
+    """
+
+    durations = sorted(durations)
+    summary = {
+            'count': len(durations),
+            'total': sum(durations),
+            'mean': sum(durations) / len(durations) if durations else None,
+            'max': durations[-1] if durations else None,
+            }
+    for percent in PERCENTILES:
+        summary['p{0}'.format(percent)] = percentile(durations, percent)
+    return summary
+
+
+def max_rss():
+    """ Returns peak resident memory of process in kilobytes.
+    """
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Benchmark(object):
+    """ Runs benchmarks with given settings.
+    """
+
+    def __init__(self, settings):
+        self.settings = DEFAULT_SETTINGS.copy()
+        self.settings.update(settings)
+        self.random = random.Random(self.settings['seed'])
+        self.stats = Stats()
+        self.results = {}
+
+    def measure(self, name, calls, commit_size=None):
+        """ Times each call of ``calls`` (iterable of callables) and
+        stores summary under ``name``.
+
+        :param commit_size:
+            If given, transaction is committed after each
+            ``commit_size`` calls and after the last one. Commits are
+            timed too and their summary is stored under ``name`` with
+            ``_commit`` suffix.
+        """
+
+        stats = self.stats
+        durations = []
+        commit_durations = []
+        loads = [0, 0]                  # Loads by calls and by commits.
+        size = [0, 0]                   # Bytes loaded by them.
+
+        def timed(function, durations, kind):
+            start_loads = stats.loads
+            start_size = stats.bytes
+            start = time.time()
+            function()
+            durations.append(time.time() - start)
+            loads[kind] += stats.loads - start_loads
+            size[kind] += stats.bytes - start_size
+
+        for i, call in enumerate(calls):
+            timed(call, durations, 0)
+            if commit_size and (i + 1) % commit_size == 0:
+                timed(transaction.commit, commit_durations, 1)
+        if commit_size:
+            timed(transaction.commit, commit_durations, 1)
+            self.store(
+                    name + '_commit', commit_durations, loads[1], size[1])
+        self.store(name, durations, loads[0], size[0])
+
+    def store(self, name, durations, loads, size):
+        """ Stores summary of ``durations`` under ``name`` together with
+        number of ``loads`` and loaded bytes (``size``).
+        """
+
+        summary = summarize(durations)
+        summary['loads'] = loads
+        summary['bytes'] = size
+        summary['max_rss_kb'] = max_rss()
+        self.results[name] = summary
+
+    def open_database(self, directory):
+        """ Returns database with instrumented storage.
+        """
+
+        storage = db.create_storage({
+            'storage': self.settings['backend'],
+            'database_path': os.path.join(directory, 'data.fs'),
+            })
+        return DB(InstrumentedStorage(storage, self.stats))
+
+    def run(self):
+        """ Runs all benchmarks and returns results.
+        """
+
+        directory = tempfile.mkdtemp()
+        database = self.open_database(directory)
+        try:
+            connection = database.open()
+            tree = connection.root()['tree'] = TagTree()
+            self.run_deck(connection, tree)
+            transaction.abort()
+            connection.close()
+        finally:
+            database.close()
+            shutil.rmtree(directory)
+        return {
+                'settings': self.settings,
+                'python': platform.python_version(),
+                'timestamp': time.time(),
+                'benchmarks': self.results,
+                }
+
+    def run_deck(self, connection, tree):
+        """ Generates deck in ``tree`` and runs benchmarks on it.
+        """
+
+        settings = self.settings
+        rand = self.random
+        tags = generate_tags(settings['depth'], settings['fanout'])
+        leaves = [tag for tag in tags if len(tag) == settings['depth']]
+        for tag in leaves:
+            tree.create_tag(tag)
+        transaction.commit()
+
+        # Calls are generated lazily, so neither objects, nor calls are
+        # kept in memory, which is measured.
+        chunk_size = settings['chunk_size']
+        self.measure('assign', (
+            lambda obj=BenchmarkObject(u'word{0}'.format(i)):
+            tree.assign(obj)
+            for i in xrange(settings['objects'])), chunk_size)
+
+        tags_per_object = min(settings['tags_per_object'], len(leaves))
+        self.measure('add_tag', (
+            lambda obj=tree.get_object(object_id), tag=tag: obj.add_tag(tag)
+            for object_id in tree.get_all_object_ids()
+            for tag in rand.sample(leaves, tags_per_object)), chunk_size)
+        connection.cacheMinimize()
+
+        queries = settings['queries']
+        self.measure('get_objects_tag', [
+            lambda tag=rand.choice(tags): tree.get_objects(tag)
+            for i in range(queries)])
+        self.measure('get_objects_taglist', [
+            lambda tag_list=TagList(rand.sample(tags, 2)):
+            tree.get_objects(tag_list)
+            for i in range(queries)])
+        object_ids = list(tree.get_all_object_ids())
+        self.measure('has_tag', [
+            lambda object_id=rand.choice(object_ids), tag=rand.choice(tags):
+            tree.get_object(object_id).has_tag(tag)
+            for i in range(queries)])
+        self.measure('delete_tag', [
+            lambda tag=tag: tree.delete_tag(tag)
+            for tag in rand.sample(
+                leaves, min(settings['deletions'], len(leaves)))],
+            chunk_size)
+
+
+def run(settings):
+    """ Runs benchmarks with ``settings`` (missing ones are taken from
+    :py:data:`DEFAULT_SETTINGS`) and returns results.
+    """
+
+    return Benchmark(settings).run()
+
+
+def save_results(results, path):
+    """ Saves results to JSON file.
+    """
+
+    with open(path, 'w') as stream:
+        json.dump(results, stream, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    """ Loads results from JSON file.
+    """
+
+    with open(path) as stream:
+        return json.load(stream)
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD, key='p50'):
+    """ Returns list of ``(name, baseline, current, ratio)`` of
+    benchmarks, which ``key`` value in ``current`` results is more than
+    ``threshold`` times greater than in ``baseline``.
+    """
+
+    regressions = []
+    for name, summary in sorted(current['benchmarks'].items()):
+        base_summary = baseline['benchmarks'].get(name)
+        if not base_summary or not base_summary.get(key):
+            continue
+        if summary.get(key) is None:
+            continue                    # Nothing was measured.
+        ratio = summary[key] / base_summary[key]
+        if ratio > 1 + threshold:
+            regressions.append(
+                    (name, base_summary[key], summary[key], ratio))
+    return regressions
+
+
+def format_results(results):
+    """ Returns results as text table (times in milliseconds).
+    """
+
+    columns = ['count', 'mean', 'p50', 'p90', 'p99', 'max']
+    lines = [u'{0:<20}'.format(u'benchmark') + u''.join(
+        [u'{0:>10}'.format(column) for column in columns]) +
+        u'{0:>10}{1:>12}'.format(u'loads', u'rss (kB)')]
+    for name, summary in sorted(results['benchmarks'].items()):
+        cells = [u'{0:>10}'.format(summary['count'])]
+        for column in columns[1:]:
+            if summary[column] is None:
+                cells.append(u'{0:>10}'.format(u'-'))
+            else:
+                cells.append(u'{0:>10.3f}'.format(summary[column] * 1000))
+        lines.append(
+                u'{0:<20}'.format(name) + u''.join(cells) +
+                u'{0:>10}{1:>12}'.format(
+                    summary['loads'], summary['max_rss_kb']))
+    return u'\n'.join(lines)
+
+
+def parse_arguments(argv):
+    """ Returns command line options of benchmarks parsed from
+    ``argv``.
+    """
+
+    parser = argparse.ArgumentParser(description=u'TagTree benchmarks.')
+    for name, value in sorted(DEFAULT_SETTINGS.items()):
+        parser.add_argument(
+                u'--' + name.replace('_', '-'), dest=name, default=value,
+                type=type(value), help=u'Default: {0}.'.format(value))
+    parser.add_argument(
+            u'-o', u'--output', help=u'Save results to JSON file.')
+    parser.add_argument(
+            u'--compare', metavar=u'BASELINE',
+            help=u'Compare results with results saved in JSON file.')
+    parser.add_argument(
+            u'--threshold', type=float, default=DEFAULT_THRESHOLD,
+            help=u'Allowed slowdown of median in comparison.')
+    return parser.parse_args(argv)
+
+
+def run_with_arguments(args):
+    """ Runs benchmarks with options parsed by :py:func:`parse_arguments`,
+    saves and compares results, if asked, and returns results and list
+    of regressions (see :py:func:`compare`).
+    """
+
+    results = run(dict([
+        (name, getattr(args, name)) for name in DEFAULT_SETTINGS]))
+    if args.output:
+        save_results(results, args.output)
+    regressions = []
+    if args.compare:
+        regressions = compare(
+                load_results(args.compare), results, args.threshold)
+    return results, regressions
+
+
+def main(argv=sys.argv[1:]):
+    """ Runs benchmarks from command line.
+    """
+
+    results, regressions = run_with_arguments(parse_arguments(argv))
+    print format_results(results)
+    for name, base_value, value, ratio in regressions:
+        print (
+                u'Regression in {0}: {1:.3f} ms -> {2:.3f} ms '
+                u'({3:.2f}x)'.format(
+                    name, base_value * 1000, value * 1000, ratio))
+    if regressions:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,453 @@
+#!/usr/bin/python
+
+
+""" Subcommands of ``memorize`` command line interface.
+
+Commands are meant for batch use by scripts: records are read as
+streams from files or standard input, results are written to standard
+output as JSON lines and changes are committed in chunks, so database
+is opened only for as long as command runs. When command finishes, its
+summary (time and counts of processed objects) is written as a JSON
+line to standard error::
+
+    memorize import --format tsv words.tsv
+    memorize query 'de.a1 & !de.verbs' --limit 10
+    memorize export > deck.jsonl
+    memorize export --snapshot deck.snapshot
+    memorize import --format snapshot deck.snapshot
+    memorize review --due --tags de.a1 | quiz | memorize review
+    memorize stats
+    memorize pack --days 7
+    memorize bench --objects 100000
+
+Objects are stored in :py:class:`TagTree
+<memorize.tag_tree.tag_tree.TagTree>` kept under :py:data:`TREE_KEY`
+of database root, and review states in :py:class:`Scheduler
+<memorize.scheduler.Scheduler>` kept under :py:data:`SCHEDULER_KEY`.
+
+"""
+
+
+import sys
+import json
+import time
+
+
+TREE_KEY = 'tag_tree'
+SCHEDULER_KEY = 'scheduler'
+
+DEFAULT_CHUNK_SIZE = 1000               # Objects per savepoint or commit.
+DEFAULT_COMMIT_SIZE = 10000             # Imported objects per commit.
+ID_FIELD = u'id'
+TAGS_FIELD = u'tags'
+
+
+def get_tree(root):
+    """ Returns TagTree of database, creating it, if needed.
+    """
+
+    tree = root.get(TREE_KEY)
+    if tree is None:
+        from memorize.tag_tree import TagTree
+        tree = root[TREE_KEY] = TagTree()
+    return tree
+
+
+def get_scheduler(root, tree):
+    """ Returns Scheduler of database, creating it, if needed.
+    """
+
+    scheduler = root.get(SCHEDULER_KEY)
+    if scheduler is None:
+        from memorize.scheduler import Scheduler
+        scheduler = root[SCHEDULER_KEY] = Scheduler(tree)
+    return scheduler
+
+
+def compile_tags(expression):
+    """ Returns :py:class:`Query <memorize.tag_tree.query.Query>` from
+    command line argument or None, if it is not given.
+    """
+
+    if expression is None:
+        return None
+    from memorize.tag_tree import compile_query
+    return compile_query(expression.decode('utf-8'))
+
+
+def open_inputs(paths, stdin):
+    """ Yields opened input files. ``-`` (and empty list of paths)
+    means ``stdin``.
+    """
+
+    for path in paths or ['-']:
+        if path == '-':
+            yield stdin
+        else:
+            with open(path) as stream:
+                yield stream
+
+
+def read_inputs(paths, stdin, format):
+    """ Yields records read from all input files.
+    """
+
+    from memorize.tag_tree.bulk import read_records
+
+    for stream in open_inputs(paths, stdin):
+        for record in read_records(stream, format):
+            yield record
+
+
+def write_record(stream, record):
+    """ Writes ``record`` as JSON line.
+    """
+
+    stream.write(json.dumps(record, sort_keys=True))
+    stream.write('\n')
+
+
+def object_record(obj):
+    """ Returns record of ``obj`` as written by export and query.
+    """
+
+    from memorize.entry import Entry
+
+    if isinstance(obj, Entry):
+        record = obj.as_record()
+    else:
+        record = {}
+    record[ID_FIELD] = obj.get_id()
+    record[TAGS_FIELD] = [tag.as_unicode() for tag in obj.get_tag_list()]
+    return record
+
+
+def import_objects(config, args, stdin, stdout):
+    """ Loads records from input files into tag tree.
+    """
+
+    import transaction
+    from memorize.entry import Entry
+    from memorize.tag_tree.bulk import BulkLoader
+
+    tree = get_tree(config.db_root)
+    if args.format == 'snapshot':
+        from memorize.tag_tree.snapshot import load_snapshot, TAGS_FIELD
+        exclude = (TAGS_FIELD,)
+        count = 0
+        for path in args.files:
+            count += load_snapshot(
+                    path, tree, lambda record: Entry(record, exclude),
+                    chunk_size=args.chunk_size,
+                    commit_size=args.commit_size)
+        transaction.commit()
+        return {'objects': count}
+
+    exclude = (ID_FIELD, args.tags_field)
+    loader = BulkLoader(
+            tree, lambda record: Entry(record, exclude),
+            tags_field=args.tags_field,
+            chunk_size=args.chunk_size,
+            commit_size=args.commit_size)
+    count = loader.load(read_inputs(args.files, stdin, args.format))
+    transaction.commit()
+    return {'objects': count}
+
+
+def export_objects(config, args, stdin, stdout):
+    """ Writes objects tagged by ``tags`` (all objects by default) as
+    JSON lines, or whole tree to snapshot file.
+    """
+
+    import transaction
+
+    tree = get_tree(config.db_root)
+    if args.snapshot is not None:
+        from memorize.tag_tree.snapshot import write_snapshot
+        if args.tags is not None:
+            raise ValueError(u'Snapshot can contain only the whole tree.')
+        count = write_snapshot(
+                tree, args.snapshot, chunk_size=args.chunk_size)
+        transaction.abort()
+        return {'objects': count}
+
+    tags = compile_tags(args.tags)
+    if tags is None:
+        object_ids = tree.get_all_object_ids()
+    else:
+        object_ids = tree.get_object_ids(tags)
+    count = 0
+    for object_id in object_ids:
+        write_record(stdout, object_record(tree.get_object(object_id)))
+        count += 1
+        if count % args.chunk_size == 0:
+            config.connection.cacheGC()
+    transaction.abort()
+    return {'objects': count}
+
+
+def query_objects(config, args, stdin, stdout):
+    """ Writes objects matching query (or only their ids) as JSON
+    lines.
+    """
+
+    import transaction
+
+    tree = get_tree(config.db_root)
+    tags = compile_tags(args.tags)
+    if args.count:
+        count = tree.count(tags)
+        write_record(stdout, {'count': count})
+        transaction.abort()
+        return {'objects': count}
+    count = 0
+    objects = tree.iter_objects(tags, offset=args.offset, limit=args.limit)
+    for obj in objects:
+        if args.ids:
+            write_record(stdout, {ID_FIELD: obj.get_id()})
+        else:
+            write_record(stdout, object_record(obj))
+        count += 1
+        if count % args.chunk_size == 0:
+            config.connection.cacheGC()
+    transaction.abort()
+    return {'objects': count}
+
+
+def show_stats(config, args, stdin, stdout):
+    """ Writes sizes of tag tree, scheduler and database as one JSON
+    line.
+    """
+
+    import transaction
+    from memorize import instrumentation
+
+    root = config.db_root
+    tree = get_tree(root)
+    scheduler = get_scheduler(root, tree)
+    database = config.database
+    stats = {
+            'objects': len(tree.get_all_object_ids()),
+            'tags': tree.count_tags(),
+            'scheduled': scheduler.count(),
+            'due': len(scheduler.get_due_ids()),
+            'database_size': database.getSize(),
+            }
+    if config.get('instrument'):
+        stats['instrumentation'] = instrumentation.stats.as_dict(database)
+    write_record(stdout, stats)
+    transaction.abort()
+    return {'objects': stats['objects']}
+
+
+def review_objects(config, args, stdin, stdout):
+    """ With ``--due`` writes due objects (with their review states)
+    as JSON lines. Otherwise reads review results (JSON lines with
+    ``id``, ``quality`` and, optionally, ``time``) and records them.
+    Objects, which are not scheduled yet, are scheduled on their first
+    review.
+    """
+
+    import transaction
+
+    root = config.db_root
+    tree = get_tree(root)
+    scheduler = get_scheduler(root, tree)
+
+    if args.due:
+        tags = compile_tags(args.tags)
+        count = 0
+        for object_id in scheduler.get_due_ids(tags, limit=args.limit):
+            record = object_record(tree.get_object(object_id))
+            record['review'] = scheduler.get_state(object_id)._asdict()
+            write_record(stdout, record)
+            count += 1
+        transaction.abort()
+        return {'objects': count}
+
+    count = 0
+    scheduled = 0
+    for record in read_inputs(args.files, stdin, 'jsonl'):
+        object_id = record[ID_FIELD]
+        now = record.get('time')
+        tree.get_object(object_id)      # Object has to exist.
+        try:
+            scheduler.get_state(object_id)
+        except KeyError:
+            scheduler.add(object_id, now)
+            scheduled += 1
+        scheduler.review(object_id, record['quality'], now)
+        count += 1
+        if count % args.chunk_size == 0:
+            transaction.commit()
+            config.connection.cacheGC()
+    transaction.commit()
+    return {'objects': count, 'scheduled': scheduled}
+
+
+def pack_database(config, args, stdin, stdout):
+    """ Removes old revisions of objects from storage.
+    """
+
+    database = config.database
+    size = database.getSize()
+    database.pack(days=args.days)
+    return {'size_before': size, 'size_after': database.getSize()}
+
+
+def run_benchmarks(config, args, stdin, stdout):
+    """ Runs benchmarks of :py:mod:`memorize.benchmark` with options of
+    command and writes record of each benchmark and of each regression.
+    Benchmarks use own temporary database, so configured one is not
+    opened.
+    """
+
+    from memorize import benchmark
+
+    results, regressions = benchmark.run_with_arguments(
+            benchmark.parse_arguments(args.arguments))
+    for name, summary in sorted(results['benchmarks'].items()):
+        record = dict(summary)
+        record['benchmark'] = name
+        write_record(stdout, record)
+    for name, base_value, value, ratio in regressions:
+        write_record(stdout, {
+            'regression': name, 'baseline': base_value, 'current': value,
+            'ratio': ratio})
+    return {'failures': len(regressions)}
+
+
+def add_parsers(subparsers):
+    """ Adds parsers of all commands to ``subparsers`` of
+    :py:func:`memorize.main` parser.
+    """
+
+    def add_parser(name, function, help):
+        parser = subparsers.add_parser(name, help=help, description=help)
+        parser.set_defaults(command=function, command_name=name)
+        return parser
+
+    def add_files(parser):
+        parser.add_argument(
+                u'files', metavar=u'FILE', nargs=u'*',
+                help=u'Input files. Default is standard input.')
+
+    def add_chunk_size(parser):
+        parser.add_argument(
+                u'--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                help=u'Objects processed between cache cleanups or '
+                     u'commits. Default: {0}.'.format(DEFAULT_CHUNK_SIZE))
+
+    def add_tags(parser):
+        parser.add_argument(
+                u'tags', metavar=u'QUERY', nargs=u'?',
+                help=u'Tag query, for example "de.a1 & !de.verbs".')
+
+    parser = add_parser(
+            u'import', import_objects, u'Import objects from word lists.')
+    add_files(parser)
+    parser.add_argument(
+            u'-f', u'--format', default=u'jsonl',
+            choices=[u'jsonl', u'csv', u'tsv', u'snapshot'],
+            help=u'Format of input files. Snapshots (see '
+                 u'memorize.tag_tree.snapshot) can not be read from '
+                 u'standard input. Default: jsonl.')
+    parser.add_argument(
+            u'--tags-field', default=TAGS_FIELD,
+            help=u'Field with tags of object. Default: {0}.'.format(
+                TAGS_FIELD))
+    add_chunk_size(parser)
+    parser.add_argument(
+            u'--commit-size', type=int, default=DEFAULT_COMMIT_SIZE,
+            help=u'Objects imported per transaction. Default: {0}.'.format(
+                DEFAULT_COMMIT_SIZE))
+
+    parser = add_parser(
+            u'export', export_objects, u'Export objects as JSON lines.')
+    add_tags(parser)
+    parser.add_argument(
+            u'--snapshot', metavar=u'FILE',
+            help=u'Write whole tree to snapshot file instead.')
+    add_chunk_size(parser)
+
+    parser = add_parser(
+            u'query', query_objects, u'Find objects by tag query.')
+    parser.add_argument(
+            u'tags', metavar=u'QUERY',
+            help=u'Tag query, for example "de.a1 & !de.verbs".')
+    parser.add_argument(u'--offset', type=int, default=0)
+    parser.add_argument(u'--limit', type=int)
+    parser.add_argument(
+            u'--ids', action=u'store_true', help=u'Write only ids.')
+    parser.add_argument(
+            u'--count', action=u'store_true',
+            help=u'Write only number of objects.')
+    add_chunk_size(parser)
+
+    add_parser(
+            u'stats', show_stats,
+            u'Show sizes of tag tree, scheduler and database.')
+
+    parser = add_parser(
+            u'review', review_objects,
+            u'Record review results or list due objects.')
+    add_files(parser)
+    parser.add_argument(
+            u'--due', action=u'store_true',
+            help=u'Write due objects instead of recording reviews.')
+    parser.add_argument(
+            u'--tags', metavar=u'QUERY',
+            help=u'Write only due objects matching tag query.')
+    parser.add_argument(u'--limit', type=int)
+    add_chunk_size(parser)
+
+    parser = add_parser(
+            u'pack', pack_database, u'Remove old revisions from database.')
+    parser.add_argument(
+            u'--days', type=float, default=0,
+            help=u'Keep revisions newer than that. Default: 0.')
+
+    parser = add_parser(
+            u'bench', run_benchmarks,
+            u'Run benchmarks in a temporary database. All options are '
+            u'passed to memorize.benchmark (see python -m '
+            u'memorize.benchmark --help).')
+    parser.set_defaults(arguments=[], forward_arguments=True)
+
+
+def parse_arguments(parser, argv):
+    """ Returns ``argv`` parsed by ``parser`` (with parsers added by
+    :py:func:`add_parsers`). Arguments, which are not known to
+    ``parser``, are left in ``arguments`` of commands, which forward
+    them (``bench``), and are rejected otherwise.
+    """
+
+    args, unknown = parser.parse_known_args(argv)
+    if unknown:
+        if not getattr(args, 'forward_arguments', False):
+            parser.error(u'unrecognized arguments: {0}'.format(
+                u' '.join(unknown)))
+        args.arguments = unknown
+    return args
+
+
+def execute(config, args, stdin=sys.stdin, stdout=sys.stdout,
+            stderr=sys.stderr):
+    """ Runs command selected by parsed ``args``, closes database and
+    writes summary to ``stderr``. Returns exit status.
+
+    :type config: memorize.config.ConfigManager
+    """
+
+    start = time.time()
+    try:
+        summary = args.command(config, args, stdin, stdout)
+    finally:
+        config.close()
+    report = {
+            'command': args.command_name,
+            'seconds': round(time.time() - start, 3),
+            }
+    report.update(summary)
+    write_record(stderr, report)
+    return 1 if summary.get('failures') else 0
@@ -10,6 +10,14 @@ An example:
 ...     'database_path': u'/home/foo/memorize/db.fs',
 ...     }
 
+Several processes can share one database through ZEO server:
+
+>>> config = {
+...     'storage': 'zeo',
+...     'zeo_address': u'localhost:8100',
+...     'cache_size': 10000,
+...     }
+
 """
 
 
@@ -21,9 +29,27 @@ from memorize import db
 
 DEFAULT_CONFIGURATION = {
 
+    # Storage of ZODB: ``file`` (FileStorage), ``memory``
+    # (MappingStorage, lost at exit), ``zeo`` (ZEO client) or
+    # ``relstorage`` (RelStorage on SQLite).
+    'storage': 'file',
     # Location of ZODB file.
     'database_path': os.path.join(
         os.getenv(u'HOME'), u'.memorize', u'db', u'data.fs'),
+    # Address of ZEO server: ``host:port`` or path of unix socket.
+    'zeo_address': None,
+    # Directory of RelStorage SQLite database.
+    'relstorage_directory': os.path.join(
+        os.getenv(u'HOME'), u'.memorize', u'relstorage'),
+    # Directory for blobs. None means, that blobs are not supported.
+    'blob_directory': None,
+    # Number of objects kept in cache of each connection.
+    'cache_size': db.DEFAULT_CACHE_SIZE,
+    # Number of connections kept open by database.
+    'pool_size': db.DEFAULT_POOL_SIZE,
+    # Record storage loads and times of TagTree operations (see
+    # memorize.instrumentation).
+    'instrument': False,
     # Connect to ZODB at program start or wait until it is asked.
     'connect_to_db': False,
     # Automatically create needed directories.
@@ -45,27 +71,94 @@ class ConfigManager(object):
         self._data = DEFAULT_CONFIGURATION.copy()
         self._data.update(config_dict)
 
+        self._connection_manager = None
+        self._connection = None
         self._db_root = None
         if self._data['connect_to_db']:
             self.connect()
 
     def connect(self):
-        """ Connects to ZODB.
+        """ Opens database and connects to it.
         """
 
         if self._data['create_directories']:
-            path = os.path.dirname(self._data['database_path'])
-            try:
-                os.makedirs(path)
-            except OSError as e:
-                if e.errno == errno.EEXIST:
-                    pass
-                else:
-                    raise
+            for path in self._get_directories():
+                self._create_directory(path)
+
+        self._connection_manager = db.ConnectionManager(
+                db.open_database(self._data))
+        self._connection = self._connection_manager.get_thread_connection()
+        self._db_root = self._connection.root()
+
+    def _get_directories(self):
+        """ Returns list of directories, which are needed by selected
+        storage.
+        """
+
+        directories = []
+        if self._data['storage'] == 'file':
+            directories.append(os.path.dirname(self._data['database_path']))
+        elif self._data['storage'] == 'relstorage':
+            directories.append(self._data['relstorage_directory'])
+        if self._data['blob_directory']:
+            directories.append(self._data['blob_directory'])
+        return directories
+
+    def _create_directory(self, path):
+        """ Creates directory, if it does not exist.
+        """
+
+        try:
+            os.makedirs(path)
+        except OSError as e:
+            if e.errno == errno.EEXIST:
+                pass
             else:
-                print 'Created directory: {0}.'.format(path)
+                raise
+        else:
+            print 'Created directory: {0}.'.format(path)
+
+    def get(self, key, default=None):
+        """ Returns configuration value.
+        """
+
+        return self._data.get(key, default)
+
+    def close(self):
+        """ Closes connection and database.
+        """
 
-        self._db_root = db.connect(self._data['database_path'])
+        if self._connection_manager is not None:
+            self._connection_manager.close()
+            self._connection_manager = None
+            self._connection = None
+            self._db_root = None
+
+    @property
+    def connection_manager(self):
+        """ Returns :py:class:`memorize.db.ConnectionManager`, which
+        gives connections for other threads and requests.
+        """
+
+        if self._connection_manager is None:
+            self.connect()
+        return self._connection_manager
+
+    @property
+    def database(self):
+        """ Returns :py:class:`ZODB.DB.DB`.
+        """
+
+        return self.connection_manager.database
+
+    @property
+    def connection(self):
+        """ Returns ZODB connection of thread, which connected.
+        """
+
+        if self._connection is None:
+            self.connect()
+        return self._connection
 
     @property
     def db_root(self):
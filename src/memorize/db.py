@@ -2,26 +2,260 @@
 
 
 """ Settings and functions for connecting to ZODB.
+
+Database is opened from configuration dict (see
+:py:data:`memorize.config.DEFAULT_CONFIGURATION`), which key
+``storage`` selects one of :py:data:`STORAGES`:
+
+>>> database = open_database({'storage': 'memory', 'cache_size': 1000})
+>>> database.getCacheSize()
+1000
+
+Connections are taken from pool of database by
+:py:class:`ConnectionManager` - one per thread or one per request:
+
+>>> manager = ConnectionManager(database)
+>>> with manager.transaction() as root:
+...     root['answer'] = 42
+>>> with manager.transaction() as root:
+...     print root['answer']
+42
+>>> manager.close()
+
 """
 
 
 import os
+import threading
+import contextlib
 
-from ZODB.FileStorage import FileStorage
-from ZODB.DB import DB
+# ZODB is imported by functions, which use it, so importing this module
+# (and starting command line interface) stays cheap.
 
 
 HOME_DIRECTORY = os.getenv("HOME")
 DATABASE_DIRECTORY = os.path.join(HOME_DIRECTORY, '.memorize')
 DATABASE_PATH = os.path.join(DATABASE_DIRECTORY, 'data.fs')
 
+DEFAULT_CACHE_SIZE = 400                # Objects per connection.
+DEFAULT_POOL_SIZE = 7                   # Connections kept open.
+
+
+def create_file_storage(config):
+    """ Returns FileStorage stored in ``database_path``.
+    """
+
+    from ZODB.FileStorage import FileStorage
+    return FileStorage(
+            config.get('database_path', DATABASE_PATH),
+            blob_dir=config.get('blob_directory'))
+
+
+def create_memory_storage(config):
+    """ Returns in-memory storage, which is lost, when database is
+    closed. Useful for tests and benchmarks.
+    """
+
+    from ZODB.MappingStorage import MappingStorage
+    storage = MappingStorage()
+    if config.get('blob_directory'):
+        from ZODB.blob import BlobStorage
+        storage = BlobStorage(config['blob_directory'], storage)
+    return storage
+
+
+def parse_address(address):
+    """ Returns ZEO server address from ``host:port`` string, or
+    ``address`` itself, if it is a path of unix socket or already
+    parsed.
+    """
+
+    if isinstance(address, basestring) and u':' in address:
+        host, port = address.rsplit(u':', 1)
+        return (str(host), int(port))
+    return address
+
+
+def create_zeo_storage(config):
+    """ Returns ZEO client storage connected to ``zeo_address``, so
+    database can be shared by several processes.
+    """
+
+    try:
+        from ZEO.ClientStorage import ClientStorage
+    except ImportError:
+        raise ImportError(u'ZEO storage requires ZEO package.')
+    return ClientStorage(
+            parse_address(config['zeo_address']),
+            blob_dir=config.get('blob_directory'),
+            shared_blob_dir=False)
+
+
+def create_relstorage(config):
+    """ Returns RelStorage, which keeps data in SQLite database in
+    ``relstorage_directory``.
+    """
+
+    try:
+        from relstorage.options import Options
+        from relstorage.storage import RelStorage
+        from relstorage.adapters.sqlite.adapter import Sqlite3Adapter
+    except ImportError:
+        raise ImportError(
+                u'RelStorage storage requires RelStorage package.')
+    options = Options(
+            keep_history=False,
+            blob_dir=config.get('blob_directory'),
+            shared_blob_dir=bool(config.get('blob_directory')))
+    adapter = Sqlite3Adapter(
+            config['relstorage_directory'], pragmas={}, options=options)
+    return RelStorage(adapter, options=options)
+
+
+STORAGES = {
+    'file': create_file_storage,
+    'memory': create_memory_storage,
+    'zeo': create_zeo_storage,
+    'relstorage': create_relstorage,
+    }
+
+
+def create_storage(config):
+    """ Returns storage selected by ``storage`` key of ``config``.
+    """
+
+    name = config.get('storage', 'file')
+    try:
+        factory = STORAGES[name]
+    except KeyError:
+        raise ValueError(u'Unknown storage: {0}.'.format(name))
+    return factory(config)
+
+
+def open_database(config):
+    """ Returns :py:class:`ZODB.DB.DB` with storage created by
+    :py:func:`create_storage` and sizes of connection pool and object
+    cache taken from ``pool_size`` and ``cache_size`` keys of
+    ``config``.
+
+    If ``instrument`` key is true, loads and TagTree operations are
+    recorded in :py:data:`memorize.instrumentation.stats` until
+    database is closed.
+    """
+
+    from ZODB.DB import DB
+
+    storage = create_storage(config)
+    if config.get('instrument'):
+        from memorize import instrumentation
+        storage = instrumentation.InstrumentedStorage(
+                storage, instrument_methods=True)
+    return DB(
+            storage,
+            cache_size=config.get('cache_size') or DEFAULT_CACHE_SIZE,
+            pool_size=config.get('pool_size') or DEFAULT_POOL_SIZE)
+
 
 def connect(path=DATABASE_PATH):
-    """ Connects to database and returns its root.
+    """ Connects to FileStorage database and returns its root.
     """
 
-    storage = FileStorage(path)
-    database = DB(storage)
+    database = open_database({'storage': 'file', 'database_path': path})
     connection = database.open()
 
     return connection.root()
+
+
+class ConnectionManager(object):
+    """ Owns database and hands out its pooled connections.
+
+    ZODB connection must not be shared by threads, so each thread (see
+    :py:meth:`get_thread_connection`) or each request (see
+    :py:meth:`transaction`) gets its own connection. Connections of
+    threads use thread-local :py:data:`transaction.manager`, connections
+    of requests get their own transaction managers. Closed connections
+    are returned to the pool of database, which size is set by
+    ``pool_size`` option of :py:func:`open_database`.
+    """
+
+    def __init__(self, database):
+        """
+        :type database: ZODB.DB.DB
+        """
+
+        self.database = database
+        self._local = threading.local()
+
+    def open(self):
+        """ Returns connection from pool with new transaction manager.
+        Caller have to close it.
+        """
+
+        import transaction
+        return self.database.open(transaction.TransactionManager())
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """ Context manager, which opens connection, gives its root,
+        commits transaction if block succeeds (aborts otherwise) and
+        returns connection to pool.
+        """
+
+        connection = self.open()
+        manager = connection.transaction_manager
+        try:
+            manager.begin()
+            yield connection.root()
+            manager.commit()
+        except:
+            manager.abort()
+            raise
+        finally:
+            connection.close()
+
+    def run(self, function, attempts=3):
+        """ Calls ``function`` with database root in
+        :py:meth:`transaction` and returns its result. If transaction
+        fails with conflict, it is retried up to ``attempts`` times in
+        total.
+        """
+
+        from ZODB.POSException import ConflictError
+
+        for attempt in range(attempts):
+            try:
+                with self.transaction() as root:
+                    result = function(root)
+            except ConflictError:
+                if attempt + 1 == attempts:
+                    raise
+            else:
+                return result
+
+    def get_thread_connection(self):
+        """ Returns connection of the current thread, opening it, if
+        needed.
+        """
+
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self.database.open()
+        return connection
+
+    def close_thread_connection(self):
+        """ Aborts transaction of connection of the current thread and
+        returns it to pool.
+        """
+
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.transaction_manager.abort()
+            connection.close()
+            self._local.connection = None
+
+    def close(self):
+        """ Closes connection of the current thread and database.
+        """
+
+        self.close_thread_connection()
+        self.database.close()
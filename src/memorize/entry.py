@@ -0,0 +1,59 @@
+#!/usr/bin/python
+
+
+""" Objects created by ``memorize import`` from records of word lists.
+
+Fields of record become attributes of :py:class:`Entry`, so they can be
+indexed and used in filters, and :py:meth:`Entry.as_record` gives them
+back for ``memorize export``:
+
+>>> entry = Entry({u'value': u'gehen', u'translation': u'to go'})
+>>> entry.value
+u'gehen'
+>>> sorted(entry.as_record().items())
+[(u'translation', u'to go'), (u'value', u'gehen')]
+
+Fields named as attributes of class are rejected:
+
+>>> Entry({u'get_id': 1})
+Traceback (most recent call last):
+...
+ValueError: Invalid field name: get_id.
+
+"""
+
+
+import re
+
+from memorize.tag_tree import TaggedObject
+
+
+FIELD_NAME_RE = re.compile(r'^[A-Za-z][A-Za-z0-9_]*$')
+
+
+class Entry(TaggedObject):
+    """ Tagged object with fields taken from record.
+    """
+
+    def __init__(self, record, exclude=()):
+        """
+        :type record: dict
+        :param exclude: Names of fields, which are not stored.
+        """
+
+        super(Entry, self).__init__()
+        self._fields = []
+        for name, value in sorted(record.items()):
+            if name in exclude:
+                continue
+            if not FIELD_NAME_RE.match(name) or hasattr(type(self), name):
+                # Field would hide method or attribute of class.
+                raise ValueError(u'Invalid field name: {0}.'.format(name))
+            setattr(self, str(name), value)
+            self._fields.append(unicode(name))
+
+    def as_record(self):
+        """ Returns dict of fields of entry.
+        """
+
+        return dict([(name, getattr(self, name)) for name in self._fields])
@@ -0,0 +1,367 @@
+#!/usr/bin/python
+
+
+""" Instrumentation of ZODB storage and of
+:py:mod:`TagTree <memorize.tag_tree>` methods.
+
+It is meant for sizing ``cache_size`` (see
+:py:mod:`memorize.config`) and for finding operations, which load
+whole subtrees. When enabled (``instrument`` option of
+:py:func:`memorize.db.open_database`):
+
++   storage is wrapped by :py:class:`InstrumentedStorage`, which counts
+    loaded objects (object cache misses) and their bytes;
++   public methods of :py:class:`TagTree
+    <memorize.tag_tree.tag_tree.TagTree>` and :py:class:`TagNode
+    <memorize.tag_tree.tag_node.TagNode>` are wrapped by
+    :py:func:`enable`, which records number of calls, time and loads
+    done during each call (including nested calls), and counts tagged
+    objects returned to caller, which were already in the object cache
+    (hits) and which were ghosts (misses). Methods are restored by
+    :py:func:`disable`, when the last instrumented database is closed.
+
+>>> from memorize.tag_tree import TagTree, Tag
+>>> stats = Stats()
+>>> enable(stats)
+>>> tree = TagTree()
+>>> tree.create_tag(Tag(u'a'))
+>>> stats.as_dict()['operations']['TagTree.create_tag']['calls']
+1
+>>> disable()
+
+Without ZODB connection no object is loaded, so only calls and time
+are recorded. Statistics are exported by :py:meth:`Stats.as_dict` or
+:py:meth:`Stats.to_prometheus`.
+
+"""
+
+
+import os
+import time
+import functools
+import threading
+import types
+
+
+class Stats(object):
+    """ Collected statistics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        """ Clears all statistics.
+        """
+
+        with self._lock:
+            self.loads = 0
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.operations = {}
+
+    def _get_thread_counters(self):
+        """ Returns ``[loads, bytes]`` of the current thread.
+        """
+
+        counters = getattr(self._local, 'counters', None)
+        if counters is None:
+            counters = self._local.counters = [0, 0]
+        return counters
+
+    def record_load(self, size):
+        """ Records object of ``size`` bytes loaded from storage.
+        """
+
+        counters = self._get_thread_counters()
+        counters[0] += 1
+        counters[1] += size
+        with self._lock:
+            self.loads += 1
+            self.bytes += size
+
+    def record_object(self, obj):
+        """ Records, if persistent ``obj`` returned to caller was in the
+        object cache.
+        """
+
+        if getattr(obj, '_p_jar', None) is None:
+            return
+        with self._lock:
+            if obj._p_changed is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+    def record_operation(self, name, seconds, loads, size):
+        """ Records one call of operation.
+        """
+
+        with self._lock:
+            operation = self.operations.get(name)
+            if operation is None:
+                operation = self.operations[name] = {
+                        'calls': 0, 'seconds': 0.0, 'loads': 0, 'bytes': 0}
+            operation['calls'] += 1
+            operation['seconds'] += seconds
+            operation['loads'] += loads
+            operation['bytes'] += size
+
+    def hit_ratio(self):
+        """ Returns part of returned objects, which were in the object
+        cache, or None, if no object was returned.
+        """
+
+        if self.hits + self.misses == 0:
+            return None
+        return float(self.hits) / (self.hits + self.misses)
+
+    def as_dict(self, database=None):
+        """ Returns statistics as dict.
+
+        :param database:
+            If given, sizes of its connection caches are included.
+        :type database: ZODB.DB.DB or None
+        """
+
+        with self._lock:
+            data = {
+                    'storage': {'loads': self.loads, 'bytes': self.bytes},
+                    'objects': {
+                        'hits': self.hits,
+                        'misses': self.misses,
+                        'hit_ratio': self.hit_ratio(),
+                        },
+                    'operations': dict([
+                        (name, dict(operation))
+                        for name, operation in self.operations.items()]),
+                    }
+        if database is not None:
+            details = database.cacheDetailSize()
+            data['cache'] = {
+                    'objects': sum([detail['size'] for detail in details]),
+                    'non_ghosts': sum(
+                        [detail['ngsize'] for detail in details]),
+                    'target_size': database.getCacheSize(),
+                    'connections': len(details),
+                    }
+        return data
+
+    def to_prometheus(self, database=None, prefix='memorize'):
+        """ Returns statistics in Prometheus text exposition format.
+        """
+
+        data = self.as_dict(database)
+        lines = []
+
+        def metric(name, kind, help, samples):
+            name = u'{0}_{1}'.format(prefix, name)
+            lines.append(u'# HELP {0} {1}'.format(name, help))
+            lines.append(u'# TYPE {0} {1}'.format(name, kind))
+            for labels, value in samples:
+                lines.append(u'{0}{1} {2!r}'.format(name, labels, value))
+
+        metric(
+                'storage_loads_total', 'counter',
+                'Objects loaded from storage.',
+                [(u'', data['storage']['loads'])])
+        metric(
+                'storage_bytes_total', 'counter',
+                'Bytes loaded from storage.',
+                [(u'', data['storage']['bytes'])])
+        metric(
+                'object_cache_hits_total', 'counter',
+                'Returned objects, which were in object cache.',
+                [(u'', data['objects']['hits'])])
+        metric(
+                'object_cache_misses_total', 'counter',
+                'Returned objects, which were ghosts.',
+                [(u'', data['objects']['misses'])])
+        if data['objects']['hit_ratio'] is not None:
+            metric(
+                    'object_cache_hit_ratio', 'gauge',
+                    'Part of returned objects, which were in object cache.',
+                    [(u'', data['objects']['hit_ratio'])])
+        if 'cache' in data:
+            metric(
+                    'object_cache_objects', 'gauge',
+                    'Objects in caches of connections.',
+                    [(u'', data['cache']['objects'])])
+            metric(
+                    'object_cache_non_ghosts', 'gauge',
+                    'Not ghost objects in caches of connections.',
+                    [(u'', data['cache']['non_ghosts'])])
+
+        operations = sorted(data['operations'].items())
+        for key, kind, help in [
+                ('calls', 'counter', 'Calls of operation.'),
+                ('seconds', 'counter', 'Time spent in operation.'),
+                ('loads', 'counter', 'Objects loaded during operation.'),
+                ('bytes', 'counter', 'Bytes loaded during operation.'),
+                ]:
+            metric(
+                    'operation_{0}_total'.format(key), kind, help,
+                    [(u'{{operation="{0}"}}'.format(name), operation[key])
+                     for name, operation in operations])
+        return u'\n'.join(lines) + u'\n'
+
+    def write_prometheus(self, path, database=None):
+        """ Writes :py:meth:`to_prometheus` output to file (for example,
+        for textfile collector of node exporter). File is replaced
+        atomically.
+        """
+
+        temporary_path = u'{0}.{1}.tmp'.format(path, os.getpid())
+        with open(temporary_path, 'w') as stream:
+            stream.write(self.to_prometheus(database).encode('utf-8'))
+        os.rename(temporary_path, path)
+
+
+stats = Stats()                         # Default statistics.
+
+
+class InstrumentedStorage(object):
+    """ Storage proxy, which records loads in :py:class:`Stats`.
+    """
+
+    def __init__(self, storage, stats=stats, instrument_methods=False):
+        """
+        :param instrument_methods:
+            If True, TagTree methods are wrapped by :py:func:`enable`
+            until storage is closed.
+        """
+
+        from zope.interface import directlyProvides, providedBy
+
+        self._storage = storage
+        self._stats = stats
+        self._instrument_methods = instrument_methods
+        directlyProvides(self, providedBy(storage))
+        if instrument_methods:
+            enable(stats)
+
+    def close(self):
+        self._storage.close()
+        if self._instrument_methods:
+            disable()
+            self._instrument_methods = False
+
+    def __getattr__(self, name):
+        return getattr(self._storage, name)
+
+    def load(self, oid, version=''):
+        data, serial = self._storage.load(oid, version)
+        self._stats.record_load(len(data))
+        return data, serial
+
+    def loadBefore(self, oid, tid):
+        result = self._storage.loadBefore(oid, tid)
+        if result is not None:
+            self._stats.record_load(len(result[0]))
+        return result
+
+    def loadSerial(self, oid, serial):
+        data = self._storage.loadSerial(oid, serial)
+        self._stats.record_load(len(data))
+        return data
+
+
+_originals = {}                         # (class, name) to original method.
+_users = 0                              # Calls of enable not disabled yet.
+
+
+def _record_objects(stats, value):
+    """ Records returned tagged objects and returns ``value``, which,
+    if it is an iterator, is replaced by recording one.
+    """
+
+    from memorize.tag_tree.tagged_object import TaggedObject
+
+    if isinstance(value, TaggedObject):
+        stats.record_object(value)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            if isinstance(item, TaggedObject):
+                stats.record_object(item)
+    elif hasattr(value, 'next') and iter(value) is value:
+        return _record_iterator(stats, value)
+    return value
+
+
+def _record_iterator(stats, iterator):
+    for item in iterator:
+        _record_objects(stats, item)
+        yield item
+
+
+def _wrap(cls, name, method, stats):
+    operation = u'{0}.{1}'.format(cls.__name__, name)
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        counters = stats._get_thread_counters()
+        loads, size = counters
+        depth = getattr(stats._local, 'depth', 0)
+        stats._local.depth = depth + 1
+        start = time.time()
+        try:
+            value = method(*args, **kwargs)
+            if depth == 0:
+                # Objects returned by nested calls are returned to
+                # outer operation, not to caller.
+                value = _record_objects(stats, value)
+            return value
+        finally:
+            stats._local.depth = depth
+            stats.record_operation(
+                    operation, time.time() - start,
+                    counters[0] - loads, counters[1] - size)
+
+    return wrapper
+
+
+def enable(stats=stats):
+    """ Wraps public methods of TagTree and TagNode, so they record
+    statistics in ``stats``.
+
+    Calls are counted: methods stay wrapped until :py:func:`disable` is
+    called as many times as :py:func:`enable`, so several instrumented
+    databases can be open at once. Operations are recorded in
+    ``stats`` of the latest call.
+    """
+
+    global _users
+
+    from memorize.tag_tree.tag_tree import TagTree
+    from memorize.tag_tree.tag_node import TagNode
+
+    _restore()
+    _users += 1
+    for cls in (TagTree, TagNode):
+        for name, method in cls.__dict__.items():
+            if (not name.startswith('_') and
+                    isinstance(method, types.FunctionType)):
+                _originals[(cls, name)] = method
+                setattr(cls, name, _wrap(cls, name, method, stats))
+
+
+def disable():
+    """ Restores methods wrapped by :py:func:`enable`, if it was the
+    last not yet disabled call of it.
+    """
+
+    global _users
+
+    if _users > 0:
+        _users -= 1
+    if _users == 0:
+        _restore()
+
+
+def _restore():
+    for (cls, name), method in _originals.items():
+        setattr(cls, name, method)
+    _originals.clear()
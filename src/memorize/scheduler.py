@@ -0,0 +1,253 @@
+#!/usr/bin/python
+
+
+""" Spaced repetition scheduler for objects stored in
+:py:class:`TagTree <memorize.tag_tree.tag_tree.TagTree>`.
+
+Review state of every scheduled object is kept by :py:class:`Scheduler`
+itself (keyed by object id), together with an index ordered by due
+time, so building a queue of due objects is a range scan, which does
+not load objects, which are not returned:
+
+>>> from memorize.tag_tree import TagTree, TaggedObject, Tag
+>>> tree = TagTree()
+>>> tree.create_tag(Tag(u'de.a1'))
+>>> words = [TaggedObject() for i in range(3)]
+>>> for word in words:
+...     tree.assign(word)
+>>> words[0].add_tag(Tag(u'de.a1'))
+>>> words[2].add_tag(Tag(u'de.a1'))
+>>> scheduler = Scheduler(tree)
+>>> for word in words:
+...     scheduler.add(word, now=0)
+>>> [word.get_id() for word in scheduler.get_due(now=0)]
+[1, 2, 3]
+>>> scheduler.review(words[0], 4, now=0).interval
+1
+>>> [word.get_id() for word in scheduler.get_due(Tag(u'de.a1'), now=0)]
+[3]
+>>> [word.get_id() for word in scheduler.get_due(Tag(u'de.a1'), now=DAY)]
+[3, 1]
+
+Intervals are computed by the SM-2 algorithm.
+
+"""
+
+
+import time
+import collections
+
+import persistent
+from BTrees.IOBTree import IOBTree
+from BTrees.LLBTree import LLTreeSet
+from BTrees.Length import Length
+
+
+DAY = 24 * 60 * 60              # Seconds in day.
+INDEX_RESOLUTION = 60           # Due time precision in index (seconds).
+ID_BITS = 32                    # Object ids are stored in lower bits of
+                                # index keys.
+ID_MASK = (1 << ID_BITS) - 1
+
+INITIAL_EASE = 2.5
+MINIMAL_EASE = 1.3
+PASSING_QUALITY = 3             # Lowest quality, which is not a lapse.
+MAXIMAL_QUALITY = 5
+
+
+class ReviewState(collections.namedtuple(
+        'ReviewState',
+        ['due', 'interval', 'ease', 'repetitions', 'lapses'])):
+    """ Review state of scheduled object.
+
+    ``due`` is a UNIX timestamp, ``interval`` is in days.
+    """
+
+
+def next_state(state, quality, now):
+    """ Returns review state after review with ``quality`` (from 0 to
+    5) at ``now`` computed by the SM-2 algorithm.
+    """
+
+    if not 0 <= quality <= MAXIMAL_QUALITY:
+        raise ValueError(
+                u'Quality have to be between 0 and {0}.'.format(
+                    MAXIMAL_QUALITY))
+
+    lapses = state.lapses
+    if quality < PASSING_QUALITY:
+        repetitions = 0
+        interval = 1
+        lapses += 1
+    else:
+        if state.repetitions == 0:
+            interval = 1
+        elif state.repetitions == 1:
+            interval = 6
+        else:
+            interval = int(round(state.interval * state.ease))
+        repetitions = state.repetitions + 1
+
+    difference = MAXIMAL_QUALITY - quality
+    ease = max(
+            MINIMAL_EASE,
+            state.ease + 0.1 - difference * (0.08 + difference * 0.02))
+
+    return ReviewState(
+            due=now + interval * DAY,
+            interval=interval,
+            ease=ease,
+            repetitions=repetitions,
+            lapses=lapses)
+
+
+def _index_key(due, object_id):
+    """ Returns due index key, which sorts by due time and then by
+    object id.
+    """
+
+    return int(due // INDEX_RESOLUTION) << ID_BITS | object_id
+
+
+def _get_now(now):
+    """ Returns ``now`` (current time, if it is None) as integer UNIX
+    timestamp.
+    """
+
+    if now is None:
+        return int(time.time())
+    return int(now)
+
+
+class Scheduler(persistent.Persistent):
+    """ Schedules reviews of objects of one TagTree.
+    """
+
+    def __init__(self, tree):
+        """
+        :type tree: TagTree
+        """
+
+        self._tree = tree
+        self._states = IOBTree()        # Object id to ReviewState.
+        self._due = LLTreeSet()         # Keys created by _index_key.
+        self._count = Length()          # Number of scheduled objects.
+
+    def _get_id(self, obj):
+        if isinstance(obj, (int, long)):
+            return obj
+        else:
+            return obj.get_id()
+
+    def _set_state(self, object_id, state):
+        old_state = self._states.get(object_id)
+        if old_state is not None:
+            self._due.remove(_index_key(old_state.due, object_id))
+        self._states[object_id] = state
+        self._due.insert(_index_key(state.due, object_id))
+
+    def add(self, obj, now=None):
+        """ Schedules new object, which is due immediately.
+
+        :param obj: TaggedObject id or TaggedObject itself.
+        """
+
+        object_id = self._get_id(obj)
+        if self._states.has_key(object_id):
+            raise KeyError(u'Object is already scheduled.')
+        now = _get_now(now)
+        self._set_state(object_id, ReviewState(
+            due=now, interval=0, ease=INITIAL_EASE, repetitions=0,
+            lapses=0))
+        self._count.change(1)
+
+    def remove(self, obj):
+        """ Stops scheduling object.
+
+        :param obj: TaggedObject id or TaggedObject itself.
+        """
+
+        object_id = self._get_id(obj)
+        state = self._states.pop(object_id)
+        self._due.remove(_index_key(state.due, object_id))
+        self._count.change(-1)
+
+    def get_state(self, obj):
+        """ Returns :py:class:`ReviewState` of object.
+
+        :param obj: TaggedObject id or TaggedObject itself.
+        """
+
+        return self._states[self._get_id(obj)]
+
+    def review(self, obj, quality, now=None):
+        """ Records review of object with answer ``quality`` (from 0 -
+        complete blackout, to 5 - perfect response) and returns new
+        :py:class:`ReviewState`.
+
+        :param obj: TaggedObject id or TaggedObject itself.
+        """
+
+        object_id = self._get_id(obj)
+        now = _get_now(now)
+        state = next_state(self._states[object_id], quality, now)
+        self._set_state(object_id, state)
+        return state
+
+    def count(self):
+        """ Returns number of scheduled objects.
+        """
+
+        return self._count()
+
+    def get_due_ids(self, tags=None, now=None, limit=None):
+        """ Returns list of ids of objects, which are due at ``now``
+        (rounded up to :py:data:`INDEX_RESOLUTION`), the most overdue
+        first.
+
+        If ``tags`` are given, only objects tagged by them are returned.
+        When the tagged id set is small, states of its objects are
+        checked directly, otherwise due index is scanned and each id
+        is checked for membership in the tagged id set.
+
+        :type tags: Tag, TagList, Query or None
+        """
+
+        now = _get_now(now)
+        if limit is not None and limit <= 0:
+            return []
+        max_key = _index_key(now, ID_MASK)
+
+        if tags is None:
+            tagged_ids = None
+        else:
+            tagged_ids = self._tree.get_object_ids(tags)
+            if len(tagged_ids) * 4 < self._count():
+                keys = []
+                for object_id in tagged_ids:
+                    state = self._states.get(object_id)
+                    if state is not None:
+                        key = _index_key(state.due, object_id)
+                        if key <= max_key:
+                            keys.append(key)
+                keys.sort()
+                return [key & ID_MASK for key in keys[:limit]]
+
+        object_ids = []
+        for key in self._due.keys(max=max_key):
+            object_id = key & ID_MASK
+            if tagged_ids is None or object_id in tagged_ids:
+                object_ids.append(object_id)
+                if len(object_ids) == limit:
+                    break
+        return object_ids
+
+    def get_due(self, tags=None, now=None, limit=None):
+        """ Returns list of objects, which are due at ``now``.
+
+        See :py:meth:`get_due_ids` for details.
+        """
+
+        return [
+                self._tree.get_object(object_id)
+                for object_id in self.get_due_ids(tags, now, limit)]
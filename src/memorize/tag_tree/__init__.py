@@ -109,9 +109,27 @@ word: hello
 >>> show_result(TagList(u'a.b.c a.b.d.e'), lambda x: x.value > u'2')
 word: 3
 
+Boolean queries (see :py:class:`Query <memorize.tag_tree.query.Query>`)
+are also supported:
+
+>>> from memorize.tag_tree import compile_query
+>>> show_result(compile_query(u'a.b.c | h'))
+word: 3
+word: 4
+word: 5
+word: 8
+>>> show_result(compile_query(u'a.b & !a.b.c & !a.b.d'))
+word: 6
+word: hello
+>>> show_result(compile_query(u'a.*.d.* & !h'))
+word: 1
+word: 3
+word: 9
+
 """
 
 
 from memorize.tag_tree.tag import Tag, TagList
 from memorize.tag_tree.tagged_object import TaggedObject
 from memorize.tag_tree.tag_tree import TagTree
+from memorize.tag_tree.query import Query, compile_query
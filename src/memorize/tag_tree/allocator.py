@@ -0,0 +1,96 @@
+#!/usr/bin/python
+
+
+""" Allocation of unique object ids for
+:py:class:`TagTree <memorize.tag_tree.tag_tree.TagTree>`.
+
+Ids are reserved in blocks. The persistent :py:class:`IdAllocator` is
+changed only when a block is reserved, and ids of the block are handed
+out from memory of the allocator copy, which is private to each
+database connection. So concurrent writers (import workers, study
+clients) do not conflict on every assigned object, only when they
+reserve blocks at the same moment, which is once per ``block_size``
+objects:
+
+>>> allocator = IdAllocator(block_size=3)
+>>> [allocator.allocate() for i in range(4)]
+[1, 2, 3, 4]
+>>> allocator.reserved()
+7
+
+Block survives invalidations caused by blocks reserved by other
+connections, but it is dropped, when changes of the allocator are
+discarded (abort or savepoint rollback), because the reservation may
+be discarded too. The rest of dropped block is never used, so ids are
+unique, but they are not guaranteed to be consecutive.
+
+"""
+
+
+import weakref
+
+import persistent
+
+
+DEFAULT_BLOCK_SIZE = 1000
+MAX_ID = 2 ** 31 - 1                    # Largest key of IOBTree.
+
+# IdAllocator to ``(next_id, end)`` of block reserved by its copy.
+# Kept outside of objects, because their state is cleared on
+# invalidation.
+_blocks = weakref.WeakKeyDictionary()
+
+
+class IdAllocator(persistent.Persistent):
+    """ Allocates unique integer ids in per-connection blocks.
+    """
+
+    def __init__(self, start=1, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        :param start: The first allocated id.
+        :param block_size: Number of ids reserved at once.
+        """
+
+        self._next = start              # The first not reserved id.
+        self.block_size = block_size
+
+    def reserved(self):
+        """ Returns the first id, which is not reserved yet.
+        """
+
+        return self._next
+
+    def reserve(self, count):
+        """ Reserves ``count`` ids and returns the first of them.
+        """
+
+        first = self._next
+        if first + count - 1 > MAX_ID:
+            raise OverflowError(u'Object ids are exhausted.')
+        self._next = first + count
+        return first
+
+    def allocate(self, is_used=None):
+        """ Returns a new unique id.
+
+        :param is_used:
+            Callable, which returns True, if id is already taken (for
+            example, by object stored before allocator was used). Such
+            ids are skipped.
+        """
+
+        while True:
+            block = _blocks.get(self)
+            if block is None or block[0] >= block[1]:
+                first = self.reserve(self.block_size)
+                block = (first, first + self.block_size)
+            object_id = block[0]
+            _blocks[self] = (object_id + 1, block[1])
+            if is_used is None or not is_used(object_id):
+                return object_id
+
+    def _p_invalidate(self):
+        if self._p_changed:
+            # Changes are discarded, block reservation may be among them.
+            _blocks.pop(self, None)
+        super(IdAllocator, self)._p_invalidate()
@@ -0,0 +1,212 @@
+#!/usr/bin/python
+
+
+""" Bulk loading of objects into
+:py:class:`TagTree <memorize.tag_tree.tag_tree.TagTree>`.
+
+Records are read lazily from CSV, TSV or JSON-lines streams, converted
+to objects by a factory and loaded in chunks, so memory stays bounded
+even for very large word lists:
+
+>>> from StringIO import StringIO
+>>> from memorize.tag_tree import TagTree, TaggedObject, Tag
+>>> class Word(TaggedObject):
+...     def __init__(self, record):
+...         super(Word, self).__init__()
+...         self.value = record[u'value']
+>>> stream = StringIO(
+...     'value\\ttags\\n'
+...     'gehen\\tde.verbs.irregular de.a1\\n'
+...     'Haus\\tde.nouns de.a1\\n')
+>>> tree = TagTree()
+>>> loader = BulkLoader(tree, Word)
+>>> loader.load(read_tsv(stream))
+2
+>>> sorted(word.value for word in tree.get_objects(Tag(u'de.a1')))
+[u'Haus', u'gehen']
+
+Missing tags are created automatically. If ``tree`` is stored in ZODB,
+a savepoint is made after every chunk (so changed objects can be
+removed from the connection cache) and, if ``commit_size`` is given,
+transaction is committed after that many records.
+
+"""
+
+
+import csv
+import json
+
+from memorize.tag_tree.tag import Tag, TagList
+
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_TAGS_FIELD = u'tags'
+
+
+def read_csv(stream, delimiter=',', encoding='utf-8'):
+    """ Yields records (dicts of unicode strings) from CSV stream. The
+    first row have to contain field names.
+    """
+
+    reader = csv.reader(stream, delimiter=delimiter)
+    try:
+        fields = [field.decode(encoding) for field in next(reader)]
+    except StopIteration:
+        return
+    for row in reader:
+        if row:
+            yield dict(zip(
+                fields, [value.decode(encoding) for value in row]))
+
+
+def read_tsv(stream, encoding='utf-8'):
+    """ Yields records (dicts of unicode strings) from tab separated
+    values stream. The first row have to contain field names.
+    """
+
+    return read_csv(stream, delimiter='\t', encoding=encoding)
+
+
+def read_jsonl(stream, encoding='utf-8'):
+    """ Yields records from JSON-lines stream (one JSON object per line).
+    """
+
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line, encoding=encoding)
+
+
+READERS = {
+    'csv': read_csv,
+    'tsv': read_tsv,
+    'jsonl': read_jsonl,
+    }
+
+
+def read_records(stream, format):
+    """ Yields records from ``stream`` in ``format``, which is one of
+    :py:data:`READERS` keys.
+    """
+
+    try:
+        reader = READERS[format]
+    except KeyError:
+        raise ValueError(u'Unknown records format: {0}.'.format(format))
+    return reader(stream)
+
+
+class BulkLoader(object):
+    """ Loads objects into TagTree in chunks.
+    """
+
+    def __init__(
+            self, tree, factory,
+            tags_field=DEFAULT_TAGS_FIELD,
+            chunk_size=DEFAULT_CHUNK_SIZE,
+            commit_size=None,
+            transaction_manager=None,
+            ):
+        """
+
+        :param tree: Tree, to which objects are loaded.
+        :type tree: TagTree
+        :param factory:
+            Callable, which takes record and returns not assigned
+            :py:class:`TaggedObject
+            <memorize.tag_tree.tagged_object.TaggedObject>`.
+        :param tags_field:
+            Record field with tags of object. It can be a unicode string
+            (parsed as :py:class:`TagList <memorize.tag_tree.tag.TagList>`)
+            or a list of tags.
+        :param chunk_size: Number of records loaded at once.
+        :param commit_size:
+            Number of records, after which transaction is committed.
+            If None, transaction is never committed, and that is left
+            to caller.
+        :param transaction_manager:
+            Used for savepoints and commits. Default is the transaction
+            manager of connection of ``tree``.
+
+        """
+
+        self.tree = tree
+        self.factory = factory
+        self.tags_field = tags_field
+        self.chunk_size = chunk_size
+        self.commit_size = commit_size
+        self.transaction_manager = transaction_manager
+        self._nodes = {}                # Tag to TagNode cache.
+
+    def load(self, records):
+        """ Loads all records and returns number of loaded objects.
+        """
+
+        count = 0
+        uncommitted = 0
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= self.chunk_size:
+                self.load_chunk(chunk)
+                count += len(chunk)
+                uncommitted += len(chunk)
+                chunk = []
+                uncommitted = self._finish_chunk(uncommitted)
+        if chunk:
+            self.load_chunk(chunk)
+            count += len(chunk)
+            uncommitted += len(chunk)
+            self._finish_chunk(uncommitted)
+        return count
+
+    def load_chunk(self, records):
+        """ Creates, assigns and tags objects for ``records``.
+
+        Each distinct tag is resolved once and every affected TagNode
+        is updated once per chunk.
+        """
+
+        tagged = {}                     # TagNode -> list of objects.
+        for record in records:
+            obj = self.factory(record)
+            self.tree.assign(obj)
+            tags = record.get(self.tags_field) or []
+            if isinstance(tags, unicode):
+                tags = TagList(tags)
+            for tag in set([Tag(tag) for tag in tags]):
+                node = self._get_node(tag)
+                obj.attach_tag(tag, node)
+                tagged.setdefault(node, []).append(obj)
+
+        for node, objects in tagged.iteritems():
+            node.add_objects(objects)
+
+    def _get_node(self, tag):
+        """ Returns TagNode for tag, creating it, if needed.
+        """
+
+        try:
+            return self._nodes[tag]
+        except KeyError:
+            self.tree.create_tag(tag)
+            node = self._nodes[tag] = self.tree.get_tag_node(tag)
+            return node
+
+    def _finish_chunk(self, uncommitted):
+        """ Makes savepoint or commits transaction. Returns number of
+        not committed records.
+        """
+
+        jar = self.tree._p_jar
+        if jar is None:
+            return uncommitted
+        transaction_manager = (
+                self.transaction_manager or jar.transaction_manager)
+        if self.commit_size is not None and uncommitted >= self.commit_size:
+            transaction_manager.commit()
+            uncommitted = 0
+        else:
+            transaction_manager.savepoint(optimistic=True)
+        jar.cacheGC()
+        return uncommitted
@@ -13,3 +13,8 @@ class TagTreeError(Exception):
 class IntegrityError(TagTreeError):
     """ :py:class:`TagTree` integrity check failed.
     """
+
+
+class QuerySyntaxError(TagTreeError):
+    """ Query expression could not be parsed.
+    """
@@ -0,0 +1,394 @@
+#!/usr/bin/python
+
+
+""" Declarative filters for
+:py:meth:`TagTree.get_objects
+<memorize.tag_tree.tag_tree.TagTree.get_objects>`.
+
+A filter is a callable, which takes object and returns True, if object
+passes it, so it can be used everywhere, where a lambda can:
+
+>>> class Word(object):
+...     def __init__(self, value, ease):
+...         self.value = value
+...         self.ease = ease
+>>> word = Word(u'hello', 2.5)
+>>> (Attribute('value') > u'2')(word)
+True
+>>> ((Attribute('value') > u'2') & (Attribute('ease') < 2.0))(word)
+False
+>>> Attribute('value').is_in([u'hello', u'world'])(word)
+True
+
+Unlike lambdas, declarative filters can be answered by attribute
+indexes of the tree (see :py:meth:`Filter.split`), so objects, which
+are excluded by index, are never loaded. Filters on attributes, which
+are not indexed, are evaluated for each object as before.
+
+An index is any object with attribute ``attribute`` (name of indexed
+attribute), which provides some of these methods, each returning a set
+of object ids from :py:mod:`BTrees.IIBTree` family:
+
++   ``search_values(values)`` - ids of objects, which attribute value
+    is one of ``values``;
++   ``search_range(min, max, excludemin, excludemax)`` - ids of
+    objects, which attribute value is in the range (None means
+    unbounded);
++   ``search_prefix(prefix)`` - ids of objects, which attribute value
+    starts with ``prefix``;
++   ``search_folded_prefix(prefix)`` - the same ignoring case;
++   ``search_keywords(keywords)`` - ids of objects, which attribute
+    value contains at least one of ``keywords``;
++   ``search_similar(value, min_similarity)`` - ids of objects, which
+    attribute value is similar to ``value``.
+
+See :py:mod:`memorize.tag_tree.indexes` for implementations.
+
+"""
+
+
+import operator
+
+from memorize import text
+from memorize.tag_tree.query import intersect, unite
+
+
+_MISSING = object()
+
+
+def find_index(indexes, attribute, method):
+    """ Returns index of ``attribute``, which has ``method``, or None.
+
+    :param indexes: Mapping from index name to index.
+    """
+
+    for index in indexes.values():
+        if index.attribute == attribute and hasattr(index, method):
+            return index
+    return None
+
+
+class Filter(object):
+    """ Base class of declarative filters.
+    """
+
+    def __call__(self, obj):
+        """ Returns True if object passes filter.
+        """
+
+        raise NotImplementedError()
+
+    def split(self, indexes):
+        """ Splits filter to part answered by ``indexes`` and part,
+        which have to be evaluated for each object.
+
+        Returns tuple ``(ids, residual)``, where ``ids`` is set of ids
+        of objects, which pass indexed part of filter (None if no part
+        of filter can be answered by indexes), and ``residual`` is the
+        rest of filter (None if nothing is left).
+
+        :param indexes: Mapping from index name to index.
+        """
+
+        return None, self
+
+    def __and__(self, other):
+        return AllOf([self, other])
+
+    def __or__(self, other):
+        return AnyOf([self, other])
+
+
+class Comparison(Filter):
+    """ Compares object attribute to value.
+    """
+
+    operators = {
+            'eq': operator.eq,
+            'ne': operator.ne,
+            'lt': operator.lt,
+            'le': operator.le,
+            'gt': operator.gt,
+            'ge': operator.ge,
+            }
+
+    def __init__(self, attribute, operation, value):
+        """
+        :param attribute: Name of attribute.
+        :param operation:
+            One of ``eq``, ``ne``, ``lt``, ``le``, ``gt``, ``ge``.
+            ``ne`` is never answered by index.
+        """
+
+        self.attribute = attribute
+        self.operation = operation
+        self.value = value
+        self._operator = self.operators[operation]
+
+    def __call__(self, obj):
+        value = getattr(obj, self.attribute, _MISSING)
+        return value is not _MISSING and self._operator(value, self.value)
+
+    def split(self, indexes):
+        if self.operation == 'eq':
+            index = find_index(indexes, self.attribute, 'search_values')
+            if index is not None:
+                return index.search_values([self.value]), None
+        elif self.operation != 'ne':
+            index = find_index(indexes, self.attribute, 'search_range')
+            if index is None:
+                pass
+            elif self.operation in ('lt', 'le'):
+                return index.search_range(
+                        None, self.value,
+                        False, self.operation == 'lt'), None
+            else:
+                return index.search_range(
+                        self.value, None,
+                        self.operation == 'gt', False), None
+        return None, self
+
+
+class Between(Filter):
+    """ Checks if object attribute is in range (bounds are included).
+    """
+
+    def __init__(self, attribute, min, max):
+        self.attribute = attribute
+        self.min = min
+        self.max = max
+
+    def __call__(self, obj):
+        value = getattr(obj, self.attribute, _MISSING)
+        return value is not _MISSING and self.min <= value <= self.max
+
+    def split(self, indexes):
+        index = find_index(indexes, self.attribute, 'search_range')
+        if index is None:
+            return None, self
+        return index.search_range(self.min, self.max, False, False), None
+
+
+class In(Filter):
+    """ Checks if object attribute is one of values.
+    """
+
+    def __init__(self, attribute, values):
+        self.attribute = attribute
+        self.values = frozenset(values)
+
+    def __call__(self, obj):
+        value = getattr(obj, self.attribute, _MISSING)
+        return value is not _MISSING and value in self.values
+
+    def split(self, indexes):
+        index = find_index(indexes, self.attribute, 'search_values')
+        if index is None:
+            return None, self
+        return index.search_values(sorted(self.values)), None
+
+
+class StartsWith(Filter):
+    """ Checks if object attribute (a string) starts with prefix.
+    """
+
+    def __init__(self, attribute, prefix, ignore_case=False):
+        self.attribute = attribute
+        self.prefix = prefix
+        self.ignore_case = ignore_case
+
+    def __call__(self, obj):
+        value = getattr(obj, self.attribute, _MISSING)
+        if value is _MISSING:
+            return False
+        elif self.ignore_case:
+            return value.lower().startswith(self.prefix.lower())
+        else:
+            return value.startswith(self.prefix)
+
+    def split(self, indexes):
+        if self.ignore_case:
+            method = 'search_folded_prefix'
+        else:
+            method = 'search_prefix'
+        index = find_index(indexes, self.attribute, method)
+        if index is None:
+            return None, self
+        return getattr(index, method)(self.prefix), None
+
+
+class Contains(Filter):
+    """ Checks if object attribute (a collection) contains keyword.
+    """
+
+    def __init__(self, attribute, keyword):
+        self.attribute = attribute
+        self.keyword = keyword
+
+    def __call__(self, obj):
+        value = getattr(obj, self.attribute, _MISSING)
+        return value is not _MISSING and self.keyword in value
+
+    def split(self, indexes):
+        index = find_index(indexes, self.attribute, 'search_keywords')
+        if index is None:
+            return None, self
+        return index.search_keywords([self.keyword]), None
+
+
+class Similar(Filter):
+    """ Checks if object attribute (a string) is similar to value (see
+    :py:func:`memorize.text.similarity`). Only trigram index, which
+    folds umlauts the same way as filter, is used.
+    """
+
+    def __init__(self, attribute, value, min_similarity, fold_umlauts=True):
+        self.attribute = attribute
+        self.value = value
+        self.min_similarity = min_similarity
+        self.fold_umlauts = fold_umlauts
+
+    def __call__(self, obj):
+        value = getattr(obj, self.attribute, None)
+        return (
+                isinstance(value, basestring) and
+                text.similarity(value, self.value, self.fold_umlauts) >=
+                self.min_similarity)
+
+    def split(self, indexes):
+        for index in indexes.values():
+            if (index.attribute == self.attribute and
+                    hasattr(index, 'search_similar') and
+                    index.fold_umlauts == self.fold_umlauts):
+                return (
+                        index.search_similar(
+                            self.value, self.min_similarity),
+                        None)
+        return None, self
+
+
+class AllOf(Filter):
+    """ Object passes, if it passes all filters.
+    """
+
+    def __init__(self, filters):
+        self.filters = list(filters)
+
+    def __call__(self, obj):
+        for filter in self.filters:
+            if not filter(obj):
+                return False
+        return True
+
+    def split(self, indexes):
+        id_sets = []
+        residuals = []
+        for filter in self.filters:
+            ids, residual = split_filter(filter, indexes)
+            if ids is not None:
+                id_sets.append(ids)
+            if residual is not None:
+                residuals.append(residual)
+
+        if id_sets:
+            ids = intersect(id_sets)
+        else:
+            ids = None
+        if not residuals:
+            residual = None
+        elif len(residuals) == 1:
+            residual = residuals[0]
+        else:
+            residual = AllOf(residuals)
+        return ids, residual
+
+
+class AnyOf(Filter):
+    """ Object passes, if it passes at least one filter.
+    """
+
+    def __init__(self, filters):
+        self.filters = list(filters)
+
+    def __call__(self, obj):
+        for filter in self.filters:
+            if filter(obj):
+                return True
+        return False
+
+    def split(self, indexes):
+        id_sets = []
+        for filter in self.filters:
+            ids, residual = split_filter(filter, indexes)
+            if ids is None or residual is not None:
+                return None, self
+            id_sets.append(ids)
+        return unite(id_sets), None
+
+
+class Attribute(object):
+    """ Builder of filters on object attribute.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __eq__(self, value):
+        return Comparison(self.name, 'eq', value)
+
+    def __ne__(self, value):
+        return Comparison(self.name, 'ne', value)
+
+    def __lt__(self, value):
+        return Comparison(self.name, 'lt', value)
+
+    def __le__(self, value):
+        return Comparison(self.name, 'le', value)
+
+    def __gt__(self, value):
+        return Comparison(self.name, 'gt', value)
+
+    def __ge__(self, value):
+        return Comparison(self.name, 'ge', value)
+
+    def between(self, min, max):
+        """ Returns filter, which checks ``min <= attribute <= max``.
+        """
+
+        return Between(self.name, min, max)
+
+    def is_in(self, values):
+        """ Returns filter, which checks ``attribute in values``.
+        """
+
+        return In(self.name, values)
+
+    def startswith(self, prefix, ignore_case=False):
+        """ Returns filter, which checks ``attribute.startswith(prefix)``.
+        """
+
+        return StartsWith(self.name, prefix, ignore_case)
+
+    def contains(self, keyword):
+        """ Returns filter, which checks ``keyword in attribute``.
+        """
+
+        return Contains(self.name, keyword)
+
+    def similar_to(self, value, min_similarity=0.5, fold_umlauts=True):
+        """ Returns filter, which checks if attribute is similar to
+        ``value``.
+        """
+
+        return Similar(self.name, value, min_similarity, fold_umlauts)
+
+
+def split_filter(filter, indexes):
+    """ Same as :py:meth:`Filter.split`, but also accepts any callable,
+    which is never answered by index.
+    """
+
+    if isinstance(filter, Filter):
+        return filter.split(indexes)
+    else:
+        return None, filter
@@ -0,0 +1,270 @@
+#!/usr/bin/python
+
+
+""" Secondary attribute indexes of
+:py:class:`TagTree <memorize.tag_tree.tag_tree.TagTree>`.
+
+Indexes are registered in tree by
+:py:meth:`TagTree.add_index <memorize.tag_tree.tag_tree.TagTree.add_index>`
+and are kept up to date, when objects are assigned to tree or their
+indexed attributes are changed. They are used by
+:py:mod:`filters <memorize.tag_tree.filters>` passed to
+:py:meth:`TagTree.get_objects
+<memorize.tag_tree.tag_tree.TagTree.get_objects>`:
+
+>>> from memorize.tag_tree import TagTree, TaggedObject, Tag
+>>> from memorize.tag_tree.filters import Attribute
+>>> class Word(TaggedObject):
+...     def __init__(self, value):
+...         super(Word, self).__init__()
+...         self.value = value
+>>> tree = TagTree()
+>>> tree.add_index('value', FieldIndex('value'))
+>>> tree.create_tag(Tag(u'de'))
+>>> for value in [u'verstehen', u'Haus', u'vergessen', u'gehen']:
+...     word = Word(value)
+...     tree.assign(word)
+...     word.add_tag(Tag(u'de'))
+>>> word.value = u'vergehen'
+>>> [word.value for word in tree.get_objects(
+...     Tag(u'de'), Attribute('value').startswith(u'ver'))]
+[u'verstehen', u'vergessen', u'vergehen']
+
+"""
+
+
+import persistent
+from BTrees.OOBTree import OOBTree
+from BTrees.IOBTree import IOBTree
+from BTrees.IIBTree import IIBucket, IITreeSet, multiunion
+from BTrees.IIBTree import weightedUnion, weightedIntersection
+from BTrees.Length import Length
+
+from memorize import text
+
+
+_MISSING = object()
+
+
+class Index(persistent.Persistent):
+    """ Base class of indexes, which map keys computed from attribute
+    value to sets of object ids.
+    """
+
+    def __init__(self, attribute):
+        """
+        :param attribute: Name of indexed attribute.
+        """
+
+        self.attribute = attribute
+        self._index = OOBTree()         # Key to IITreeSet of object ids.
+        self._unindex = IOBTree()       # Object id to tuple of keys.
+        self._length = Length()         # Number of indexed objects.
+
+    def get_keys(self, value):
+        """ Returns list of keys, under which object with attribute
+        ``value`` is indexed.
+        """
+
+        raise NotImplementedError()
+
+    def get_object_keys(self, obj):
+        """ Returns sorted tuple of keys, under which object has to be
+        indexed. Index itself is not changed.
+        """
+
+        value = getattr(obj, self.attribute, _MISSING)
+        if value is _MISSING:
+            return ()
+        return tuple(sorted(set(self.get_keys(value))))
+
+    def index_object(self, object_id, obj, keys=None):
+        """ Indexes (or reindexes) object.
+
+        :param keys:
+            Keys of object returned by :py:meth:`get_object_keys`. They
+            are computed, if not given.
+        """
+
+        if keys is None:
+            keys = self.get_object_keys(obj)
+        old_keys = self._unindex.get(object_id, ())
+        if keys == old_keys:
+            return
+
+        for key in old_keys:
+            if key not in keys:
+                self._remove(key, object_id)
+        for key in keys:
+            if key not in old_keys:
+                object_ids = self._index.get(key)
+                if object_ids is None:
+                    object_ids = self._index[key] = IITreeSet()
+                object_ids.insert(object_id)
+
+        if keys:
+            self._unindex[object_id] = keys
+            if not old_keys:
+                self._length.change(1)
+        else:
+            del self._unindex[object_id]
+            self._length.change(-1)
+
+    def unindex_object(self, object_id):
+        """ Removes object from index.
+        """
+
+        keys = self._unindex.pop(object_id, ())
+        for key in keys:
+            self._remove(key, object_id)
+        if keys:
+            self._length.change(-1)
+
+    def _remove(self, key, object_id):
+        object_ids = self._index[key]
+        object_ids.remove(object_id)
+        if not object_ids:
+            del self._index[key]
+
+    def count(self):
+        """ Returns number of indexed objects.
+        """
+
+        return self._length()
+
+    def _search_keys(self, keys):
+        """ Returns union of id sets of ``keys``.
+        """
+
+        return multiunion([
+            self._index[key] for key in keys if self._index.has_key(key)])
+
+
+class FieldIndex(Index):
+    """ Index of attribute values sorted by value. Supports lookups by
+    values, ranges and (for string values) prefixes.
+    """
+
+    def get_keys(self, value):
+        return [value]
+
+    def search_values(self, values):
+        """ Returns ids of objects, which attribute value is one of
+        ``values``.
+        """
+
+        return self._search_keys(values)
+
+    def search_range(self, min, max, excludemin=False, excludemax=False):
+        """ Returns ids of objects, which attribute value is between
+        ``min`` and ``max``. None means unbounded.
+        """
+
+        return multiunion(list(self._index.values(
+            min, max, excludemin=excludemin, excludemax=excludemax)))
+
+    def search_prefix(self, prefix):
+        """ Returns ids of objects, which attribute value starts with
+        ``prefix``.
+        """
+
+        return multiunion(list(self._index.values(
+            prefix, prefix + u'\uffff')))
+
+
+class KeywordIndex(Index):
+    """ Index of attribute, which value is a collection of keywords.
+    """
+
+    def get_keys(self, value):
+        return value
+
+    def search_keywords(self, keywords):
+        """ Returns ids of objects, which have at least one of
+        ``keywords``.
+        """
+
+        return self._search_keys(keywords)
+
+
+class PrefixIndex(Index):
+    """ Case insensitive index of text attribute, which supports only
+    prefix lookups. Values, which are not strings, are not indexed.
+    """
+
+    def get_keys(self, value):
+        if not isinstance(value, basestring):
+            return []
+        return [value.lower()]
+
+    def search_folded_prefix(self, prefix):
+        """ Returns ids of objects, which attribute value starts with
+        ``prefix`` ignoring case.
+        """
+
+        prefix = prefix.lower()
+        return multiunion(list(self._index.values(
+            prefix, prefix + u'\uffff')))
+
+
+class TrigramIndex(Index):
+    """ Index of trigrams of normalized (see
+    :py:func:`memorize.text.normalize`) text attribute, which supports
+    ranked fuzzy lookups. Values, which are not strings, are not
+    indexed.
+    """
+
+    def __init__(self, attribute, fold_umlauts=True):
+        """
+        :param attribute: Name of indexed attribute.
+        :param fold_umlauts: Passed to :py:func:`memorize.text.normalize`.
+        """
+
+        super(TrigramIndex, self).__init__(attribute)
+        self.fold_umlauts = fold_umlauts
+
+    def get_keys(self, value):
+        if not isinstance(value, basestring):
+            return []
+        return text.trigrams(text.normalize(value, self.fold_umlauts))
+
+    def rank(self, value, object_ids=None, min_similarity=0.0, limit=None):
+        """ Returns list of ``(similarity, object_id)`` pairs of objects,
+        which attribute is similar to ``value``, the most similar first.
+
+        Candidates are found by counting common trigrams in the id sets
+        of trigrams of ``value``, so objects without common trigrams
+        are never considered.
+
+        :param object_ids: If not None, only these objects are ranked.
+        :param min_similarity: Minimal returned similarity.
+        :param limit: Maximal number of returned pairs.
+        """
+
+        value_trigrams = self.get_keys(value)
+        counts = IIBucket()
+        for trigram in value_trigrams:
+            object_ids_with_trigram = self._index.get(trigram)
+            if object_ids_with_trigram is not None:
+                _, counts = weightedUnion(counts, object_ids_with_trigram)
+        if object_ids is not None:
+            _, counts = weightedIntersection(counts, object_ids, 1, 0)
+
+        results = []
+        for object_id, common in counts.items():
+            score = text.dice(
+                    common, len(value_trigrams),
+                    len(self._unindex[object_id]))
+            if score >= min_similarity:
+                results.append((score, object_id))
+        results.sort(key=lambda result: (-result[0], result[1]))
+        return results[:limit]
+
+    def search_similar(self, value, min_similarity):
+        """ Returns ids of objects, which attribute similarity to
+        ``value`` is at least ``min_similarity``.
+        """
+
+        return IITreeSet([
+            object_id
+            for _, object_id in self.rank(value, None, min_similarity)])
@@ -0,0 +1,127 @@
+#!/usr/bin/python
+
+
+""" BTrees, which store membership of objects in
+:py:class:`TagNode <memorize.tag_tree.tag_node.TagNode>` and
+:py:class:`TagTree <memorize.tag_tree.tag_tree.TagTree>`.
+
+They are used in the same way as their bases, but they are friendlier
+to concurrent writers, which tag different objects by the same popular
+tag:
+
++   Buckets are larger, so they are split less often. Concurrent
+    changes of one bucket are merged by ZODB conflict resolution, but
+    concurrent split of a bucket is not, and new object ids are always
+    added to the last bucket.
++   Concurrent changes of the number of tags of the same object in
+    :py:class:`CounterTree` are merged by adding their differences, as
+    long as the object stays in the tree on both sides. (Base
+    :py:class:`BTrees.IIBTree.IIBucket` treats two equal changes as one
+    and rejects different ones.)
+
+>>> old = CounterBucket([(1, 1), (2, 1)]).__getstate__()
+>>> committed = CounterBucket([(1, 2), (2, 1)]).__getstate__()
+>>> new = CounterBucket([(1, 3), (2, 1), (3, 1)]).__getstate__()
+>>> CounterBucket()._p_resolveConflict(old, committed, new)
+((1, 4, 2, 1, 3, 1),)
+
+"""
+
+
+from BTrees.IIBTree import IIBTree, IIBucket
+from BTrees.IOBTree import IOBTree, IOBucket
+from ZODB.POSException import ConflictError
+
+
+LEAF_SIZE = 500                         # Maximal number of keys in bucket.
+
+
+class MembershipBucket(IOBucket):
+    """ Bucket of :py:class:`MembershipTree`.
+    """
+
+
+class MembershipTree(IOBTree):
+    """ Object id to object mapping with large buckets.
+    """
+
+    _bucket_type = MembershipBucket
+    max_leaf_size = LEAF_SIZE
+
+
+def _same_reference(reference1, reference2):
+    """ Returns True if references to next bucket are equal. During
+    conflict resolution they are
+    :py:class:`ZODB.ConflictResolution.PersistentReference`, which
+    raises ValueError, when compared to different one.
+    """
+
+    try:
+        return reference1 == reference2
+    except ValueError:
+        return False
+
+
+def _merge_counts(old, committed, new):
+    """ Returns bucket state, in which changes of counts in
+    ``committed`` and ``new`` states are added, or None, if that is not
+    possible.
+    """
+
+    if not len(old) == len(committed) == len(new):
+        return None
+    if len(old) == 2 and not (
+            _same_reference(old[1], committed[1]) and
+            _same_reference(old[1], new[1])):
+        return None                     # Bucket was split.
+    if old[0] and not (committed[0] and new[0]):
+        return None                     # Emptied bucket is unlinked.
+
+    old_counts, committed_counts, new_counts = [
+            dict(zip(state[0][::2], state[0][1::2]))
+            for state in (old, committed, new)]
+    counts = {}
+    for key in set(old_counts) | set(committed_counts) | set(new_counts):
+        old_count = old_counts.get(key)
+        committed_count = committed_counts.get(key)
+        new_count = new_counts.get(key)
+        if committed_count == old_count:
+            count = new_count
+        elif new_count == old_count:
+            count = committed_count
+        elif None in (old_count, committed_count, new_count):
+            # Object was added or removed on both sides, so size
+            # counters of both sides count it.
+            return None
+        else:
+            count = committed_count + new_count - old_count
+            if count <= 0:
+                return None
+        if count is not None:
+            counts[key] = count
+
+    items = []
+    for key in sorted(counts):
+        items.extend((key, counts[key]))
+    return (tuple(items),) + tuple(old[1:])
+
+
+class CounterBucket(IIBucket):
+    """ Bucket of :py:class:`CounterTree`.
+    """
+
+    def _p_resolveConflict(self, old, committed, new):
+        state = _merge_counts(old, committed, new)
+        if state is None:
+            raise ConflictError(
+                    u'Conflicting changes of object tag counts.')
+        return state
+
+
+class CounterTree(IIBTree):
+    """ Object id to number of tags mapping with large buckets, which
+    merges concurrent changes of counts.
+    """
+
+    _bucket_type = CounterBucket
+    max_leaf_size = LEAF_SIZE
@@ -0,0 +1,357 @@
+#!/usr/bin/python
+
+
+""" Queries and set operations used to answer
+:py:class:`TagTree <memorize.tag_tree.tag_tree.TagTree>` queries.
+
+Every tag is resolved to a set of object ids and the result of a query
+is computed by combining these sets, so
+:py:class:`TaggedObject <memorize.tag_tree.tagged_object.TaggedObject>`
+instances have to be loaded only for the final ids:
+
+>>> from BTrees.IIBTree import IISet
+>>> list(intersect([IISet([1, 2, 3, 4]), IISet([2, 4, 6]), IISet([4])]))
+[4]
+
+:py:class:`Query` is a boolean expression over tags. Supported
+operators (from the lowest to the highest priority) are ``|`` (or),
+``&`` (and; tags separated just by whitespace are also joined by and)
+and ``!`` (not). A tag level ``*`` matches any single level:
+
+>>> query = Query(u'a.b & (h | x.y) & !a.b.c')
+>>> print unicode(query)
+(a.b & (h | x.y) & !a.b.c)
+>>> print unicode(Query(u'a.*.e d'))
+(a.*.e & d)
+
+Queries are parsed once, so :py:func:`compile_query` should be
+preferred, which caches recently used queries:
+
+>>> compile_query(u'a.b | h') is compile_query(u'a.b | h')
+True
+
+"""
+
+
+import re
+import collections
+
+from BTrees.IIBTree import IISet
+from BTrees.IIBTree import intersection, difference, multiunion
+
+from memorize.tag_tree.tag import Tag, DEFAULT_TAG_LEVEL_SEPARATOR
+from memorize.tag_tree.exceptions import QuerySyntaxError
+
+
+QUERY_CACHE_SIZE = 128
+WILDCARD = u'*'
+
+TOKEN_RE = re.compile(
+        ur'\s*(?:([()&|!])|([^\s()&|!]+))', flags=re.UNICODE)
+
+
+def intersect(id_sets, key=len):
+    """ Returns intersection of all ``id_sets``.
+
+    Sets are intersected smallest-first, so the size of the largest set
+    does not matter, when some of the sets are small. Intersection
+    stops as soon as the result becomes empty.
+
+    :type id_sets: list of IIBTree family sets or mappings
+    :param key:
+        Function, which returns size of set. If None, sets are
+        expected to be already sorted.
+    """
+
+    if key is not None:
+        id_sets = sorted(id_sets, key=key)
+    if not id_sets:
+        return IISet()
+
+    result = id_sets[0]
+    for id_set in id_sets[1:]:
+        if not result:
+            break
+        result = intersection(result, id_set)
+    return result
+
+
+def unite(id_sets):
+    """ Returns union of all ``id_sets``.
+    """
+
+    return multiunion(list(id_sets))
+
+
+class TagTerm(object):
+    """ Objects tagged by tag or any of its descendants. Tag, which
+    does not exist in tree, matches no objects.
+    """
+
+    def __init__(self, tag):
+        self.tag = tag
+
+    def evaluate(self, tree):
+        """ Returns id set of objects, which match term in ``tree``.
+        """
+
+        try:
+            tag_node = tree.get_tag_node(self.tag)
+        except KeyError:
+            return IISet()
+        return tag_node.get_object_ids()
+
+    def __unicode__(self):
+        return unicode(self.tag)
+
+
+class PatternTerm(object):
+    """ Objects tagged by any tag, which matches pattern. Pattern level
+    :py:data:`WILDCARD` matches any single level.
+    """
+
+    def __init__(self, levels):
+        self.levels = tuple(levels)
+
+    def evaluate(self, tree):
+        """ Returns id set of objects, which match term in ``tree``.
+        """
+
+        nodes = [tree.get_root_node()]
+        for level in self.levels:
+            if level == WILDCARD:
+                nodes = [
+                        child
+                        for node in nodes
+                        for child in node.get_child_nodes()]
+            else:
+                nodes = [
+                        node.get_child_node(level)
+                        for node in nodes
+                        if node.has_child_node(level)]
+        return unite([node.get_object_ids() for node in nodes])
+
+    def __unicode__(self):
+        return DEFAULT_TAG_LEVEL_SEPARATOR.join(self.levels)
+
+
+class Not(object):
+    """ Objects, which do not match operand.
+    """
+
+    def __init__(self, operand):
+        self.operand = operand
+
+    def evaluate(self, tree):
+        """ Returns id set of objects in ``tree``, which do not match
+        operand.
+        """
+
+        return difference(
+                tree.get_all_object_ids(), self.operand.evaluate(tree))
+
+    def __unicode__(self):
+        return u'!' + unicode(self.operand)
+
+
+class And(object):
+    """ Objects, which match all operands.
+    """
+
+    def __init__(self, operands):
+        self.operands = operands
+
+    def evaluate(self, tree):
+        """ Returns intersection of id sets of operands in ``tree``.
+
+        Negated operands are subtracted from the intersection of the
+        other ones, so the set of all objects is needed only if all
+        operands are negated.
+        """
+
+        positive = [
+                operand.evaluate(tree)
+                for operand in self.operands
+                if not isinstance(operand, Not)]
+        if positive:
+            result = intersect(positive)
+        else:
+            result = tree.get_all_object_ids()
+        for operand in self.operands:
+            if not result:
+                break
+            if isinstance(operand, Not):
+                result = difference(result, operand.operand.evaluate(tree))
+        return result
+
+    def __unicode__(self):
+        return u'({0})'.format(u' & '.join(
+            [unicode(operand) for operand in self.operands]))
+
+
+class Or(object):
+    """ Objects, which match at least one operand.
+    """
+
+    def __init__(self, operands):
+        self.operands = operands
+
+    def evaluate(self, tree):
+        """ Returns union of id sets of operands in ``tree``.
+        """
+
+        return unite([operand.evaluate(tree) for operand in self.operands])
+
+    def __unicode__(self):
+        return u'({0})'.format(u' | '.join(
+            [unicode(operand) for operand in self.operands]))
+
+
+class Query(object):
+    """ Compiled boolean expression over tags.
+    """
+
+    def __init__(self, expression):
+        """
+        :type expression: unicode
+        """
+
+        self.expression = expression
+        self._tokens = self._tokenize(expression)
+        self._position = 0
+        self.root = self._parse_or()
+        if self._peek() is not None:
+            raise QuerySyntaxError(
+                    u'Unexpected {0!r} in query {1!r}.'.format(
+                        self._peek(), expression))
+        del self._tokens, self._position
+
+    def evaluate(self, tree):
+        """ Returns id set of objects in ``tree``, which match query.
+        """
+
+        return self.root.evaluate(tree)
+
+    def __unicode__(self):
+        return unicode(self.root)
+
+    def _tokenize(self, expression):
+        """ Splits expression to operators and tags.
+        """
+
+        tokens = []
+        position = 0
+        expression = expression.rstrip()
+        while position < len(expression):
+            match = TOKEN_RE.match(expression, position)
+            tokens.append(match.group(1) or match.group(2))
+            position = match.end()
+        return tokens
+
+    def _peek(self):
+        if self._position < len(self._tokens):
+            return self._tokens[self._position]
+        else:
+            return None
+
+    def _next(self):
+        token = self._peek()
+        if token is None:
+            raise QuerySyntaxError(
+                    u'Unexpected end of query {0!r}.'.format(
+                        self.expression))
+        self._position += 1
+        return token
+
+    def _parse_or(self):
+        operands = [self._parse_and()]
+        while self._peek() == u'|':
+            self._next()
+            operands.append(self._parse_and())
+        if len(operands) == 1:
+            return operands[0]
+        return Or(operands)
+
+    def _parse_and(self):
+        operands = [self._parse_not()]
+        while self._peek() not in (None, u'|', u')'):
+            if self._peek() == u'&':
+                self._next()
+            operands.append(self._parse_not())
+        if len(operands) == 1:
+            return operands[0]
+        return And(operands)
+
+    def _parse_not(self):
+        if self._peek() == u'!':
+            self._next()
+            return Not(self._parse_not())
+        return self._parse_atom()
+
+    def _parse_atom(self):
+        token = self._next()
+        if token == u'(':
+            node = self._parse_or()
+            if self._next() != u')':
+                raise QuerySyntaxError(
+                        u'Missing ")" in query {0!r}.'.format(
+                            self.expression))
+            return node
+        elif token in (u')', u'&', u'|'):
+            raise QuerySyntaxError(
+                    u'Unexpected {0!r} in query {1!r}.'.format(
+                        token, self.expression))
+        levels = token.split(DEFAULT_TAG_LEVEL_SEPARATOR)
+        if not all(levels):
+            raise QuerySyntaxError(
+                    u'Empty tag level in query {0!r}.'.format(
+                        self.expression))
+        if WILDCARD in levels:
+            return PatternTerm(levels)
+        else:
+            return TagTerm(Tag(levels))
+
+
+class _LRUCache(object):
+    """ Mapping, which remembers just ``size`` recently used items.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._data = collections.OrderedDict()
+
+    def get(self, key):
+        """ Returns cached value or None.
+        """
+
+        try:
+            value = self._data.pop(key)
+        except KeyError:
+            return None
+        self._data[key] = value
+        return value
+
+    def put(self, key, value):
+        """ Caches value, forgetting the least recently used one, if
+        cache is full.
+        """
+
+        self._data.pop(key, None)
+        self._data[key] = value
+        if len(self._data) > self.size:
+            self._data.popitem(last=False)
+
+
+_query_cache = _LRUCache(QUERY_CACHE_SIZE)
+
+
+def compile_query(expression):
+    """ Returns :py:class:`Query` for ``expression``, reusing recently
+    compiled ones.
+    """
+
+    query = _query_cache.get(expression)
+    if query is None:
+        query = Query(expression)
+        _query_cache.put(expression, query)
+    return query
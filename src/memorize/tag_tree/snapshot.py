@@ -0,0 +1,354 @@
+#!/usr/bin/python
+
+
+""" Snapshots of :py:class:`TagTree <memorize.tag_tree.tag_tree.TagTree>`
+in compact columnar binary format.
+
+Snapshot keeps the tag hierarchy, fields of objects and tags of objects
+(not their inherited tags) in a few integer columns and one string
+table, so it is much smaller than the storage, and can be used to move
+decks between databases or to seed test databases:
+
+>>> import os, shutil, tempfile
+>>> from memorize.tag_tree import TagTree, TaggedObject, Tag
+>>> class Word(TaggedObject):
+...     def __init__(self, record):
+...         super(Word, self).__init__()
+...         self.value = record[u'value']
+...     def as_record(self):
+...         return {u'value': self.value}
+>>> tree = TagTree()
+>>> tree.create_tag(Tag(u'de.nouns'))
+>>> word = Word({u'value': u'Haus'})
+>>> tree.assign(word)
+>>> word.add_tag(Tag(u'de.nouns'))
+>>> path = os.path.join(tempfile.mkdtemp(), 'deck.snapshot')
+>>> write_snapshot(tree, path)
+1
+>>> copy = TagTree()
+>>> load_snapshot(path, copy, Word)
+1
+>>> [word.value for word in copy.get_objects(Tag(u'de'))]
+[u'Haus']
+>>> shutil.rmtree(os.path.dirname(path))
+
+Fields of objects are taken from their ``as_record`` method (see
+:py:class:`memorize.entry.Entry`) and are passed to factory together
+with list of tags under :py:data:`TAGS_FIELD`. Objects get new ids.
+
+File layout (all integers are little-endian)::
+
+    magic, version, number of columns
+    directory: (name, offset, number of items) of each column
+    columns, each aligned to 8 bytes
+
+Columns are described by :py:data:`COLUMNS`. Strings (tag levels and
+JSON encoded field values) are stored once in ``strings_data`` and are
+referenced by their index in ``strings_offsets``. File is read through
+:py:mod:`mmap`, so :py:class:`Snapshot` loads only the parts of columns
+it is asked for.
+
+"""
+
+
+import sys
+import json
+import mmap
+import array
+import struct
+
+from memorize.tag_tree.tag import Tag
+from memorize.tag_tree.bulk import BulkLoader, DEFAULT_CHUNK_SIZE
+
+
+MAGIC = '\x89MEMSNAP'
+VERSION = 1
+HEADER = struct.Struct('<8sII')         # Magic, version, column count.
+DIRECTORY_ENTRY = struct.Struct('<16sQQ')
+                                        # Name, offset, number of items.
+ALIGNMENT = 8
+MISSING = 0xffffffff                    # Index of missing field value.
+TAGS_FIELD = u'tags'
+
+COLUMNS = [
+    # (name, array typecode)
+    ('strings_offsets', 'I'),           # Start of each string (and end
+                                        # of the last one).
+    ('strings_data', 'B'),              # UTF-8 encoded strings.
+    ('node_parents', 'i'),              # Index of parent node, -1 for
+                                        # children of root. Parents
+                                        # precede children.
+    ('node_names', 'I'),                # String index of node name.
+    ('object_ids', 'I'),                # Ids of objects in source tree.
+    ('field_names', 'I'),               # String index of field name.
+    ('field_values', 'I'),              # String index of JSON encoded
+                                        # value or MISSING. Values of
+                                        # the first field of all
+                                        # objects, then of the second...
+    ('tag_starts', 'I'),                # Start of tags of each object
+                                        # in tag_nodes (and end).
+    ('tag_nodes', 'I'),                 # Node index of each tag.
+    ]
+TYPECODES = dict(COLUMNS)
+
+
+class StringTable(object):
+    """ Deduplicated unicode strings of snapshot being written.
+    """
+
+    def __init__(self):
+        self._indexes = {}
+        self.offsets = array.array('I', [0])
+        self.data = array.array('B')
+
+    def add(self, string):
+        """ Returns index of ``string``, adding it, if needed.
+        """
+
+        try:
+            return self._indexes[string]
+        except KeyError:
+            index = self._indexes[string] = len(self.offsets) - 1
+            self.data.fromstring(string.encode('utf-8'))
+            self.offsets.append(len(self.data))
+            return index
+
+
+def _default_fields(obj):
+    """ Returns fields of object from its ``as_record`` method.
+    """
+
+    as_record = getattr(obj, 'as_record', None)
+    if as_record is None:
+        return {}
+    return as_record()
+
+
+def _to_little_endian(column):
+    if sys.byteorder == 'big' and column.itemsize > 1:
+        column = array.array(column.typecode, column)
+        column.byteswap()
+    return column
+
+
+def write_snapshot(
+        tree, path, fields=_default_fields, chunk_size=DEFAULT_CHUNK_SIZE):
+    """ Writes snapshot of ``tree`` to file and returns number of
+    written objects.
+
+    :type tree: TagTree
+    :param fields:
+        Callable, which returns dict of fields of object. Values have to
+        be serializable to JSON. Default takes them from ``as_record``
+        method of object, if it has one.
+    :param chunk_size:
+        Number of objects, after which the connection cache is cleaned,
+        if tree is stored in ZODB.
+    """
+
+    strings = StringTable()
+
+    node_parents = array.array('i')
+    node_names = array.array('I')
+    node_indexes = {}                   # Tag to node index.
+    level = [(-1, tree.get_root_node())]
+    while level:
+        next_level = []
+        for parent_index, parent in level:
+            children = sorted(
+                    parent.get_child_nodes(),
+                    key=lambda node: node.get_name())
+            for node in children:
+                index = node_indexes[node.get_tag()] = len(node_parents)
+                node_parents.append(parent_index)
+                node_names.append(strings.add(node.get_name()))
+                next_level.append((index, node))
+        level = next_level
+
+    object_ids = array.array('I')
+    field_indexes = {}                  # Field name to field index.
+    field_values = []                   # Array of values of each field.
+    tag_starts = array.array('I', [0])
+    tag_nodes = array.array('I')
+    jar = tree._p_jar
+    for object_id in tree.get_all_object_ids():
+        obj = tree.get_object(object_id)
+        row = len(object_ids)
+        object_ids.append(object_id)
+        for name, value in fields(obj).iteritems():
+            index = field_indexes.get(name)
+            if index is None:
+                index = field_indexes[name] = len(field_values)
+                field_values.append(array.array('I', [MISSING] * row))
+            field_values[index].append(strings.add(json.dumps(value)))
+        for values in field_values:
+            if len(values) == row:
+                values.append(MISSING)
+        tag_nodes.extend([node_indexes[tag] for tag in obj.get_tag_list()])
+        tag_starts.append(len(tag_nodes))
+        if jar is not None and (row + 1) % chunk_size == 0:
+            jar.cacheGC()
+
+    field_names = array.array('I', [0] * len(field_indexes))
+    for name, index in field_indexes.iteritems():
+        field_names[index] = strings.add(name)
+    all_field_values = array.array('I')
+    for values in field_values:
+        all_field_values.extend(values)
+
+    columns = {
+            'strings_offsets': strings.offsets,
+            'strings_data': strings.data,
+            'node_parents': node_parents,
+            'node_names': node_names,
+            'object_ids': object_ids,
+            'field_names': field_names,
+            'field_values': all_field_values,
+            'tag_starts': tag_starts,
+            'tag_nodes': tag_nodes,
+            }
+    with open(path, 'wb') as stream:
+        offset = HEADER.size + DIRECTORY_ENTRY.size * len(COLUMNS)
+        stream.write(HEADER.pack(MAGIC, VERSION, len(COLUMNS)))
+        offsets = []
+        for name, typecode in COLUMNS:
+            offset += -offset % ALIGNMENT
+            offsets.append(offset)
+            column = columns[name]
+            stream.write(DIRECTORY_ENTRY.pack(name, offset, len(column)))
+            offset += len(column) * column.itemsize
+        for (name, typecode), offset in zip(COLUMNS, offsets):
+            stream.write('\0' * (offset - stream.tell()))
+            _to_little_endian(columns[name]).tofile(stream)
+    return len(object_ids)
+
+
+class Snapshot(object):
+    """ Snapshot file opened for reading.
+    """
+
+    def __init__(self, path):
+
+        with open(path, 'rb') as stream:
+            self._map = mmap.mmap(
+                    stream.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(u'File is not a TagTree snapshot.')
+        if version != VERSION:
+            raise ValueError(
+                    u'Unsupported snapshot version: {0}.'.format(version))
+        self._columns = {}              # Name to (offset, number of items).
+        for i in range(count):
+            name, offset, length = DIRECTORY_ENTRY.unpack_from(
+                    self._map, HEADER.size + i * DIRECTORY_ENTRY.size)
+            self._columns[name.rstrip('\0')] = (offset, length)
+        self._strings_offsets = self.read_column('strings_offsets')
+        self.node_count = self._columns['node_parents'][1]
+        self.object_count = self._columns['object_ids'][1]
+
+    def close(self):
+        """ Unmaps file.
+        """
+
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def read_column(self, name, start=0, stop=None):
+        """ Returns items from ``start`` to ``stop`` of column as
+        :py:class:`array.array`.
+        """
+
+        offset, length = self._columns[name]
+        if stop is None or stop > length:
+            stop = length
+        column = array.array(TYPECODES[name])
+        column.fromstring(self._map[
+            offset + start * column.itemsize:
+            offset + stop * column.itemsize])
+        if sys.byteorder == 'big' and column.itemsize > 1:
+            column.byteswap()
+        return column
+
+    def get_string(self, index):
+        """ Returns string from string table by its index.
+        """
+
+        start, end = self._strings_offsets[index:index + 2]
+        offset = self._columns['strings_data'][0]
+        return self._map[offset + start:offset + end].decode('utf-8')
+
+    def get_tags(self):
+        """ Returns list of tags of all nodes (in the order of node
+        indexes).
+        """
+
+        tags = []
+        names = self.read_column('node_names')
+        for parent, name in zip(self.read_column('node_parents'), names):
+            levels = (self.get_string(name),)
+            if parent >= 0:
+                levels = tags[parent].as_tuple() + levels
+            tags.append(Tag(levels))
+        return tags
+
+    def iter_records(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """ Yields records of objects: dicts of their fields with list
+        of their tags under :py:data:`TAGS_FIELD`. Columns are read in
+        chunks of ``chunk_size`` objects.
+        """
+
+        tags = self.get_tags()
+        names = [
+                self.get_string(index)
+                for index in self.read_column('field_names')]
+        count = self.object_count
+        for start in range(0, count, chunk_size):
+            stop = min(start + chunk_size, count)
+            values = [
+                    self.read_column(
+                        'field_values', index * count + start,
+                        index * count + stop)
+                    for index in range(len(names))]
+            tag_starts = self.read_column('tag_starts', start, stop + 1)
+            tag_nodes = self.read_column(
+                    'tag_nodes', tag_starts[0], tag_starts[-1])
+            first = tag_starts[0]
+            for row in range(stop - start):
+                record = {}
+                for name, column in zip(names, values):
+                    if column[row] != MISSING:
+                        record[name] = json.loads(
+                                self.get_string(column[row]))
+                record[TAGS_FIELD] = [
+                        tags[node] for node in tag_nodes[
+                            tag_starts[row] - first:
+                            tag_starts[row + 1] - first]]
+                yield record
+
+
+def load_snapshot(
+        path, tree, factory, chunk_size=DEFAULT_CHUNK_SIZE,
+        commit_size=None, transaction_manager=None):
+    """ Loads objects of snapshot into ``tree`` and returns their
+    number. All tags of snapshot are created, even if they have no
+    objects.
+
+    Objects are loaded in chunks by :py:class:`BulkLoader
+    <memorize.tag_tree.bulk.BulkLoader>`, see it for meaning of
+    arguments.
+    """
+
+    with Snapshot(path) as snapshot:
+        for tag in snapshot.get_tags():
+            tree.create_tag(tag)
+        loader = BulkLoader(
+                tree, factory, tags_field=TAGS_FIELD, chunk_size=chunk_size,
+                commit_size=commit_size,
+                transaction_manager=transaction_manager)
+        return loader.load(snapshot.iter_records(chunk_size))
@@ -35,6 +35,7 @@ d.g.e.r
 
 
 import re
+import weakref
 
 from memorize.tag_tree.exceptions import IntegrityError
 
@@ -44,12 +45,45 @@ DEFAULT_TAG_LEVEL_SEPARATOR = u'.'
 DEFAULT_TAGS_SEPARATOR_RE = u'\s*'      # Any amount of whitespace.
 
 
+_compiled_separators = {}
+
+
+def compile_separator(re_separator):
+    """ Returns compiled regular expression separator.
+
+    Compiled expressions are cached, so separators are compiled just
+    once.
+    """
+
+    try:
+        return _compiled_separators[re_separator]
+    except KeyError:
+        compiled = re.compile(re_separator, flags=re.UNICODE)
+        _compiled_separators[re_separator] = compiled
+        return compiled
+
+
 class Tag(object):
     """ Object which represents tag.
+
+    Tags are immutable and hashable, so they can be used as dict keys.
+    Equal tags are interned, so parsing the same tag again returns the
+    same instance:
+
+    >>> Tag(u'a.b') is Tag([u'a', u'b'])
+    True
+
     """
 
-    def __init__(
-            self, tag,
+    __slots__ = ('_levels', 'separator', '__weakref__')
+
+    # (levels tuple, separator) -> Tag.
+    _interned = weakref.WeakValueDictionary()
+    # (unicode, regular expression separator, separator) -> Tag.
+    _parsed = weakref.WeakValueDictionary()
+
+    def __new__(
+            cls, tag,
             re_separator=DEFAULT_TAG_LEVEL_SEPARATOR_RE,
             separator=DEFAULT_TAG_LEVEL_SEPARATOR,
             ):
@@ -63,31 +97,55 @@ class Tag(object):
 
         """
 
-        self.re_separator = re_separator
-        self.separator = separator
-
         if isinstance(tag, unicode):
-            self.levels = re.split(self.re_separator, tag, flags=re.UNICODE)
+            key = (tag, re_separator, separator)
+            instance = cls._parsed.get(key)
+            if instance is None:
+                instance = cls._intern(
+                        tuple(compile_separator(re_separator).split(tag)),
+                        separator)
+                cls._parsed[key] = instance
+            return instance
+        elif isinstance(tag, Tag) and tag.separator == separator:
+            return tag
         else:
-            self.levels = []
-            for level in tag:
-                if isinstance(level, unicode):
-                    self.levels.append(level)
-                else:
+            levels = tuple(tag)
+            for level in levels:
+                if not isinstance(level, unicode):
                     raise TypeError(
                             u'Tag level have to be an unicode string.')
+            return cls._intern(levels, separator)
+
+    @classmethod
+    def _intern(cls, levels, separator):
+        """ Returns interned tag with given levels.
+        """
+
+        instance = cls._interned.get((levels, separator))
+        if instance is None:
+            if not levels:
+                raise IntegrityError(u'Tag cannot be empty!')
+            for level in levels:
+                if len(level) == 0:
+                    raise IntegrityError(u'Tag level cannot be empty!')
+            instance = object.__new__(cls)
+            object.__setattr__(instance, '_levels', levels)
+            object.__setattr__(instance, 'separator', separator)
+            cls._interned[(levels, separator)] = instance
+        return instance
+
+    @property
+    def levels(self):
+        """ List of tag levels.
+        """
 
-        if not self.levels:
-            raise IntegrityError(u'Tag cannot be empty!')
-        for level in self.levels:
-            if len(level) == 0:
-                raise IntegrityError(u'Tag level cannot be empty!')
+        return list(self._levels)
 
     def as_tuple(self):
         """ Returns tag as tuple of unicode strings.
         """
 
-        return tuple(self.levels)
+        return self._levels
 
     def as_unicode(self, separator=None):
         """ Returns tag as unicode string.
@@ -96,22 +154,44 @@ class Tag(object):
         constructor, is used.
         """
 
-        return (separator or self.separator).join(self.levels)
+        return (separator or self.separator).join(self._levels)
 
     def __unicode__(self):
         return self.as_unicode()
 
+    def __repr__(self):
+        return 'Tag({0!r})'.format(self.as_unicode())
+
     def __iter__(self):
         """ Iterator through tag levels.
         """
 
-        return iter(self.levels)
+        return iter(self._levels)
+
+    def __len__(self):
+        return len(self._levels)
+
+    def __hash__(self):
+        return hash(self._levels)
 
     def __eq__(self, tag):
-        return self.levels == tag.levels
+        if not isinstance(tag, Tag):
+            return NotImplemented
+        return self._levels == tag._levels
 
     def __ne__(self, tag):
-        return self.levels != tag.levels
+        if not isinstance(tag, Tag):
+            return NotImplemented
+        return self._levels != tag._levels
+
+    def __setattr__(self, name, value):
+        raise AttributeError(u'Tag is immutable.')
+
+    def __delattr__(self, name):
+        raise AttributeError(u'Tag is immutable.')
+
+    def __reduce__(self):
+        return (Tag, (self._levels, None, self.separator))
 
 
 class TagList(object):
@@ -144,8 +224,8 @@ class TagList(object):
         if isinstance(tags, unicode):
             self.tags = [
                     Tag(tag)
-                    for tag in re.split(
-                        self.re_tags_separator, tags, flags=re.UNICODE)
+                    for tag in compile_separator(
+                        self.re_tags_separator).split(tags)
                     if len(tag) > 0]
         else:
             self.tags = [Tag(tag) for tag in tags]
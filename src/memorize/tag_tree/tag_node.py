@@ -8,7 +8,12 @@
 import persistent
 from BTrees.OOBTree import OOBTree
 from BTrees.IOBTree import IOBTree
+from BTrees.IIBTree import IITreeSet
+from BTrees.Length import Length
 
+from memorize.tag_tree.allocator import IdAllocator
+from memorize.tag_tree.exceptions import IntegrityError
+from memorize.tag_tree.membership import MembershipTree, CounterTree
 from memorize.tag_tree.tag import Tag
 
 
@@ -16,7 +21,8 @@ class TagNode(persistent.Persistent):
     """ Node of TagTree.
     """
 
-    def __init__(self, name, parent=None):
+    def __init__(
+            self, name, parent=None, registry=None, node_registry=None):
         """
         :param name:
             Name of this TaggedNode. (Not a full name.) None means
@@ -24,30 +30,109 @@ class TagNode(persistent.Persistent):
         :type name: unicode or None
         :param parent: Parent node of this.
         :type parent: TagNode
+        :param registry:
+            Object id to object mapping shared by all nodes of the
+            tree. If None, then it is taken from parent, or, if this
+            node is a root, a new one is created.
+        :type registry: MembershipTree or None
+        :param node_registry:
+            Node id to node mapping shared by all nodes of the tree.
+            Taken or created in the same way as ``registry``.
+        :type node_registry: IOBTree or None
         """
 
+        if registry is None:
+            if parent is None:
+                registry = MembershipTree()
+            else:
+                registry = parent._registry
+        if node_registry is None:
+            if parent is None:
+                node_registry = IOBTree()
+            else:
+                node_registry = parent._node_registry
+
+        if parent is None:
+            # Ids are never reused, so stale ids of deleted nodes do
+            # not point to other nodes.
+            self._node_id_allocator = IdAllocator()
+            self._node_id = 0
+        else:
+            self._node_id_allocator = parent._node_id_allocator
+            self._node_id = self._node_id_allocator.allocate(
+                    node_registry.has_key)
+        node_registry[self._node_id] = self
+        self._node_registry = node_registry
         self._name = name
         self._parent = parent
+        if parent is None:
+            self._path = ()
+        else:
+            self._path = parent.get_path() + (name,)
+        self._registry = registry
         self._children = OOBTree()
-        self._objects = IOBTree()
-
-    def destroy(self):
-        """ Untags all objects, tagged by this TagNode, and also destroys
-        all children recursively.
+        self._objects = MembershipTree()    # Objects tagged by this node.
+        # Id of object, tagged by this node or any of its descendants,
+        # to number of such tags.
+        self._subtree_objects = CounterTree()
+        self._subtree_size = Length()   # Number of keys in above.
+
+    def destroy(self, chunk_size=None, checkpoint=None):
+        """ Untags all objects, tagged by this TagNode or any of its
+        descendants, and unregisters these nodes.
+
+        Affected objects are taken from the subtree id set, so each of
+        them is changed once and nodes are not changed at all (they
+        are expected to be dropped together with this node).
+
+        See :py:meth:`apply_to_objects` for ``chunk_size`` and
+        ``checkpoint``.
         """
 
-        for node in self._children.values():
-            node.destroy()
+        node_ids = IITreeSet()
+        nodes = [self]
+        while nodes:
+            node = nodes.pop()
+            node_ids.insert(node._node_id)
+            nodes.extend(node._children.values())
+        self.apply_to_objects(
+                lambda obj: obj.detach_nodes(node_ids), chunk_size,
+                checkpoint)
+        for node_id in node_ids:
+            del self._node_registry[node_id]
+
+    def apply_to_objects(self, function, chunk_size=None, checkpoint=None):
+        """ Calls ``function`` for each object tagged by this TagNode or
+        any of its descendants.
+
+        :param chunk_size:
+            Number of objects processed between calls of
+            ``checkpoint``. None means all at once.
+        :param checkpoint:
+            Callable, which is called after each chunk with numbers of
+            processed and of all objects.
+        """
 
-        tag = self.get_tag()
-        for obj in list(self._objects.values()):
-            obj.remove_tag(tag)
+        object_ids = list(self._subtree_objects.keys())
+        total = len(object_ids)
+        if chunk_size is None:
+            chunk_size = total or 1
+        for start in range(0, total, chunk_size):
+            for object_id in object_ids[start:start + chunk_size]:
+                function(self._registry[object_id])
+            if checkpoint is not None:
+                checkpoint(min(start + chunk_size, total), total)
 
     def get_parent(self):
         """ Returns parent node.
         """
         return self._parent
 
+    def get_id(self):
+        """ Returns id of this node, which is unique in the tree.
+        """
+        return self._node_id
+
     def get_name(self):
         """ Returns name (tag level) of this node.
         """
@@ -65,8 +150,11 @@ class TagNode(persistent.Persistent):
             self._children[name] = TagNode(name, self)
             return self._children[name]
 
-    def delete_child_node(self, name):
-        """ Deletes child node.
+    def delete_child_node(self, name, chunk_size=None, checkpoint=None):
+        """ Deletes child node and untags objects tagged by it or any of
+        its descendants.
+
+        See :py:meth:`destroy` for ``chunk_size`` and ``checkpoint``.
         """
 
         if not self._children.has_key(name):
@@ -74,8 +162,51 @@ class TagNode(persistent.Persistent):
                     u'TagNode does not have child with name {0}.'.format(
                         name))
         else:
-            self._children[name].destroy()
+            child = self._children[name]
+            child.destroy(chunk_size, checkpoint)
             del self._children[name]
+            self._decrement_subtree(child._subtree_objects.items())
+
+    def move_child_node(self, name, new_parent, new_name=None):
+        """ Moves child node with all its descendants under
+        ``new_parent`` (which can be this node) and names it
+        ``new_name`` (by default, name is not changed).
+
+        Only subtree id sets of old and new ancestors are updated:
+        objects refer to nodes by ids, so they are not touched.
+        """
+
+        if new_name is None:
+            new_name = name
+        child = self.get_child_node(name)
+        if new_parent.has_child_node(new_name):
+            raise KeyError(
+                    u'TagNode already has child with name {0}.'.format(
+                        new_name))
+        path = child.get_path()
+        if new_parent.get_path()[:len(path)] == path:
+            raise IntegrityError(
+                    u'TagNode can not be moved under itself.')
+
+        del self._children[name]
+        if new_parent is not self:
+            counts = list(child._subtree_objects.items())
+            self._decrement_subtree(counts)
+            new_parent._increment_subtree(counts)
+        child._parent = new_parent
+        child._name = new_name
+        child._update_path()
+        new_parent._children[new_name] = child
+        return child
+
+    def _update_path(self):
+        """ Recomputes stored paths of this node and its descendants
+        after it was renamed or moved.
+        """
+
+        self._path = self._parent.get_path() + (self._name,)
+        for node in self._children.values():
+            node._update_path()
 
     def get_child_node(self, name):
         """ Returns child node.
@@ -88,25 +219,65 @@ class TagNode(persistent.Persistent):
                     u'TagNode does not have child with name {0}.'.format(
                         name))
 
+    def has_child_node(self, name):
+        """ Returns True if node has child with name ``name``.
+        """
+
+        return self._children.has_key(name)
+
+    def get_child_nodes(self):
+        """ Returns list of child nodes.
+        """
+
+        return list(self._children.values())
+
+    def get_path(self):
+        """ Returns tuple of levels of tag, which this node represents
+        (empty for root). Path is stored, so ancestors are not loaded.
+        """
+
+        return self._path
+
     def get_tag(self):
         """ Returns :py:class:`Tag`, which this node represents.
         """
 
-        levels = []
-        node = self
-        while node.get_parent():
-            levels.append(node.get_name())
-            node = node.get_parent()
-        return Tag(reversed(levels))
+        return Tag(self.get_path())
 
     def add_object(self, obj):
         """ Adds object to tagged objects list.
         """
 
-        if self._objects.has_key(obj.get_id()):
+        object_id = obj.get_id()
+        if self._objects.has_key(object_id):
             raise KeyError(u'Object already tagged.')
         else:
-            self._objects[obj.get_id()] = obj
+            self._objects[object_id] = obj
+            self._registry.insert(object_id, obj)
+            self._increment_subtree(((object_id, 1),))
+
+    def add_objects(self, objects):
+        """ Adds objects to tagged objects list.
+
+        The same as calling :py:meth:`add_object` for each object, but
+        BTrees of this node and of all its ancestors are updated just
+        once.
+        """
+
+        new_objects = {}
+        for obj in objects:
+            object_id = obj.get_id()
+            if (object_id in new_objects or
+                    self._objects.has_key(object_id)):
+                raise KeyError(u'Object already tagged.')
+            new_objects[object_id] = obj
+        object_ids = sorted(new_objects)
+
+        self._objects.update(new_objects)
+        for object_id in object_ids:
+            self._registry.insert(object_id, new_objects[object_id])
+        self._increment_subtree(
+                [(object_id, 1) for object_id in object_ids])
 
     def remove_object(self, obj):
         """ Removes object from tagged objects list.
@@ -115,9 +286,56 @@ class TagNode(persistent.Persistent):
         """
 
         if isinstance(obj, int):
-            del self._objects[obj]
+            object_id = obj
         else:
-            del self._objects[obj.get_id()]
+            object_id = obj.get_id()
+        del self._objects[object_id]
+        self._decrement_subtree(((object_id, 1),))
+
+    def _increment_subtree(self, counts):
+        """ Increments numbers of tags of objects in subtree sets of
+        this node and of all its ancestors.
+
+        :param counts: Sequence of ``(object_id, count)`` pairs.
+        """
+
+        node = self
+        while node is not None:
+            subtree_objects = node._subtree_objects
+            items = []
+            added = 0
+            for object_id, count in counts:
+                old_count = subtree_objects.get(object_id, 0)
+                if not old_count:
+                    added += 1
+                items.append((object_id, old_count + count))
+            subtree_objects.update(items)
+            if added:
+                node._subtree_size.change(added)
+            node = node._parent
+
+    def _decrement_subtree(self, counts):
+        """ Decrements numbers of tags of objects in subtree sets of
+        this node and of all its ancestors. Objects, which are not
+        tagged by subtree anymore, are removed from set.
+
+        :param counts: Sequence of ``(object_id, count)`` pairs.
+        """
+
+        node = self
+        while node is not None:
+            subtree_objects = node._subtree_objects
+            removed = 0
+            for object_id, count in counts:
+                count = subtree_objects[object_id] - count
+                if count:
+                    subtree_objects[object_id] = count
+                else:
+                    del subtree_objects[object_id]
+                    removed += 1
+            if removed:
+                node._subtree_size.change(-removed)
+            node = node._parent
 
     def get_object(self, object_id):
         """ Returns object by its id.
@@ -125,6 +343,34 @@ class TagNode(persistent.Persistent):
 
         return self._objects[object_id]
 
+    def get_object_ids(self):
+        """ Returns ids of all objects tagged by this node or any of
+        its descendants.
+
+        Returned value is a :py:class:`BTrees.IIBTree.IIBTree`, which
+        maps object id to number of tags, by which object belongs to
+        this subtree, so it can be directly used with
+        :py:mod:`BTrees.IIBTree` set operations. It must not be
+        modified.
+        """
+
+        return self._subtree_objects
+
+    def count(self):
+        """ Returns number of objects tagged by this node or any of its
+        descendants. Objects are not loaded.
+        """
+
+        return self._subtree_size()
+
+    def child_counts(self):
+        """ Returns dict, which maps name of each child node to number
+        of objects in its subtree.
+        """
+
+        return dict([
+            (name, node.count()) for name, node in self._children.items()])
+
     def get_object_dict(self, tag, filter):
         """ Returns dict (id->object) of all children nodes objects tagged
         with tag for which filter returns True.
@@ -137,11 +383,12 @@ class TagNode(persistent.Persistent):
 
         if tag is None or len(tag) == 0:
             # Collect all objects.
-            objects = dict([
-                (obj.get_id(), obj)
-                for obj in self._objects.values() if filter(obj)])
-            for node in self._children.values():
-                objects.update(node.get_object_dict(None, filter))
+            objects = {}
+            registry = self._registry
+            for object_id in self._subtree_objects.keys():
+                obj = registry[object_id]
+                if filter(obj):
+                    objects[object_id] = obj
             return objects
         else:
             # Recursively call child node.
@@ -5,12 +5,24 @@
 """
 
 
+import itertools
+
 import persistent
+from BTrees.OOBTree import OOBTree
 from BTrees.IOBTree import IOBTree
+from BTrees.IIBTree import IISet, IITreeSet
 
 
+from memorize.tag_tree.allocator import IdAllocator
+from memorize.tag_tree.exceptions import IntegrityError
+from memorize.tag_tree.membership import MembershipTree
 from memorize.tag_tree.tag import Tag
 from memorize.tag_tree.tag_node import TagNode
+from memorize.tag_tree.query import Query, intersect
+from memorize.tag_tree.filters import split_filter
+
+
+CHUNK_SIZE = 1000               # Objects processed between savepoints.
 
 
 class TagTree(persistent.Persistent):
@@ -18,9 +30,13 @@ class TagTree(persistent.Persistent):
     """
 
     def __init__(self):
-        self._root = TagNode(name=None)
-        self._objects = IOBTree()
-        self._counter = 1               # Unique object id generator.
+        self._objects = MembershipTree()
+        self._nodes = IOBTree()         # Node id to TagNode.
+        self._root = TagNode(
+                name=None, registry=self._objects,
+                node_registry=self._nodes)
+        self._id_allocator = IdAllocator()
+        self._indexes = OOBTree()       # Index name to index.
 
     def create_tag(self, tag):
         """ Creates all TagNode's needed to store objects tagged by
@@ -36,29 +52,209 @@ class TagTree(persistent.Persistent):
             except KeyError:
                 node = node.create_child_node(level)
 
-    def delete_tag(self, tag):
-        """ Deletes TagNode referenced by ``tag``.
+    def delete_tag(
+            self, tag, chunk_size=CHUNK_SIZE, progress=None,
+            transaction_manager=None):
+        """ Deletes TagNode referenced by ``tag`` together with its
+        descendants and untags all objects, which are tagged by them.
+
+        Objects are untagged in chunks. If tree is stored in ZODB, an
+        optimistic savepoint is made after every chunk, so untagged
+        objects can be removed from the connection cache. Transaction
+        is never committed, so deletion is either done completely or
+        not at all.
 
         :type tag: Tag
+        :param chunk_size: Number of objects untagged at once.
+        :param progress:
+            Callable, which is called after each chunk with numbers of
+            untagged and of all affected objects.
+        :param transaction_manager:
+            Used for savepoints. Default is the transaction manager of
+            connection of tree.
+        """
+
+        node = self._root
+        for level in tag:
+            parent = node
+            node = node.get_child_node(level)
+        parent.delete_child_node(
+                level, chunk_size,
+                self._make_checkpoint(progress, transaction_manager))
+
+    def move_tag(self, tag, new_tag):
+        """ Moves TagNode referenced by ``tag`` together with its
+        descendants, so it is referenced by ``new_tag``. Missing
+        ancestors of ``new_tag`` are created.
 
-        .. todo::
-            Deleting TagNode should untag all objects, which are tagged
-            by it and its children.
+        Nodes are relinked, so only the old and new ancestors are
+        changed in the tree. Objects refer to nodes by ids, so they
+        are not changed at all.
+
+        :type tag: Tag
+        :type new_tag: Tag
         """
 
         node = self._root
         for level in tag:
             parent = node
             node = node.get_child_node(level)
-        parent.delete_child_node(level)
+        levels = tag.as_tuple()
+        new_levels = new_tag.as_tuple()
+
+        # Move is checked before missing ancestors are created, so
+        # rejected move does not leave new nodes behind.
+        if new_levels[:len(levels)] == levels:
+            raise IntegrityError(u'TagNode can not be moved under itself.')
+        new_parent = self._root
+        missing_levels = list(new_levels[:-1])
+        while missing_levels and new_parent.has_child_node(
+                missing_levels[0]):
+            new_parent = new_parent.get_child_node(missing_levels.pop(0))
+        if not missing_levels and new_parent.has_child_node(new_levels[-1]):
+            raise KeyError(
+                    u'TagNode already has child with name {0}.'.format(
+                        new_levels[-1]))
+        for new_level in missing_levels:
+            new_parent = new_parent.create_child_node(new_level)
+
+        parent.move_child_node(level, new_parent, new_levels[-1])
+
+    def rename_tag(self, tag, name):
+        """ Changes the last level of ``tag`` to ``name``.
+
+        See :py:meth:`move_tag` for details.
+
+        :type tag: Tag
+        :type name: unicode
+        """
+
+        self.move_tag(
+                tag,
+                Tag(tag.as_tuple()[:-1] + (name,), separator=tag.separator))
+
+    def _make_checkpoint(self, progress, transaction_manager):
+        """ Returns function, which is called after each chunk of
+        objects processed by long operations.
+        """
+
+        def checkpoint(done, total):
+            jar = self._p_jar
+            if jar is not None:
+                (transaction_manager or jar.transaction_manager).savepoint(
+                        optimistic=True)
+                jar.cacheGC()
+            if progress is not None:
+                progress(done, total)
+
+        return checkpoint
 
     def assign(self, obj):
         """ Assigns object to tree.
         """
 
-        obj.initialize(self._counter, self)
-        self._objects[self._counter] = obj
-        self._counter += 1
+        # Keys are computed first, so object, which can not be indexed,
+        # is not left in tree.
+        index_keys = self._get_index_keys(obj)
+        object_id = self._allocate_id()
+        obj.initialize(object_id, self)
+        self._objects[object_id] = obj
+        for index, keys in index_keys:
+            index.index_object(object_id, obj, keys)
+
+    def _allocate_id(self):
+        """ Returns id for new object.
+
+        Tree itself is not changed, so concurrent writers do not
+        conflict on it (see :py:mod:`memorize.tag_tree.allocator`).
+        """
+
+        return self._id_allocator.allocate(self._objects.has_key)
+
+    def add_index(self, name, index):
+        """ Registers attribute index and indexes all assigned objects.
+
+        :param index: See :py:mod:`memorize.tag_tree.indexes`.
+        """
+
+        if self._indexes.has_key(name):
+            raise KeyError(u'Index {0} already exists.'.format(name))
+        for object_id, obj in self._objects.items():
+            index.index_object(object_id, obj)
+        self._indexes[name] = index
+
+    def remove_index(self, name):
+        """ Unregisters attribute index.
+        """
+
+        del self._indexes[name]
+
+    def get_index(self, name):
+        """ Returns attribute index by its name.
+        """
+
+        return self._indexes[name]
+
+    def search(
+            self, index_name, value, tags=None, min_similarity=0.3,
+            limit=10):
+        """ Returns list of ``(similarity, object)`` pairs of objects,
+        which are tagged by ``tags`` (or any objects, if it is None)
+        and which indexed attribute is similar to ``value``, the most
+        similar first.
+
+        :param index_name:
+            Name of :py:class:`TrigramIndex
+            <memorize.tag_tree.indexes.TrigramIndex>`.
+        :type tags: Tag, TagList, Query or None
+        """
+
+        if tags is None:
+            object_ids = None
+        else:
+            object_ids = self.get_object_ids(tags)
+        return [
+                (score, self._objects[object_id])
+                for score, object_id in self._indexes[index_name].rank(
+                    value, object_ids, min_similarity, limit)]
+
+    def reindex_object(self, obj, attribute=None):
+        """ Updates indexes of ``attribute`` (or all indexes, if it is
+        None) for object.
+        """
+
+        object_id = obj.get_id()
+        for index, keys in self._get_index_keys(obj, attribute):
+            index.index_object(object_id, obj, keys)
+
+    def _get_index_keys(self, obj, attribute=None):
+        """ Returns list of ``(index, keys)`` pairs for indexes of
+        ``attribute`` (or all indexes, if it is None). Keys of all
+        indexes are computed before any of them is changed, so error
+        leaves indexes untouched.
+        """
+
+        return [
+            (index, index.get_object_keys(obj))
+            for index in self._indexes.values()
+            if attribute is None or index.attribute == attribute]
+
+    def get_object(self, object_id):
+        """ Returns object by its id.
+        """
+
+        return self._objects[object_id]
+
+    def get_node(self, node_id):
+        """ Returns TagNode by its id.
+        """
+
+        return self._nodes[node_id]
+
+    def get_root_node(self):
+        """ Returns root TagNode.
+        """
+        return self._root
 
     def get_tag_node(self, tag):
         """ Returns TagNode by tag.
@@ -68,21 +264,99 @@ class TagTree(persistent.Persistent):
             node = node.get_child_node(level)
         return node
 
-    def get_objects(self, tags, filter=lambda x: True):
+    def get_objects(
+            self, tags, filter=lambda x: True, offset=0, limit=None):
         """ Returns all objects, which are tagged by ``tags`` and passes
         filter.
 
-        :type tags: Tag or TagList
+        See :py:meth:`iter_objects` for ``offset`` and ``limit``.
+
+        :type tags: Tag, TagList or Query
+        """
+
+        return list(self.iter_objects(tags, filter, offset, limit))
+
+    def iter_objects(
+            self, tags, filter=lambda x: True, offset=0, limit=None,
+            copy=False):
+        """ Returns iterator through objects, which are tagged by
+        ``tags`` and passes filter.
+
+        Objects are taken from the tree one by one, so persistent
+        objects are activated only when filter or caller touches them,
+        and iteration stops after ``limit`` objects. For a single tag
+        ids are read lazily from the id set of its TagNode, so only
+        its buckets, which are reached, are loaded.
+
+        If ``filter`` is a :py:class:`Filter
+        <memorize.tag_tree.filters.Filter>`, its parts, which can be
+        answered by attribute indexes, are applied to id set before
+        any object is taken.
+
+        :param offset: Number of matching objects to skip.
+        :param limit: Maximum number of objects to return. None means
+            no limit.
+        :param copy: If True, ids are copied before iteration, so
+            objects can be tagged and untagged during it.
+        :type tags: Tag, TagList or Query
+        """
+
+        object_ids = self.get_object_ids(tags)
+        filter_ids, filter = split_filter(filter, self._indexes)
+        if filter_ids is not None:
+            object_ids = intersect([object_ids, filter_ids])
+        if copy:
+            object_ids = IISet(object_ids)
+        objects = itertools.imap(self._objects.__getitem__, object_ids)
+        if filter is not None:
+            objects = itertools.ifilter(filter, objects)
+        if limit is None:
+            return itertools.islice(objects, offset, None)
+        else:
+            return itertools.islice(objects, offset, offset + limit)
+
+    def get_object_ids(self, tags):
+        """ Returns set of ids of objects, which are tagged by ``tags``.
+
+        Each tag is resolved to the id set of its TagNode and sets are
+        intersected smallest-first. Query is evaluated as set operations
+        over these sets.
+
+        :type tags: Tag, TagList or Query
+        """
+
+        if isinstance(tags, Query):
+            return tags.evaluate(self)
+        elif isinstance(tags, Tag):
+            return self.get_tag_node(tags).get_object_ids()
+        nodes = sorted(
+                [self.get_tag_node(tag) for tag in tags],
+                key=lambda node: node.count())
+        return intersect(
+                [node.get_object_ids() for node in nodes], key=None)
+
+    def count(self, tags):
+        """ Returns number of objects, which are tagged by ``tags``.
+
+        No object is loaded: for a single tag maintained node counter is
+        used, otherwise the size of id set.
+
+        :type tags: Tag, TagList or Query
         """
 
         if isinstance(tags, Tag):
-            node = self.get_tag_node(tags)
-            tags = []
+            return self.get_tag_node(tags).count()
         else:
-            node = self.get_tag_node(list(tags).pop())
+            return len(self.get_object_ids(tags))
+
+    def count_tags(self):
+        """ Returns number of tags (TagNode's except root) in tree.
+        """
+
+        return len(self._nodes) - 1
+
+    def get_all_object_ids(self):
+        """ Returns set of ids of all objects assigned to tree.
+        """
 
-        objects = []
-        for obj in node.get_object_list(None, filter):
-            if all([obj.has_tag(tag) for tag in tags]):
-                objects.append(obj)
-        return objects
+        return IITreeSet(self._objects.keys())
@@ -8,12 +8,15 @@ being to be stored in
 
 
 import persistent
-from BTrees.OOBTree import OOBTree
+from BTrees.IIBTree import IITreeSet, intersection
 
 from memorize.tag_tree.exceptions import IntegrityError
 from memorize.tag_tree.tag import Tag
 
 
+_MISSING = object()
+
+
 class TaggedObject(persistent.Persistent):
     """ Tagged object, which belongs to one or more tag nodes.
 
@@ -25,7 +28,7 @@ class TaggedObject(persistent.Persistent):
     def __init__(self):
 
         self._id = None
-        self._tags = None               # Tag tuple to TagNode mapping.
+        self._tags = None               # Ids of tag nodes.
         self._tag_tree = None
 
     def initialize(self, unique_id, tag_tree):
@@ -41,9 +44,45 @@ class TaggedObject(persistent.Persistent):
                         u'TaggedObject can belong just to one TagTree.')
         else:
             self._id = unique_id
-            self._tags = OOBTree()
+            self._tags = IITreeSet()
             self._tag_tree = tag_tree
 
+    def __setattr__(self, name, value):
+        """ Sets attribute and updates indexes of tree, which depend on
+        it. If indexes can not be updated, old value is restored.
+        """
+
+        reindex_object = None
+        if not name.startswith('_'):
+            tag_tree = getattr(self, '_tag_tree', None)
+            reindex_object = getattr(tag_tree, 'reindex_object', None)
+        if reindex_object is None:
+            super(TaggedObject, self).__setattr__(name, value)
+            return
+
+        old_value = self.__dict__.get(name, _MISSING)
+        super(TaggedObject, self).__setattr__(name, value)
+        try:
+            reindex_object(self, name)
+        except Exception:
+            if old_value is _MISSING:
+                super(TaggedObject, self).__delattr__(name)
+            else:
+                super(TaggedObject, self).__setattr__(name, old_value)
+            raise
+
+    def reindex(self):
+        """ Updates all indexes of tree for this object.
+
+        Has to be called after changing mutable indexed attribute in
+        place, because such change can not be detected.
+        """
+
+        if self._tag_tree is None:
+            raise IntegrityError(
+                    u'TaggedObject is not assigned to TagTree.')
+        self._tag_tree.reindex_object(self)
+
     def get_id(self):
         """ Returns unique id of the object.
         """
@@ -63,14 +102,33 @@ class TaggedObject(persistent.Persistent):
         if self._tag_tree is None:
             raise IntegrityError(
                     u'TaggedObject is not assigned to TagTree.')
-        elif self._tags.has_key(tag.as_tuple()):
+        tag_node = self._tag_tree.get_tag_node(tag)
+        if self._tags.has_key(tag_node.get_id()):
             raise KeyError(
                     u'TaggedObject is already tagged with {0}.'.format(
                         unicode(tag)))
         else:
-            tag_node = self._tag_tree.get_tag_node(tag)
             tag_node.add_object(self)
-            self._tags[tag.as_tuple()] = tag_node
+            self._tags.insert(tag_node.get_id())
+
+    def attach_tag(self, tag, tag_node):
+        """ Records, that object is tagged by ``tag``, which is
+        represented by ``tag_node``.
+
+        Unlike :py:meth:`add_tag` it does not add object to
+        ``tag_node``, this is left to caller, which can do that for
+        many objects at once by using
+        :py:meth:`TagNode.add_objects
+        <memorize.tag_tree.tag_node.TagNode.add_objects>`.
+        """
+
+        if self._tag_tree is None:
+            raise IntegrityError(
+                    u'TaggedObject is not assigned to TagTree.')
+        elif not self._tags.insert(tag_node.get_id()):
+            raise KeyError(
+                    u'TaggedObject is already tagged with {0}.'.format(
+                        unicode(tag)))
 
     def remove_tag(self, tag):
         """ Removes tag from object.
@@ -78,29 +136,51 @@ class TaggedObject(persistent.Persistent):
         :param tag: memorize.tag_tree.Tag
         """
 
-        try:
-            del self._tags[tag.as_tuple()]
-            tag_node = self._tag_tree.get_tag_node(tag)
-            tag_node.remove_object(self)
-        except TypeError:
+        if self._tag_tree is None:
             raise IntegrityError(
                     u'TaggedObject is not assigned to TagTree.')
+        try:
+            tag_node = self._tag_tree.get_tag_node(tag)
+            self._tags.remove(tag_node.get_id())
         except KeyError:
             raise KeyError(
                     u'TaggedObject is not tagged with {0}.'.format(
                         unicode(tag)))
+        tag_node.remove_object(self)
 
-    def has_tag(self, tag):
-        """ Returns True if object is tagged by tag.
+    def detach_nodes(self, node_ids):
+        """ Removes tags represented by nodes with ``node_ids`` from
+        object and returns number of removed tags.
+
+        Unlike :py:meth:`remove_tag` it does not remove object from tag
+        nodes, this is left to caller (see
+        :py:meth:`TagNode.destroy
+        <memorize.tag_tree.tag_node.TagNode.destroy>`).
+
+        :type node_ids: IITreeSet
         """
 
-        tag_tuple = tag.as_tuple()
-        length = len(tag_tuple)
+        if self._tag_tree is None:
+            raise IntegrityError(
+                    u'TaggedObject is not assigned to TagTree.')
+        removed = intersection(self._tags, node_ids)
+        for node_id in removed:
+            self._tags.remove(node_id)
+        return len(removed)
+
+    def has_tag(self, tag):
+        """ Returns True if object is tagged by tag or by any of its
+        descendants.
 
-        for object_tag_tuple in self._tags.keys():
-            if object_tag_tuple[:length] == tag_tuple:
-                return True
-        return False
+        Subtree id set of tag node is checked, so neither tag nodes of
+        object, nor their ancestors are loaded.
+        """
+
+        try:
+            tag_node = self._tag_tree.get_tag_node(tag)
+        except KeyError:
+            return False
+        return tag_node.get_object_ids().has_key(self._id)
 
     def get_tag_list(self):
         """ Returns a list of tags, by which this object is tagged.
@@ -109,4 +189,8 @@ class TaggedObject(persistent.Persistent):
             Inherited tags are not returned.
         """
 
-        return [Tag(tag) for tag in self._tags.keys()]
+        tag_tree = self._tag_tree
+        return sorted(
+                [tag_tree.get_node(node_id).get_tag()
+                 for node_id in self._tags],
+                key=Tag.as_tuple)
@@ -0,0 +1,74 @@
+#!/usr/bin/python
+
+
+""" Tests for memorize.benchmark.
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from memorize import benchmark
+from memorize.tag_tree import Tag
+
+
+class BenchmarkTest(unittest.TestCase):
+    """ Tests for benchmark harness.
+    """
+
+    def test_generate_tags(self):
+
+        tags = benchmark.generate_tags(2, 2)
+        self.assertEqual(tags, [
+            Tag(u'n0'), Tag(u'n1'), Tag(u'n0.n0'), Tag(u'n0.n1'),
+            Tag(u'n1.n0'), Tag(u'n1.n1')])
+
+    def test_percentile(self):
+
+        values = range(1, 101)
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([3], 90), 3)
+        self.assertEqual(benchmark.percentile([], 90), None)
+
+    def test_run_and_compare(self):
+
+        settings = {
+                'objects': 30, 'depth': 2, 'fanout': 3, 'queries': 10,
+                'deletions': 2, 'chunk_size': 10, 'backend': 'file'}
+        results = benchmark.run(settings)
+        benchmarks = results['benchmarks']
+        self.assertEqual(benchmarks['assign']['count'], 30)
+        self.assertEqual(benchmarks['add_tag']['count'], 90)
+        self.assertEqual(benchmarks['delete_tag']['count'], 2)
+        # Commits after each chunk and after the last call are timed.
+        self.assertEqual(benchmarks['assign_commit']['count'], 4)
+        self.assertEqual(benchmarks['add_tag_commit']['count'], 10)
+        self.assertEqual(benchmarks['delete_tag_commit']['count'], 1)
+        self.assertTrue(benchmarks['get_objects_tag']['loads'] > 0)
+
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'results.json')
+            benchmark.save_results(results, path)
+            baseline = benchmark.load_results(path)
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(benchmark.compare(baseline, results), [])
+        baseline['benchmarks']['has_tag']['p50'] = (
+                results['benchmarks']['has_tag']['p50'] / 2)
+        self.assertEqual(
+                [name for name, base, value, ratio in benchmark.compare(
+                    baseline, results)],
+                ['has_tag'])
+        self.assertIn(
+                u'get_objects_taglist', benchmark.format_results(results))
+
+        # Benchmark, which measured nothing, is skipped.
+        results['benchmarks']['delete_tag'] = benchmark.summarize([])
+        self.assertEqual(
+                [name for name, base, value, ratio in benchmark.compare(
+                    baseline, results)],
+                ['has_tag'])
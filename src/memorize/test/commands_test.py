@@ -0,0 +1,167 @@
+#!/usr/bin/python
+
+
+""" Tests for memorize.commands.
+"""
+
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import unittest
+from StringIO import StringIO
+
+from memorize import commands
+from memorize.config import ConfigManager
+
+
+WORDS = (
+        'value\ttranslation\ttags\n'
+        'gehen\tto go\tde.verbs de.a1\n'
+        'Haus\thouse\tde.nouns de.a1\n'
+        'Tisch\ttable\tde.nouns de.a2\n')
+
+
+class CommandsTest(unittest.TestCase):
+    """ Tests for subcommands of command line interface.
+    """
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'db', 'data.fs')
+
+    def tearDown(self):
+
+        shutil.rmtree(self.directory)
+
+    def run_command(self, argv, input=''):
+        """ Runs command in a fresh connection to database and returns
+        exit status, written records and summary.
+        """
+
+        parser = argparse.ArgumentParser()
+        commands.add_parsers(parser.add_subparsers())
+        args = commands.parse_arguments(parser, argv)
+        config = ConfigManager({
+            'database_path': self.path, 'create_directories': True})
+        stdout = StringIO()
+        stderr = StringIO()
+        status = commands.execute(
+                config, args, StringIO(input), stdout, stderr)
+        records = [
+                json.loads(line) for line in stdout.getvalue().splitlines()]
+        return status, records, json.loads(stderr.getvalue())
+
+    def test_import_query_export(self):
+
+        status, records, summary = self.run_command(
+                ['import', '--format', 'tsv', '--chunk-size', '2',
+                 '--commit-size', '2'],
+                WORDS)
+        self.assertEqual(status, 0)
+        self.assertEqual(summary['command'], u'import')
+        self.assertEqual(summary['objects'], 3)
+        self.assertTrue(summary['seconds'] >= 0)
+
+        status, records, summary = self.run_command(
+                ['query', 'de.a1 & !de.verbs'])
+        self.assertEqual(records, [{
+            u'id': 2, u'value': u'Haus', u'translation': u'house',
+            u'tags': [u'de.a1', u'de.nouns']}])
+        status, records, summary = self.run_command(
+                ['query', 'de.nouns', '--ids', '--limit', '1'])
+        self.assertEqual(records, [{u'id': 2}])
+        status, records, summary = self.run_command(
+                ['query', 'de', '--count'])
+        self.assertEqual(records, [{u'count': 3}])
+
+        status, exported, summary = self.run_command(['export'])
+        self.assertEqual(summary['objects'], 3)
+        self.assertEqual(
+                [record[u'value'] for record in exported],
+                [u'gehen', u'Haus', u'Tisch'])
+
+        # Exported records can be imported again.
+        input = u''.join([json.dumps(record) + '\n' for record in exported])
+        status, records, summary = self.run_command(['import'], input)
+        self.assertEqual(summary['objects'], 3)
+        status, records, summary = self.run_command(['export', 'de.a2'])
+        self.assertEqual(
+                [record[u'value'] for record in records],
+                [u'Tisch', u'Tisch'])
+
+        status, records, summary = self.run_command(['stats'])
+        self.assertEqual(records[0]['objects'], 6)
+        self.assertEqual(records[0]['tags'], 5)
+
+    def test_snapshot(self):
+
+        self.run_command(['import', '--format', 'tsv'], WORDS)
+        snapshot = os.path.join(self.directory, 'deck.snapshot')
+        status, records, summary = self.run_command(
+                ['export', '--snapshot', snapshot])
+        self.assertEqual(summary['objects'], 3)
+        status, records, summary = self.run_command(
+                ['import', '--format', 'snapshot', snapshot])
+        self.assertEqual(summary['objects'], 3)
+        status, records, summary = self.run_command(['query', 'de.nouns'])
+        self.assertEqual(
+                sorted([record[u'translation'] for record in records]),
+                [u'house', u'house', u'table', u'table'])
+
+    def test_review_and_pack(self):
+
+        self.run_command(['import', '--format', 'tsv'], WORDS)
+        status, records, summary = self.run_command(
+                ['review'],
+                '{"id": 1, "quality": 5, "time": 0}\n'
+                '{"id": 2, "quality": 1, "time": 0}\n')
+        self.assertEqual(summary['objects'], 2)
+        self.assertEqual(summary['scheduled'], 2)
+
+        status, records, summary = self.run_command(
+                ['review', '--due', '--tags', 'de.nouns'])
+        self.assertEqual([record[u'id'] for record in records], [2])
+        self.assertEqual(records[0][u'review'][u'lapses'], 1)
+
+        status, records, summary = self.run_command(['pack'])
+        self.assertEqual(status, 0)
+        self.assertTrue(summary['size_after'] <= summary['size_before'])
+
+    def test_review_fractional_time(self):
+
+        self.run_command(['import', '--format', 'tsv'], WORDS)
+        status, records, summary = self.run_command(
+                ['review'], '{"id": 1, "quality": 4, "time": 1.5}\n')
+        self.assertEqual(summary['objects'], 1)
+
+    def test_bench(self):
+
+        status, records, summary = self.run_command(
+                ['bench', '--objects', '20', '--depth', '2', '--fanout',
+                 '2', '--queries', '3', '--deletions', '1'])
+        self.assertEqual(status, 0)
+        self.assertEqual(summary['failures'], 0)
+        self.assertEqual(
+                [record[u'benchmark'] for record in records],
+                [u'add_tag', u'add_tag_commit', u'assign', u'assign_commit',
+                 u'delete_tag', u'delete_tag_commit', u'get_objects_tag',
+                 u'get_objects_taglist', u'has_tag'])
+        self.assertEqual(records[2][u'count'], 20)
+
+        # Options of benchmarks are rejected by other commands.
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            self.assertRaises(
+                    SystemExit, self.run_command,
+                    ['stats', '--objects', '20'])
+            self.assertIn(
+                    u'unrecognized arguments: --objects 20',
+                    sys.stderr.getvalue())
+        finally:
+            sys.stderr = stderr
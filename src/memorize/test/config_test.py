@@ -0,0 +1,49 @@
+#!/usr/bin/python
+
+
+""" Tests for memorize.config.
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import transaction
+
+from memorize.config import ConfigManager
+
+
+class ConfigManagerTest(unittest.TestCase):
+    """ Tests for ConfigManager.
+    """
+
+    def test_memory_storage(self):
+
+        config = ConfigManager({'storage': 'memory', 'cache_size': 50})
+        config.db_root['a'] = 1
+        transaction.commit()
+        self.assertEqual(config.database.getCacheSize(), 50)
+        self.assertEqual(config.connection.root()['a'], 1)
+        config.close()
+        self.assertRaises(ValueError, ConfigManager, {
+            'storage': 'unknown', 'connect_to_db': True})
+
+    def test_file_storage(self):
+
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, u'db', u'data.fs')
+            config = ConfigManager({
+                'database_path': path,
+                'create_directories': True,
+                'pool_size': 2,
+                })
+            config.db_root['a'] = 1
+            transaction.commit()
+            self.assertEqual(config.database.getPoolSize(), 2)
+            config.close()
+            self.assertTrue(os.path.exists(path))
+        finally:
+            shutil.rmtree(directory)
@@ -5,15 +5,148 @@
 """
 
 
+import os
+import shutil
+import tempfile
 import unittest
+import threading
 
 
-from memorize.db import connect
+from memorize.db import connect, open_database, ConnectionManager
+
+try:
+    import ZEO
+except ImportError:
+    ZEO = None
+try:
+    import relstorage
+except ImportError:
+    relstorage = None
 
 
 def test_connection():
     """ Test for ``connect``.
     """
 
-    root = connect('data.fs')
-    root["a"] = 1
+    directory = tempfile.mkdtemp()
+    try:
+        root = connect(os.path.join(directory, 'data.fs'))
+        root["a"] = 1
+        root._p_jar.db().close()
+    finally:
+        shutil.rmtree(directory)
+
+
+class ConnectionManagerTest(unittest.TestCase):
+    """ Tests for ConnectionManager.
+    """
+
+    def setUp(self):
+
+        self.manager = ConnectionManager(
+                open_database({'storage': 'memory', 'pool_size': 2}))
+        with self.manager.transaction() as root:
+            root['counter'] = 0
+
+    def tearDown(self):
+
+        self.manager.close()
+
+    def test_threads(self):
+
+        connections = {}
+
+        def work(name):
+            connection = self.manager.get_thread_connection()
+            self.assertIs(connection, self.manager.get_thread_connection())
+            connections[name] = connection
+            for i in range(20):
+                self.manager.run(increment, attempts=20)
+            self.manager.close_thread_connection()
+
+        def increment(root):
+            root['counter'] += 1
+
+        threads = [
+                threading.Thread(target=work, args=(i,)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(connections.values())), 3)
+        self.assertEqual(
+                self.manager.run(lambda root: root['counter']), 60)
+
+    def test_abort(self):
+
+        try:
+            with self.manager.transaction() as root:
+                root['counter'] = 5
+                raise ValueError()
+        except ValueError:
+            pass
+        with self.manager.transaction() as root:
+            self.assertEqual(root['counter'], 0)
+
+
+class OpenDatabaseTest(unittest.TestCase):
+    """ Tests for open_database.
+    """
+
+    def test_instrument(self):
+
+        from memorize.tag_tree import TagTree
+        from memorize.instrumentation import _originals
+
+        create_tag = TagTree.__dict__['create_tag']
+        database = open_database({'storage': 'memory', 'instrument': True})
+        self.assertIsNot(TagTree.__dict__['create_tag'], create_tag)
+        database.close()
+        self.assertIs(TagTree.__dict__['create_tag'], create_tag)
+        self.assertEqual(_originals, {})
+
+        # Methods are restored, when the last database is closed.
+        config = {'storage': 'memory', 'instrument': True}
+        database1 = open_database(config)
+        database2 = open_database(config)
+        database1.close()
+        self.assertIsNot(TagTree.__dict__['create_tag'], create_tag)
+        database2.close()
+        self.assertIs(TagTree.__dict__['create_tag'], create_tag)
+
+    def check_database(self, database):
+        """ Checks, that data committed through ``database`` can be
+        read back, and closes it.
+        """
+
+        manager = ConnectionManager(database)
+        try:
+            with manager.transaction() as root:
+                root['answer'] = 42
+            with manager.transaction() as root:
+                self.assertEqual(root['answer'], 42)
+        finally:
+            manager.close()
+
+    @unittest.skipIf(ZEO is None, 'ZEO is not installed.')
+    def test_zeo(self):
+
+        address, stop = ZEO.server()
+        try:
+            self.check_database(open_database({
+                'storage': 'zeo',
+                'zeo_address': u'{0}:{1}'.format(*address)}))
+        finally:
+            stop()
+
+    @unittest.skipIf(relstorage is None, 'RelStorage is not installed.')
+    def test_relstorage(self):
+
+        directory = tempfile.mkdtemp()
+        try:
+            self.check_database(open_database({
+                'storage': 'relstorage',
+                'relstorage_directory': directory}))
+        finally:
+            shutil.rmtree(directory)
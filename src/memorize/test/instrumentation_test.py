@@ -0,0 +1,88 @@
+#!/usr/bin/python
+
+
+""" Tests for memorize.instrumentation.
+"""
+
+
+import unittest
+
+import transaction
+from ZODB.DB import DB
+from ZODB.MappingStorage import MappingStorage
+
+from memorize import instrumentation
+from memorize.tag_tree import TagTree, TaggedObject, Tag
+
+
+class InstrumentationTest(unittest.TestCase):
+    """ Tests for storage and method instrumentation.
+    """
+
+    def setUp(self):
+
+        self.stats = instrumentation.Stats()
+        self.database = DB(instrumentation.InstrumentedStorage(
+            MappingStorage(), self.stats))
+        connection = self.database.open()
+        tree = connection.root()['tree'] = TagTree()
+        tree.create_tag(Tag(u'a.b'))
+        for i in range(10):
+            obj = TaggedObject()
+            tree.assign(obj)
+            obj.add_tag(Tag(u'a.b'))
+        transaction.commit()
+        connection.close()
+        instrumentation.enable(self.stats)
+        self.stats.reset()
+
+    def tearDown(self):
+
+        instrumentation.disable()
+        transaction.abort()
+        self.database.close()
+
+    def test_stats(self):
+
+        connection = self.database.open()
+        connection.cacheMinimize()
+        tree = connection.root()['tree']
+        loads = self.stats.loads
+        self.assertTrue(loads > 0)
+
+        objects = tree.get_objects(Tag(u'a'))
+        self.assertEqual(len(objects), 10)
+        for obj in objects[:4]:
+            obj.get_id()
+        self.assertEqual(tree.get_object(1).get_id(), 1)
+        self.assertEqual(
+                [obj.get_id() for obj in tree.iter_objects(Tag(u'a.b'))],
+                range(1, 11))
+
+        data = self.stats.as_dict(self.database)
+        self.assertEqual(data['objects']['misses'], 10 + 6)
+        self.assertEqual(data['objects']['hits'], 1 + 4)
+        self.assertEqual(data['objects']['hit_ratio'], 5.0 / 21)
+        self.assertEqual(data['storage']['loads'], self.stats.loads)
+        self.assertTrue(self.stats.loads > loads + 10)
+        operation = data['operations']['TagTree.get_objects']
+        self.assertEqual(operation['calls'], 1)
+        self.assertTrue(operation['loads'] > 0)
+        self.assertTrue(operation['bytes'] > 0)
+        self.assertEqual(data['cache']['connections'], 1)
+
+        text = self.stats.to_prometheus(self.database)
+        self.assertIn(
+                u'memorize_operation_calls_total'
+                u'{operation="TagTree.get_objects"} 1\n',
+                text)
+        self.assertIn(
+                u'# TYPE memorize_storage_loads_total counter\n', text)
+        connection.close()
+
+    def test_disable(self):
+
+        instrumentation.disable()
+        tree = TagTree()
+        tree.create_tag(Tag(u'a'))
+        self.assertEqual(self.stats.operations, {})
@@ -0,0 +1,107 @@
+#!/usr/bin/python
+
+
+""" Tests for memorize.scheduler.
+"""
+
+
+import unittest
+
+
+from memorize.tag_tree import Tag, TagList, TaggedObject, TagTree
+from memorize.scheduler import Scheduler, ReviewState, next_state
+from memorize.scheduler import DAY, INITIAL_EASE, MINIMAL_EASE
+
+
+class NextStateTest(unittest.TestCase):
+    """ Tests for next_state.
+    """
+
+    def test_sm2(self):
+
+        state = ReviewState(0, 0, INITIAL_EASE, 0, 0)
+        state = next_state(state, 5, 100)
+        self.assertEqual(state.interval, 1)
+        self.assertEqual(state.due, 100 + DAY)
+        self.assertAlmostEqual(state.ease, 2.6)
+        state = next_state(state, 4, 200)
+        self.assertEqual(state.interval, 6)
+        self.assertAlmostEqual(state.ease, 2.6)
+        state = next_state(state, 3, 300)
+        self.assertEqual(state.interval, 16)
+        self.assertAlmostEqual(state.ease, 2.46)
+        self.assertEqual(state.repetitions, 3)
+        state = next_state(state, 0, 400)
+        self.assertEqual(state.interval, 1)
+        self.assertEqual(state.repetitions, 0)
+        self.assertEqual(state.lapses, 1)
+        self.assertAlmostEqual(state.ease, 1.66)
+        state = next_state(state, 0, 400)
+        self.assertEqual(state.ease, MINIMAL_EASE)
+
+        self.assertRaises(ValueError, next_state, state, 6, 0)
+        self.assertRaises(ValueError, next_state, state, -1, 0)
+
+
+class SchedulerTest(unittest.TestCase):
+    """ Tests for Scheduler.
+    """
+
+    def test_scheduling(self):
+
+        tree = TagTree()
+        tree.create_tag(Tag(u'a.b'))
+        tree.create_tag(Tag(u'c'))
+        objects = [TaggedObject() for i in range(20)]
+        for i, obj in enumerate(objects):
+            tree.assign(obj)
+            obj.add_tag(Tag(u'a.b' if i % 2 else u'a'))
+        objects[0].add_tag(Tag(u'c'))
+
+        scheduler = Scheduler(tree)
+        for i, obj in enumerate(objects):
+            scheduler.add(obj, now=60000 - i * 600)
+        self.assertRaises(KeyError, scheduler.add, objects[0])
+        self.assertEqual(scheduler.count(), 20)
+
+        def ids(*args, **kwargs):
+            return scheduler.get_due_ids(*args, **kwargs)
+
+        self.assertEqual(ids(now=60000), range(20, 0, -1))
+        self.assertEqual(ids(now=60000, limit=3), [20, 19, 18])
+        self.assertEqual(ids(now=60000, limit=0), [])
+        self.assertEqual(ids(now=59400), range(20, 1, -1))
+        self.assertEqual(ids(Tag(u'a.b'), now=60000, limit=2), [20, 18])
+        self.assertEqual(ids(Tag(u'c'), now=60000), [1])
+        self.assertEqual(ids(Tag(u'c'), now=59999), [])
+        self.assertEqual(ids(TagList(u'a c'), now=70000, limit=5), [1])
+
+        for obj in objects[:10]:
+            scheduler.review(obj, 5, now=70000)
+        self.assertEqual(scheduler.get_state(objects[0]).interval, 1)
+        self.assertEqual(ids(now=70000), range(20, 10, -1))
+        self.assertEqual(ids(Tag(u'c'), now=70000), [])
+        self.assertEqual(ids(Tag(u'c'), now=70000 + DAY), [1])
+        self.assertEqual(
+                [obj.get_id() for obj in scheduler.get_due(
+                    Tag(u'a.b'), now=70000 + DAY, limit=7)],
+                [20, 18, 16, 14, 12, 2, 4])
+
+        scheduler.remove(objects[19])
+        self.assertRaises(KeyError, scheduler.remove, objects[19])
+        self.assertRaises(KeyError, scheduler.get_state, 20)
+        self.assertEqual(scheduler.count(), 19)
+        self.assertEqual(ids(now=70000), range(19, 10, -1))
+
+    def test_float_time(self):
+
+        tree = TagTree()
+        obj = TaggedObject()
+        tree.assign(obj)
+        scheduler = Scheduler(tree)
+        scheduler.add(obj, now=1000.75)
+        self.assertEqual(scheduler.get_state(obj).due, 1000)
+        self.assertEqual(
+                scheduler.review(obj, 4, now=2000.5).due, 2000 + DAY)
+        self.assertEqual(scheduler.get_due_ids(now=2000.5 + DAY), [1])
+        scheduler.review(obj, 4)
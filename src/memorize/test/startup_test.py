@@ -0,0 +1,45 @@
+#!/usr/bin/python
+
+
+""" Tests for cost of starting :py:func:`memorize.main`.
+"""
+
+
+import os
+import sys
+import json
+import unittest
+import subprocess
+
+
+HEAVY_MODULES = ['ZODB', 'ZEO', 'relstorage', 'BTrees', 'persistent']
+
+SCRIPT = '''
+import sys, json
+import memorize
+try:
+    memorize.main(['--help'])
+except SystemExit:
+    pass
+sys.stderr.write(json.dumps(sorted(sys.modules)))
+'''
+
+
+class StartupTest(unittest.TestCase):
+    """ Tests, that command line interface starts without loading
+    storage machinery.
+    """
+
+    def test_help(self):
+
+        environment = dict(os.environ)
+        environment['PYTHONPATH'] = os.pathsep.join(sys.path)
+        process = subprocess.Popen(
+                [sys.executable, '-c', SCRIPT], env=environment,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output, errors = process.communicate()
+        self.assertEqual(process.returncode, 0, errors)
+        self.assertIn('usage:', output)
+        modules = json.loads(errors)
+        for name in HEAVY_MODULES:
+            self.assertNotIn(name, modules)
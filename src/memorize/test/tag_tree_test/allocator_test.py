@@ -0,0 +1,95 @@
+#!/usr/bin/python
+
+
+""" Tests for memorize.tag_tree.allocator.
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import transaction
+from ZODB.DB import DB
+from ZODB.FileStorage import FileStorage
+
+from memorize.tag_tree import TagTree, TaggedObject
+from memorize.tag_tree.allocator import IdAllocator
+
+
+class IdAllocatorTest(unittest.TestCase):
+    """ Tests for IdAllocator.
+    """
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.database = DB(FileStorage(
+            os.path.join(self.directory, 'data.fs')))
+        connection = self.database.open()
+        connection.root()['tree'] = TagTree()
+        transaction.commit()
+        connection.close()
+
+    def tearDown(self):
+
+        self.database.close()
+        shutil.rmtree(self.directory)
+
+    def open(self):
+        """ Returns transaction manager and tree of a new connection.
+        """
+
+        manager = transaction.TransactionManager()
+        connection = self.database.open(manager)
+        return manager, connection.root()['tree']
+
+    def test_concurrent_writers(self):
+
+        manager1, tree1 = self.open()
+        manager2, tree2 = self.open()
+        tree1.assign(TaggedObject())
+        manager1.commit()
+        manager2.begin()
+        tree2.assign(TaggedObject())
+        manager2.commit()
+
+        # Writers, which have reserved blocks, do not conflict.
+        manager1.begin()
+        manager2.begin()
+        for i in range(3):
+            tree1.assign(TaggedObject())
+            tree2.assign(TaggedObject())
+        manager1.commit()
+        manager2.commit()
+
+        manager, tree = self.open()
+        self.assertEqual(
+                list(tree._objects.keys()),
+                [1, 2, 3, 4, 1001, 1002, 1003, 1004])
+
+    def test_abort(self):
+
+        manager, tree = self.open()
+        obj = TaggedObject()
+        tree.assign(obj)
+        self.assertEqual(obj.get_id(), 1)
+        manager.abort()
+        obj = TaggedObject()
+        tree.assign(obj)
+        self.assertEqual(obj.get_id(), 1)
+        manager.commit()
+
+        # Block reserved in committed transaction is kept.
+        obj = TaggedObject()
+        tree.assign(obj)
+        self.assertEqual(obj.get_id(), 2)
+        manager.abort()
+
+    def test_skip_used(self):
+
+        allocator = IdAllocator(block_size=2)
+        self.assertEqual(allocator.allocate(lambda i: i in (1, 3)), 2)
+        self.assertEqual(allocator.allocate(lambda i: i in (1, 3)), 4)
+        self.assertEqual(allocator.reserved(), 5)
@@ -0,0 +1,128 @@
+#!/usr/bin/python
+# -*- encoding: utf-8 -*-
+
+
+""" Tests for memorize.tag_tree.bulk.
+"""
+
+
+import unittest
+from StringIO import StringIO
+
+import transaction
+from ZODB.DB import DB
+
+from memorize.db import ConnectionManager
+
+from memorize.tag_tree import Tag, TagList, TaggedObject, TagTree
+from memorize.tag_tree.bulk import BulkLoader, read_records
+
+
+class Word(TaggedObject):
+    """ Word used in tests.
+    """
+
+    def __init__(self, record):
+        super(Word, self).__init__()
+        self.value = record[u'value']
+
+
+class ReadersTest(unittest.TestCase):
+    """ Tests for record readers.
+    """
+
+    def test_readers(self):
+
+        expected = [
+                {u'value': u'gehen', u'tags': u'de.a1 de.verbs'},
+                {u'value': u'Mädchen', u'tags': u'de.a1'},
+                ]
+
+        self.assertEqual(list(read_records(StringIO(
+            'value,tags\n'
+            'gehen,de.a1 de.verbs\n'
+            '\n'
+            'M\xc3\xa4dchen,de.a1\n'), 'csv')), expected)
+        self.assertEqual(list(read_records(StringIO(
+            'value\ttags\n'
+            'gehen\tde.a1 de.verbs\n'
+            'M\xc3\xa4dchen\tde.a1\n'), 'tsv')), expected)
+        self.assertEqual(list(read_records(StringIO(
+            '{"value": "gehen", "tags": "de.a1 de.verbs"}\n'
+            '\n'
+            '{"value": "M\\u00e4dchen", "tags": "de.a1"}\n'), 'jsonl')),
+            expected)
+        self.assertEqual(list(read_records(StringIO(''), 'csv')), [])
+        self.assertRaises(ValueError, read_records, StringIO(''), 'xml')
+
+
+class BulkLoaderTest(unittest.TestCase):
+    """ Tests for BulkLoader.
+    """
+
+    def records(self, count):
+        for i in range(count):
+            yield {
+                    u'value': unicode(i),
+                    u'tags': [u'n.m{0}'.format(i % 3), u'n', u'n'],
+                    }
+
+    def check(self, tree, count):
+
+        self.assertEqual(len(tree.get_objects(Tag(u'n'))), count)
+        self.assertEqual(
+                sorted([
+                    int(obj.value)
+                    for obj in tree.get_objects(TagList(u'n.m1 n'))]),
+                range(1, count, 3))
+        obj = tree.get_objects(Tag(u'n.m2'))[0]
+        self.assertEqual(
+                sorted([unicode(tag) for tag in obj.get_tag_list()]),
+                [u'n', u'n.m2'])
+        self.assertTrue(obj.has_tag(Tag(u'n.m2')))
+        object_ids = tree.get_tag_node(Tag(u'n')).get_object_ids()
+        self.assertEqual(list(object_ids.values()), [2] * count)
+        obj.remove_tag(Tag(u'n.m2'))
+        self.assertEqual(len(tree.get_objects(Tag(u'n.m2'))), count / 3 - 1)
+
+    def test_load(self):
+
+        tree = TagTree()
+        tree.create_tag(Tag(u'n.m0'))
+        loader = BulkLoader(tree, Word, chunk_size=4)
+        self.assertEqual(loader.load(self.records(30)), 30)
+        self.check(tree, 30)
+
+    def test_load_to_database(self):
+
+        database = DB(None)
+        connection = database.open()
+        root = connection.root()
+        root['tree'] = tree = TagTree()
+        transaction.commit()
+
+        loader = BulkLoader(tree, Word, chunk_size=7, commit_size=14)
+        self.assertEqual(loader.load(self.records(30)), 30)
+        transaction.commit()
+
+        connection2 = database.open()
+        self.check(connection2.root()['tree'], 30)
+        transaction.abort()
+        connection.close()
+        connection2.close()
+        database.close()
+
+    def test_load_with_connection_manager(self):
+
+        manager = ConnectionManager(DB(None))
+        connection = manager.open()
+        connection.root()['tree'] = tree = TagTree()
+        connection.transaction_manager.commit()
+
+        loader = BulkLoader(tree, Word, chunk_size=2, commit_size=2)
+        self.assertEqual(loader.load(self.records(6)), 6)
+        connection.close()
+
+        with manager.transaction() as root:
+            self.assertEqual(len(root['tree'].get_objects(Tag(u'n'))), 6)
+        manager.close()
@@ -0,0 +1,145 @@
+#!/usr/bin/python
+
+
+""" Tests for memorize.tag_tree.filters.
+"""
+
+
+import unittest
+
+from BTrees.IIBTree import IISet
+
+from memorize.tag_tree import Tag, TaggedObject, TagTree
+from memorize.tag_tree.filters import Attribute, AllOf, AnyOf, In
+
+
+class Word(TaggedObject):
+    """ Word used in tests.
+    """
+
+    def __init__(self, value, rank):
+        super(Word, self).__init__()
+        self.value = value
+        self.rank = rank
+
+
+class DictIndex(object):
+    """ Index, which scans a dict (object id -> value).
+    """
+
+    attribute = 'value'
+
+    def __init__(self, values):
+        self.values = values
+        self.searches = 0
+
+    def search_values(self, values):
+        self.searches += 1
+        return IISet([
+            object_id
+            for object_id, value in self.values.items()
+            if value in values])
+
+    def search_range(self, min, max, excludemin, excludemax):
+        self.searches += 1
+        return IISet([
+            object_id
+            for object_id, value in self.values.items()
+            if (min is None or value > min or
+                    (value == min and not excludemin)) and
+                (max is None or value < max or
+                    (value == max and not excludemax))])
+
+
+class FiltersTest(unittest.TestCase):
+    """ Tests for filters.
+    """
+
+    def setUp(self):
+
+        self.tree = TagTree()
+        self.tree.create_tag(Tag(u'a.b'))
+        self.words = []
+        for i in range(10):
+            word = Word(unicode(i), i % 4)
+            self.tree.assign(word)
+            word.add_tag(Tag(u'a.b' if i % 2 else u'a'))
+            self.words.append(word)
+
+    def values(self, tag, filter):
+        return sorted([
+            word.value for word in self.tree.get_objects(Tag(tag), filter)])
+
+    def check_filters(self):
+
+        value = Attribute('value')
+        rank = Attribute('rank')
+        self.assertEqual(
+                self.values(u'a', value > u'6'), [u'7', u'8', u'9'])
+        self.assertEqual(self.values(u'a', value >= u'8'), [u'8', u'9'])
+        self.assertEqual(self.values(u'a', value < u'2'), [u'0', u'1'])
+        self.assertEqual(self.values(u'a', value <= u'1'), [u'0', u'1'])
+        self.assertEqual(self.values(u'a.b', value == u'3'), [u'3'])
+        self.assertEqual(self.values(u'a.b', value == u'4'), [])
+        self.assertEqual(
+                self.values(u'a', value.between(u'3', u'5')),
+                [u'3', u'4', u'5'])
+        self.assertEqual(
+                self.values(u'a', value.is_in([u'1', u'2', u'x'])),
+                [u'1', u'2'])
+        self.assertEqual(
+                self.values(u'a', (value > u'2') & (rank == 1)),
+                [u'5', u'9'])
+        self.assertEqual(
+                self.values(u'a', (value < u'2') | (rank == 3)),
+                [u'0', u'1', u'3', u'7'])
+        self.assertEqual(
+                self.values(u'a.b', AllOf([rank < 2, value > u'1'])),
+                [u'5', u'9'])
+        self.assertEqual(
+                self.values(u'a', AnyOf([In('rank', [0]), value == u'1'])),
+                [u'0', u'1', u'4', u'8'])
+        self.assertEqual(
+                self.values(u'a', Attribute('missing') == 1), [])
+        self.assertEqual(
+                self.values(u'a.b', lambda word: word.rank == 3),
+                [u'3', u'7'])
+
+    def test_without_indexes(self):
+
+        self.check_filters()
+
+    def test_with_indexes(self):
+
+        index = DictIndex(dict([
+            (word.get_id(), word.value) for word in self.words]))
+        self.tree._indexes['value'] = index
+        self.check_filters()
+        self.assertEqual(index.searches, 11)
+
+        value = Attribute('value')
+        rank = Attribute('rank')
+        self.assertEqual(
+                (value > u'2').split(self.tree._indexes)[1], None)
+        ids, residual = ((value > u'2') & (rank == 1)).split(
+                self.tree._indexes)
+        self.assertEqual(list(ids), range(4, 11))
+        self.assertEqual(residual.attribute, 'rank')
+        ids, residual = ((value > u'2') | (rank == 1)).split(
+                self.tree._indexes)
+        self.assertIs(ids, None)
+
+        # Plain callables and ``ne`` comparisons are residual.
+        check = lambda word: word.rank == 3
+        ids, residual = AllOf([value > u'2', check]).split(
+                self.tree._indexes)
+        self.assertEqual(list(ids), range(4, 11))
+        self.assertIs(residual, check)
+        ids, residual = AnyOf([value > u'2', check]).split(
+                self.tree._indexes)
+        self.assertIs(ids, None)
+        ids, residual = (value != u'2').split(self.tree._indexes)
+        self.assertIs(ids, None)
+        self.assertEqual(
+                self.values(u'a', (value != u'2') & (rank != 1)),
+                [u'0', u'3', u'4', u'6', u'7', u'8'])
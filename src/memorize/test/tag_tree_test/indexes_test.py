@@ -0,0 +1,231 @@
+#!/usr/bin/python
+# -*- encoding: utf-8 -*-
+
+
+""" Tests for memorize.tag_tree.indexes.
+"""
+
+
+import unittest
+
+
+from memorize.tag_tree import Tag, TaggedObject, TagTree
+from memorize.tag_tree.exceptions import IntegrityError
+from memorize.tag_tree.filters import Attribute
+from memorize.tag_tree.indexes import FieldIndex, KeywordIndex, PrefixIndex
+from memorize.tag_tree.indexes import TrigramIndex
+
+
+class Word(TaggedObject):
+    """ Word used in tests.
+    """
+
+    def __init__(self, value, rank, parts):
+        super(Word, self).__init__()
+        self.value = value
+        self.rank = rank
+        self.parts = parts
+
+
+class IndexesTest(unittest.TestCase):
+    """ Tests for indexes.
+    """
+
+    def test_indexes(self):
+
+        rank = FieldIndex('rank')
+        for object_id, value in [(1, 5), (2, 3), (3, 5), (4, 9)]:
+            obj = Word(None, value, [])
+            rank.index_object(object_id, obj)
+        self.assertEqual(rank.count(), 4)
+        self.assertEqual(list(rank.search_values([5, 9, 10])), [1, 3, 4])
+        self.assertEqual(list(rank.search_range(3, 5)), [1, 2, 3])
+        self.assertEqual(list(rank.search_range(3, 5, True)), [1, 3])
+        self.assertEqual(list(rank.search_range(None, 5, False, True)), [2])
+        self.assertEqual(list(rank.search_range(6, None)), [4])
+        rank.index_object(1, Word(None, 3, []))
+        self.assertEqual(list(rank.search_values([3])), [1, 2])
+        self.assertEqual(list(rank.search_values([5])), [3])
+        rank.index_object(3, object())
+        self.assertEqual(list(rank.search_values([5])), [])
+        self.assertEqual(rank.count(), 3)
+        rank.unindex_object(2)
+        rank.unindex_object(2)
+        self.assertEqual(list(rank.search_range(None, None)), [1, 4])
+
+        value = FieldIndex('value')
+        folded = PrefixIndex('value')
+        for object_id, text in enumerate(
+                [u'Verb', u'verstehen', u'Haus', u'vergessen', u'ver']):
+            value.index_object(object_id, Word(text, 0, []))
+            folded.index_object(object_id, Word(text, 0, []))
+        self.assertEqual(list(value.search_prefix(u'ver')), [1, 3, 4])
+        self.assertEqual(list(value.search_prefix(u'verg')), [3])
+        self.assertEqual(
+                list(folded.search_folded_prefix(u'VER')), [0, 1, 3, 4])
+        self.assertFalse(hasattr(folded, 'search_prefix'))
+
+        parts = KeywordIndex('parts')
+        parts.index_object(1, Word(None, 0, [u'noun', u'plural']))
+        parts.index_object(2, Word(None, 0, [u'verb']))
+        parts.index_object(3, Word(None, 0, [u'noun']))
+        self.assertEqual(list(parts.search_keywords([u'noun'])), [1, 3])
+        self.assertEqual(
+                list(parts.search_keywords([u'plural', u'verb'])), [1, 2])
+        parts.index_object(1, Word(None, 0, [u'verb']))
+        self.assertEqual(list(parts.search_keywords([u'noun'])), [3])
+        self.assertEqual(list(parts.search_keywords([u'verb'])), [1, 2])
+
+    def test_tree_indexes(self):
+
+        tree = TagTree()
+        tree.create_tag(Tag(u'de.verbs'))
+        words = []
+        for i, value in enumerate(
+                [u'verstehen', u'Verb', u'gehen', u'vergessen', u'Haus']):
+            word = Word(value, i, [u'noun'] if value[0].isupper() else [])
+            tree.assign(word)
+            word.add_tag(Tag(u'de' if i % 2 else u'de.verbs'))
+            words.append(word)
+
+        tree.add_index('value', FieldIndex('value'))
+        tree.add_index('folded', PrefixIndex('value'))
+        tree.add_index('rank', FieldIndex('rank'))
+        self.assertRaises(KeyError, tree.add_index, 'rank', FieldIndex('x'))
+        tree.add_index('parts', KeywordIndex('parts'))
+        self.assertEqual(tree.get_index('rank').count(), 5)
+
+        def values(tag, filter):
+            return [
+                    word.value
+                    for word in tree.get_objects(Tag(tag), filter)]
+
+        value = Attribute('value')
+        self.assertEqual(
+                values(u'de', value.startswith(u'ver')),
+                [u'verstehen', u'vergessen'])
+        self.assertEqual(
+                values(u'de', value.startswith(u'ver', ignore_case=True)),
+                [u'verstehen', u'Verb', u'vergessen'])
+        self.assertEqual(
+                values(u'de.verbs', value.startswith(u'ver')),
+                [u'verstehen'])
+        self.assertEqual(
+                values(u'de', Attribute('parts').contains(u'noun')),
+                [u'Verb', u'Haus'])
+        self.assertEqual(
+                values(u'de', Attribute('rank') >= 3),
+                [u'vergessen', u'Haus'])
+
+        # Indexes are updated, when objects are assigned and changed.
+        word = Word(u'verlieren', 7, [])
+        tree.assign(word)
+        word.add_tag(Tag(u'de'))
+        words[0].value = u'Stuhl'
+        words[0].rank = 10
+        self.assertEqual(
+                values(u'de', value.startswith(u'ver')),
+                [u'vergessen', u'verlieren'])
+        self.assertEqual(
+                values(u'de', Attribute('rank') >= 3),
+                [u'Stuhl', u'vergessen', u'Haus', u'verlieren'])
+        words[2].parts.append(u'noun')
+        self.assertEqual(
+                values(u'de', Attribute('parts').contains(u'noun')),
+                [u'Verb', u'Haus'])
+        words[2].reindex()
+        self.assertEqual(
+                values(u'de', Attribute('parts').contains(u'noun')),
+                [u'Verb', u'gehen', u'Haus'])
+
+        tree.remove_index('value')
+        tree.remove_index('folded')
+        self.assertRaises(KeyError, tree.get_index, 'value')
+        self.assertEqual(
+                values(u'de', value.startswith(u'ver')),
+                [u'vergessen', u'verlieren'])
+
+    def test_invalid_values(self):
+
+        tree = TagTree()
+        tree.add_index('folded', PrefixIndex('value'))
+        tree.add_index('parts', KeywordIndex('parts'))
+        tree.add_index('fuzzy', TrigramIndex('value'))
+        tree.add_index('tags', KeywordIndex('tags'))
+        word = Word(None, 0, [])
+        tree.assign(word)
+        self.assertEqual(tree.get_index('folded').count(), 0)
+        word.value = u'Haus'
+        self.assertEqual(tree.get_index('folded').count(), 1)
+        self.assertEqual(tree.get_index('fuzzy').count(), 1)
+        word.value = 5
+        self.assertEqual(tree.get_index('folded').count(), 0)
+        self.assertEqual(tree.get_index('fuzzy').count(), 0)
+
+        # Value, which can not be indexed, is not set.
+        word.parts = [u'noun']
+        self.assertRaises(TypeError, setattr, word, 'parts', 5)
+        self.assertEqual(word.parts, [u'noun'])
+        self.assertEqual(
+                list(tree.get_index('parts').search_keywords([u'noun'])),
+                [1])
+        self.assertRaises(TypeError, setattr, word, 'tags', 5)
+        self.assertFalse(hasattr(word, 'tags'))
+
+        # Object, which can not be indexed, is not assigned.
+        word = Word(u'gehen', 0, 5)
+        self.assertRaises(TypeError, tree.assign, word)
+        self.assertEqual(list(tree.get_all_object_ids()), [1])
+        self.assertEqual(tree.get_index('folded').count(), 0)
+        self.assertRaises(IntegrityError, word.get_id)
+
+    def test_trigram_index(self):
+
+        tree = TagTree()
+        tree.create_tag(Tag(u'de.a1'))
+        tree.create_tag(Tag(u'de.b2'))
+        tree.add_index('fuzzy', TrigramIndex('value'))
+        for i, value in enumerate([
+                u'verstehen', u'vergehen', u'gehen', u'Straße', u'Haus',
+                u'Maus', u'Häuser']):
+            word = Word(value, i, [])
+            tree.assign(word)
+            word.add_tag(Tag(u'de.a1' if i % 2 else u'de.b2'))
+
+        def search(value, **kwargs):
+            return [
+                    (round(score, 2), word.value)
+                    for score, word in tree.search(
+                        'fuzzy', value, **kwargs)]
+
+        def similar(value, min_similarity, fold_umlauts=True):
+            return [
+                    word.value for word in tree.get_objects(
+                        Tag(u'de'),
+                        Attribute('value').similar_to(
+                            value, min_similarity, fold_umlauts))]
+
+        self.assertEqual(search(u'verstehn', min_similarity=0.2), [
+            (0.71, u'verstehen'), (0.25, u'vergehen')])
+        self.assertEqual(search(u'verstehn', limit=1), [
+            (0.71, u'verstehen')])
+        self.assertEqual(search(u'Strasse'), [(1.0, u'Straße')])
+        self.assertEqual(search(u'haus', min_similarity=0.1), [
+            (1.0, u'Haus'), (0.5, u'Maus'), (0.18, u'Häuser')])
+        self.assertEqual(search(u'haus', tags=Tag(u'de.a1')), [
+            (0.5, u'Maus')])
+        self.assertEqual(search(u'xyz'), [])
+
+        index = tree.get_index('fuzzy')
+        self.assertEqual(list(index.search_similar(u'Haeuser', 0.9)), [7])
+        self.assertEqual(similar(u'gehn', 0.15), [u'vergehen', u'gehen'])
+
+        # Filter gives the same results with and without index.
+        self.assertEqual(similar(u'Haeuser', 0.9), [u'H\xe4user'])
+        self.assertEqual(similar(u'Haeuser', 0.9, False), [])
+        self.assertEqual(similar(u'Hauser', 0.9, False), [u'H\xe4user'])
+        tree.remove_index('fuzzy')
+        self.assertEqual(similar(u'gehn', 0.15), [u'vergehen', u'gehen'])
+        self.assertEqual(similar(u'Haeuser', 0.9), [u'H\xe4user'])
+        self.assertEqual(similar(u'Haeuser', 0.9, False), [])
+        self.assertEqual(similar(u'Hauser', 0.9, False), [u'H\xe4user'])
@@ -0,0 +1,121 @@
+#!/usr/bin/python
+
+
+""" Tests for memorize.tag_tree.membership.
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import transaction
+from ZODB.DB import DB
+from ZODB.FileStorage import FileStorage
+from ZODB.POSException import ConflictError
+
+from memorize.tag_tree import TagTree, TaggedObject, Tag
+from memorize.tag_tree.membership import CounterBucket
+
+
+class CounterBucketTest(unittest.TestCase):
+    """ Tests for CounterBucket conflict resolution.
+    """
+
+    def resolve(self, old, committed, new):
+        return CounterBucket()._p_resolveConflict(*[
+            CounterBucket(items).__getstate__()
+            for items in (old, committed, new)])
+
+    def test_resolve(self):
+
+        # Different keys are merged as by IIBucket.
+        self.assertEqual(
+                self.resolve([(1, 1)], [(1, 1), (2, 1)], [(1, 1), (3, 1)]),
+                ((1, 1, 2, 1, 3, 1),))
+        # Changes of the same count are added.
+        self.assertEqual(
+                self.resolve([(1, 2)], [(1, 3)], [(1, 1)]),
+                ((1, 2),))
+        self.assertEqual(
+                self.resolve([(1, 1)], [(1, 2)], [(1, 2)]),
+                ((1, 3),))
+        # Object is added or removed on both sides.
+        self.assertRaises(
+                ConflictError, self.resolve, [], [(1, 1)], [(1, 1)])
+        self.assertRaises(
+                ConflictError, self.resolve, [(1, 2)], [(1, 3)], [])
+        self.assertRaises(
+                ConflictError, self.resolve, [(1, 2)], [(1, 1)], [(1, 1)])
+
+
+class ConcurrentTaggingTest(unittest.TestCase):
+    """ Tests for concurrent changes of TagTree.
+    """
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.database = DB(FileStorage(
+            os.path.join(self.directory, 'data.fs')))
+        connection = self.database.open()
+        tree = connection.root()['tree'] = TagTree()
+        for tag in [u'a.x', u'a.y', u'a.z']:
+            tree.create_tag(Tag(tag))
+        for i in range(1000):
+            obj = TaggedObject()
+            tree.assign(obj)
+            obj.add_tag(Tag(u'a.x'))
+        transaction.commit()
+        connection.close()
+
+    def tearDown(self):
+
+        self.database.close()
+        shutil.rmtree(self.directory)
+
+    def open(self):
+        """ Returns transaction manager and tree of a new connection.
+        """
+
+        manager = transaction.TransactionManager()
+        connection = self.database.open(manager)
+        return manager, connection.root()['tree']
+
+    def test_same_tag(self):
+
+        manager1, tree1 = self.open()
+        manager2, tree2 = self.open()
+        for tree in (tree1, tree2):
+            for object_id in range(1, 21):
+                tree.get_object(object_id)
+        for i in range(5):
+            for tree, first in [(tree1, 1), (tree2, 11)]:
+                obj = tree.get_object(first + i)
+                obj.add_tag(Tag(u'a.y'))
+            manager1.commit()
+            manager2.commit()
+
+        manager, tree = self.open()
+        self.assertEqual(tree.count(Tag(u'a.y')), 10)
+        self.assertEqual(
+                list(tree.get_object_ids(Tag(u'a.y'))),
+                [1, 2, 3, 4, 5, 11, 12, 13, 14, 15])
+
+    def test_same_object(self):
+
+        manager1, tree1 = self.open()
+        manager2, tree2 = self.open()
+        tree1.get_object(500).add_tag(Tag(u'a.y'))
+        tree2.get_object(500).add_tag(Tag(u'a.z'))
+        manager1.commit()
+        manager2.commit()
+
+        manager, tree = self.open()
+        self.assertEqual(
+                tree.get_tag_node(Tag(u'a')).get_object_ids()[500], 3)
+        self.assertEqual(tree.count(Tag(u'a')), 1000)
+        self.assertEqual(
+                tree.get_object(500).get_tag_list(),
+                [Tag(u'a.x'), Tag(u'a.y'), Tag(u'a.z')])
@@ -0,0 +1,96 @@
+#!/usr/bin/python
+
+
+""" Tests for memorize.tag_tree.query.
+"""
+
+
+import unittest
+
+from BTrees.IIBTree import IISet, IIBTree
+
+from memorize.tag_tree import Tag, TaggedObject, TagTree
+from memorize.tag_tree.query import intersect, Query, compile_query
+from memorize.tag_tree.exceptions import QuerySyntaxError
+
+
+class IntersectTest(unittest.TestCase):
+    """ Tests for intersect.
+    """
+
+    def test_intersect(self):
+
+        self.assertEqual(list(intersect([])), [])
+        self.assertEqual(list(intersect([IISet([3, 1])])), [1, 3])
+        self.assertEqual(
+                list(intersect([
+                    IISet(range(100)),
+                    IIBTree({5: 1, 7: 2, 200: 1}),
+                    IISet([7, 5, 1]),
+                    ])),
+                [5, 7])
+        self.assertEqual(
+                list(intersect([IISet([1]), IISet([2]), IISet([1, 2])])),
+                [])
+
+
+class QueryTest(unittest.TestCase):
+    """ Tests for Query.
+    """
+
+    def test_parsing(self):
+
+        self.assertEqual(unicode(Query(u'a')), u'a')
+        self.assertEqual(unicode(Query(u' a.b  c ')), u'(a.b & c)')
+        self.assertEqual(
+                unicode(Query(u'a | b & !c | !(d | e.*)')),
+                u'(a | (b & !c) | !(d | e.*))')
+        self.assertEqual(unicode(Query(u'!!a')), u'!!a')
+
+        for expression in [
+                u'', u'a &', u'(a', u'a)', u'| a', u'a..b', u'a.', u'!']:
+            self.assertRaises(QuerySyntaxError, Query, expression)
+
+        self.assertIs(compile_query(u'a b'), compile_query(u'a b'))
+
+    def test_evaluation(self):
+
+        tree = TagTree()
+        for tag in [u'a.b.c', u'a.b.d', u'a.e.d', u'h']:
+            tree.create_tag(Tag(tag))
+        objects = [TaggedObject() for i in range(6)]
+        for obj in objects:
+            tree.assign(obj)
+        for i, tag in [
+                (0, u'a'), (1, u'a.b.c'), (2, u'a.b.d'), (3, u'a.e.d'),
+                (4, u'h'), (1, u'h')]:
+            objects[i].add_tag(Tag(tag))
+
+        def ids(expression):
+            return sorted([
+                obj.get_id()
+                for obj in tree.get_objects(compile_query(expression))])
+
+        self.assertEqual(ids(u'a'), [1, 2, 3, 4])
+        self.assertEqual(ids(u'a & h'), [2])
+        self.assertEqual(ids(u'a.b | h'), [2, 3, 5])
+        self.assertEqual(ids(u'a & !a.b'), [1, 4])
+        self.assertEqual(ids(u'!a'), [5, 6])
+        self.assertEqual(ids(u'!a & !h'), [6])
+        self.assertEqual(ids(u'a.*.d'), [3, 4])
+        self.assertEqual(ids(u'*.*.d | *.*.c'), [2, 3, 4])
+        self.assertEqual(ids(u'a.*.x'), [])
+        self.assertEqual(ids(u'(a.b.c | a.e) & !h'), [4])
+        self.assertEqual(
+                sorted([
+                    obj.get_id() for obj in tree.get_objects(
+                        compile_query(u'a | h'),
+                        lambda obj: obj.get_id() > 3)]),
+                [4, 5])
+
+        # Unknown tag matches no objects.
+        self.assertEqual(ids(u'x'), [])
+        self.assertEqual(ids(u'a.b | x'), [2, 3])
+        self.assertEqual(ids(u'a & x'), [])
+        self.assertEqual(ids(u'!x'), [1, 2, 3, 4, 5, 6])
+        self.assertEqual(ids(u'h & !a.x'), [2, 5])
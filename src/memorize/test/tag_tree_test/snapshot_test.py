@@ -0,0 +1,113 @@
+#!/usr/bin/python
+
+
+""" Tests for memorize.tag_tree.snapshot.
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import transaction
+from ZODB.DB import DB
+from ZODB.FileStorage import FileStorage
+
+from memorize.entry import Entry
+from memorize.tag_tree import TagTree, Tag
+from memorize.tag_tree.snapshot import (
+        Snapshot, write_snapshot, load_snapshot, TAGS_FIELD, MISSING)
+
+
+def create_entry(record):
+    return Entry(record, exclude=(TAGS_FIELD,))
+
+
+class SnapshotTest(unittest.TestCase):
+    """ Tests for writing and loading snapshots.
+    """
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'deck.snapshot')
+        self.tree = TagTree()
+        for tag in [u'de.nouns', u'de.verbs.irregular', u'empty.tag']:
+            self.tree.create_tag(Tag(tag))
+        records = [
+                ({u'value': u'Haus', u'level': 1}, [u'de.nouns']),
+                ({u'value': u'M\xe4dchen'}, [u'de.nouns', u'de']),
+                ({u'value': u'gehen', u'level': 1},
+                 [u'de.verbs.irregular']),
+                ({u'value': u'sein', u'level': 2}, []),
+                ]
+        for record, tags in records:
+            entry = Entry(record)
+            self.tree.assign(entry)
+            for tag in tags:
+                entry.add_tag(Tag(tag))
+
+    def tearDown(self):
+
+        shutil.rmtree(self.directory)
+
+    def test_columns(self):
+
+        self.assertEqual(write_snapshot(self.tree, self.path), 4)
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual(snapshot.object_count, 4)
+            self.assertEqual(
+                    snapshot.get_tags(),
+                    [Tag(u'de'), Tag(u'empty'), Tag(u'de.nouns'),
+                     Tag(u'de.verbs'), Tag(u'empty.tag'),
+                     Tag(u'de.verbs.irregular')])
+            self.assertEqual(
+                    list(snapshot.read_column('tag_starts')),
+                    [0, 1, 3, 4, 4])
+            self.assertEqual(
+                    list(snapshot.read_column('object_ids', 1, 3)), [2, 3])
+            self.assertIn(MISSING, snapshot.read_column('field_values'))
+            records = list(snapshot.iter_records(chunk_size=3))
+        self.assertEqual(records[1], {
+            u'value': u'M\xe4dchen',
+            TAGS_FIELD: [Tag(u'de'), Tag(u'de.nouns')]})
+        self.assertEqual(records[3], {
+            u'value': u'sein', u'level': 2, TAGS_FIELD: []})
+
+    def test_load(self):
+
+        write_snapshot(self.tree, self.path)
+        database = DB(FileStorage(os.path.join(self.directory, 'data.fs')))
+        try:
+            connection = database.open()
+            tree = connection.root()['tree'] = TagTree()
+            self.assertEqual(
+                    load_snapshot(
+                        self.path, tree, create_entry, chunk_size=2,
+                        commit_size=2),
+                    4)
+            transaction.commit()
+            self.assertEqual(tree.count(Tag(u'de')), 3)
+            self.assertEqual(tree.count(Tag(u'empty.tag')), 0)
+            self.assertEqual(
+                    sorted([
+                        (entry.value, entry.get_tag_list())
+                        for entry in tree.get_objects(Tag(u'de'))]),
+                    [(u'Haus', [Tag(u'de.nouns')]),
+                     (u'M\xe4dchen', [Tag(u'de'), Tag(u'de.nouns')]),
+                     (u'gehen', [Tag(u'de.verbs.irregular')])])
+            self.assertEqual(
+                    sorted([
+                        entry.as_record() for entry in
+                        tree.get_objects(Tag(u'de.verbs'))]),
+                    [{u'value': u'gehen', u'level': 1}])
+            connection.close()
+        finally:
+            database.close()
+
+    def test_invalid_file(self):
+
+        with open(self.path, 'wb') as stream:
+            stream.write('x' * 64)
+        self.assertRaises(ValueError, Snapshot, self.path)
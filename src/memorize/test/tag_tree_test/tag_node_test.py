@@ -59,3 +59,50 @@ class TagNodeTest(unittest.TestCase):
         self.assertIs(o1, root.get_object(1))
         root.remove_object(o1)
         root.remove_object(2)
+
+    def test_subtree_objects(self):
+
+        root = TagNode(name=None)
+        a = root.create_child_node(u'a')
+        b = a.create_child_node(u'b')
+        c = a.create_child_node(u'c')
+
+        class A(TaggedObject):
+
+            def __init__(self, unique_id):
+                self._id = unique_id
+
+            def get_id(self):
+                return self._id
+
+        o1 = A(1)
+        o2 = A(2)
+
+        b.add_object(o1)
+        c.add_object(o1)
+        c.add_object(o2)
+        self.assertEqual(
+                list(root.get_object_ids().items()), [(1, 2), (2, 1)])
+        self.assertEqual(list(a.get_object_ids().items()), [(1, 2), (2, 1)])
+        self.assertEqual(list(b.get_object_ids().keys()), [1])
+        self.assertEqual(list(c.get_object_ids().keys()), [1, 2])
+        self.assertEqual(
+                sorted(a.get_object_dict(None, lambda x: True).keys()),
+                [1, 2])
+
+        c.remove_object(o1)
+        self.assertEqual(list(a.get_object_ids().items()), [(1, 1), (2, 1)])
+        self.assertEqual(list(c.get_object_ids().keys()), [2])
+
+        c.remove_object(2)
+        self.assertEqual(list(root.get_object_ids().keys()), [1])
+        self.assertEqual(len(c.get_object_ids()), 0)
+
+    def test_path(self):
+
+        root = TagNode(name=None)
+        a = root.create_child_node(u'a')
+        b = a.create_child_node(u'b')
+        self.assertEqual(root.get_path(), ())
+        self.assertEqual(b.get_path(), (u'a', u'b'))
+        self.assertIs(b.get_tag(), Tag(u'a.b'))
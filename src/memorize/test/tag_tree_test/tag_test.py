@@ -81,3 +81,38 @@ class TagsListTest(unittest.TestCase):
         self.assertEqual(
                 list(u),
                 [Tag(u'a.b'), Tag(u'a.c'), Tag(u'a.b.c')])
+
+
+class TagInterningTest(unittest.TestCase):
+    """ Tests for Tag immutability and interning.
+    """
+
+    def test_interning(self):
+
+        import pickle
+
+        a = Tag(u'a.b')
+        self.assertIs(a, Tag(u'a.b'))
+        self.assertIs(a, Tag([u'a', u'b']))
+        self.assertIs(a, Tag((u'a', u'b')))
+        self.assertIs(a, Tag(a))
+        self.assertIs(a, Tag(u'a/b', re_separator=u'/'))
+        self.assertIs(a.as_tuple(), a.as_tuple())
+        self.assertIsNot(a, Tag(u'a.b', separator=u'/'))
+        self.assertEqual(a, Tag(u'a.b', separator=u'/'))
+        self.assertEqual(Tag(u'a.b', separator=u'/').as_unicode(), u'a/b')
+
+        self.assertEqual(len(set([a, Tag(u'a.b'), Tag(u'a')])), 2)
+        self.assertEqual({a: 1}[Tag([u'a', u'b'])], 1)
+        self.assertEqual(len(a), 2)
+        self.assertFalse(a == u'a.b')
+        self.assertTrue(a != u'a.b')
+
+        self.assertRaises(AttributeError, setattr, a, 'separator', u'/')
+        self.assertRaises(AttributeError, setattr, a, 'levels', [u'c'])
+        self.assertRaises(AttributeError, setattr, a, 'other', 1)
+        a.levels.append(u'c')
+        self.assertEqual(a.as_tuple(), (u'a', u'b'))
+
+        self.assertIs(pickle.loads(pickle.dumps(a, 2)), a)
+        self.assertIs(pickle.loads(pickle.dumps(a)), a)
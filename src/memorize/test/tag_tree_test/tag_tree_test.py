@@ -9,6 +9,7 @@ import unittest
 
 
 from memorize.tag_tree import Tag, TagList, TaggedObject, TagTree
+from memorize.tag_tree import compile_query
 from memorize.tag_tree.tag_node import TagNode
 from memorize.tag_tree.exceptions import IntegrityError
 
@@ -59,6 +60,11 @@ class TagTreeTest(unittest.TestCase):
         self.assertTrue(objects[6].has_tag(Tag(u'a.e')))
         self.assertTrue(objects[6].has_tag(Tag(u'a')))
         self.assertFalse(objects[6].has_tag(Tag(u'b')))
+        self.assertFalse(objects[6].has_tag(Tag(u'a.e.g.a')))
+        self.assertFalse(objects[6].has_tag(Tag(u'a.e.f')))
+        self.assertFalse(objects[6].has_tag(Tag(u'a.d')))
+        self.assertFalse(objects[8].has_tag(Tag(u'a.b.c.d.e')))
+        self.assertTrue(objects[8].has_tag(Tag(u'a.b')))
 
         self.assertEqual(
                 sorted([
@@ -90,11 +96,317 @@ class TagTreeTest(unittest.TestCase):
                   o.get_id()
                   for o in tree.get_objects(TagList([u'a.b.c', u'a.e']))]),
               [9])
+        self.assertEqual(
+              list(tree.get_object_ids(TagList([u'a', u'a.e', u'a.e.f']))),
+              [6, 9])
+        self.assertEqual(
+              list(tree.get_object_ids(TagList([u'h', u'a.b']))), [])
 
         self.assertEquals(
                 sorted([unicode(tag) for tag in objects[8].get_tag_list()]),
                 [u'a.b.c.d', u'a.e.f'])
+        self.assertEqual(
+                list(tree.get_tag_node(Tag(u'a.e')).get_object_ids()),
+                [5, 6, 7, 9])
         tree.delete_tag(Tag(u'a.e'))
         self.assertEquals(
                 sorted([unicode(tag) for tag in objects[8].get_tag_list()]),
                 [u'a.b.c.d'])
+        self.assertEqual(
+                list(tree.get_tag_node(Tag(u'a')).get_object_ids()),
+                [1, 2, 3, 4, 9])
+        object_ids = tree.get_tag_node(Tag(u'a')).get_object_ids()
+        self.assertEqual(list(object_ids.values()), [1, 1, 1, 1, 1])
+
+    def test_count(self):
+
+        tree = TagTree()
+        for tag in [u'a.b.c', u'a.b.d', u'a.e', u'h']:
+            tree.create_tag(Tag(tag))
+        objects = [TaggedObject() for i in range(5)]
+        for obj in objects:
+            tree.assign(obj)
+        for i, tag in [
+                (0, u'a.b.c'), (0, u'a.b.d'), (1, u'a.b.c'), (2, u'a.e'),
+                (3, u'h'), (3, u'a')]:
+            objects[i].add_tag(Tag(tag))
+
+        self.assertEqual(tree.count(Tag(u'a')), 4)
+        self.assertEqual(tree.count(Tag(u'a.b')), 2)
+        self.assertEqual(tree.count(TagList(u'a h')), 1)
+        self.assertEqual(tree.count(compile_query(u'a | h')), 4)
+        self.assertEqual(tree.get_root_node().count(), 4)
+        self.assertEqual(
+                tree.get_tag_node(Tag(u'a')).child_counts(),
+                {u'b': 2, u'e': 1})
+        self.assertEqual(
+                tree.get_tag_node(Tag(u'a.b')).child_counts(),
+                {u'c': 2, u'd': 1})
+
+        objects[0].remove_tag(Tag(u'a.b.c'))
+        self.assertEqual(
+                tree.get_tag_node(Tag(u'a.b')).child_counts(),
+                {u'c': 1, u'd': 1})
+        self.assertEqual(tree.count(Tag(u'a.b')), 2)
+        objects[4].add_tag(Tag(u'a.b.d'))
+        self.assertEqual(tree.count(Tag(u'a.b')), 3)
+        self.assertEqual(tree.count(Tag(u'a')), 5)
+
+        tree.delete_tag(Tag(u'a.b'))
+        self.assertEqual(
+                tree.get_tag_node(Tag(u'a')).child_counts(), {u'e': 1})
+        self.assertEqual(tree.count(Tag(u'a')), 2)
+        self.assertEqual(
+                tree.get_root_node().child_counts(), {u'a': 2, u'h': 1})
+        self.assertEqual(tree.get_root_node().count(), 2)
+
+    def test_iter_objects(self):
+
+        import transaction
+        from ZODB.DB import DB
+
+        database = DB(None)
+        connection = database.open()
+        tree = connection.root()['tree'] = TagTree()
+        tree.create_tag(Tag(u'a.b'))
+        for i in range(50):
+            obj = TaggedObject()
+            tree.assign(obj)
+            obj.add_tag(Tag(u'a.b' if i % 2 else u'a'))
+        transaction.commit()
+
+        connection2 = database.open()
+        tree = connection2.root()['tree']
+
+        objects = list(tree.iter_objects(Tag(u'a'), limit=3))
+        # Neither returned, nor skipped objects were activated.
+        self.assertEqual(
+                [obj._p_changed for obj in tree.iter_objects(Tag(u'a'))],
+                [None] * 50)
+        self.assertEqual([obj.get_id() for obj in objects], [1, 2, 3])
+        self.assertEqual(
+                [obj.get_id() for obj in tree.get_objects(
+                    Tag(u'a.b'), offset=2, limit=2)],
+                [6, 8])
+        self.assertEqual(
+                [obj.get_id() for obj in tree.get_objects(
+                    Tag(u'a.b'), lambda obj: obj.get_id() > 40, offset=1)],
+                [44, 46, 48, 50])
+        self.assertEqual(len(tree.get_objects(Tag(u'a'), offset=45)), 5)
+        self.assertEqual(len(tree.get_objects(Tag(u'a'), limit=0)), 0)
+        transaction.abort()
+        database.close()
+
+    def test_change_tags_during_iteration(self):
+
+        tree = TagTree()
+        tree.create_tag(Tag(u'a.b'))
+        for i in range(1200):
+            obj = TaggedObject()
+            tree.assign(obj)
+            obj.add_tag(Tag(u'a'))
+        for obj in tree.iter_objects(Tag(u'a'), copy=True):
+            obj.remove_tag(Tag(u'a'))
+            obj.add_tag(Tag(u'a.b'))
+        self.assertEqual(tree.count(Tag(u'a.b')), 1200)
+        for obj in tree.iter_objects(Tag(u'a.b'), copy=True):
+            obj.remove_tag(Tag(u'a.b'))
+        self.assertEqual(tree.count(Tag(u'a')), 0)
+
+    def test_iter_objects_reads_ids_lazily(self):
+
+        import transaction
+        from ZODB.DB import DB
+        from ZODB.MappingStorage import MappingStorage
+        from memorize.instrumentation import InstrumentedStorage, Stats
+
+        stats = Stats()
+        database = DB(InstrumentedStorage(MappingStorage(), stats))
+        connection = database.open()
+        tree = connection.root()['tree'] = TagTree()
+        tree.create_tag(Tag(u'a'))
+        for i in range(6000):
+            obj = TaggedObject()
+            tree.assign(obj)
+            obj.add_tag(Tag(u'a'))
+        transaction.commit()
+
+        def count_loads(copy):
+            connection.cacheMinimize()
+            tree.get_tag_node(Tag(u'a')).get_object_ids()._p_activate()
+            loads = stats.loads
+            objects = list(tree.iter_objects(Tag(u'a'), limit=1, copy=copy))
+            self.assertEqual(objects[0].get_id(), 1)
+            return stats.loads - loads
+
+        self.assertTrue(count_loads(False) * 5 < count_loads(True))
+        connection.close()
+        database.close()
+
+    def test_delete_tag_in_chunks(self):
+
+        import transaction
+        from ZODB.DB import DB
+
+        database = DB(None)
+        connection = database.open()
+        tree = connection.root()['tree'] = TagTree()
+        for tag in [u'a.b.c', u'a.d']:
+            tree.create_tag(Tag(tag))
+        objects = [TaggedObject() for i in range(25)]
+        for i, obj in enumerate(objects):
+            tree.assign(obj)
+            obj.add_tag(Tag(u'a.b'))
+            if i % 5 == 0:
+                obj.add_tag(Tag(u'a.b.c'))
+            if i % 2 == 0:
+                obj.add_tag(Tag(u'a.d'))
+        transaction.commit()
+
+        calls = []
+        tree.delete_tag(
+                Tag(u'a.b'), chunk_size=10,
+                progress=lambda done, total: calls.append((done, total)))
+        self.assertEqual(calls, [(10, 25), (20, 25), (25, 25)])
+        self.assertEqual(tree.get_root_node().child_counts(), {u'a': 13})
+        self.assertEqual(tree.count(Tag(u'a')), 13)
+        self.assertEqual(
+                [unicode(tag) for tag in objects[0].get_tag_list()],
+                [u'a.d'])
+        self.assertEqual(objects[1].get_tag_list(), [])
+        self.assertFalse(objects[5].has_tag(Tag(u'a.b')))
+        self.assertRaises(KeyError, tree.get_tag_node, Tag(u'a.b'))
+        transaction.commit()
+
+        connection2 = database.open()
+        tree = connection2.root()['tree']
+        self.assertEqual(tree.count(Tag(u'a')), 13)
+        self.assertEqual(tree.get_object(1).get_tag_list(), [Tag(u'a.d')])
+        transaction.abort()
+        database.close()
+
+    def test_delete_tag_with_connection_manager(self):
+
+        from ZODB.DB import DB
+        from memorize.db import ConnectionManager
+
+        manager = ConnectionManager(DB(None))
+        connection = manager.open()
+        tree = connection.root()['tree'] = TagTree()
+        tree.create_tag(Tag(u'a.b'))
+        for i in range(5):
+            obj = TaggedObject()
+            tree.assign(obj)
+            obj.add_tag(Tag(u'a.b'))
+        transaction_manager = connection.transaction_manager
+        transaction_manager.commit()
+
+        savepoints = []
+        savepoint = transaction_manager.savepoint
+
+        def record_savepoint(optimistic=False):
+            savepoints.append(optimistic)
+            return savepoint(optimistic)
+
+        # Savepoints are made in transaction of connection.
+        transaction_manager.savepoint = record_savepoint
+        try:
+            tree.delete_tag(Tag(u'a'), chunk_size=2)
+        finally:
+            del transaction_manager.savepoint
+        self.assertEqual(savepoints, [True, True, True])
+        transaction_manager.commit()
+        connection.close()
+
+        with manager.transaction() as root:
+            self.assertEqual(root['tree'].count_tags(), 0)
+        manager.close()
+
+    def test_move_tag(self):
+
+        tree = TagTree()
+        for tag in [u'a.b.c', u'a.d', u'h']:
+            tree.create_tag(Tag(tag))
+        objects = [TaggedObject() for i in range(4)]
+        for obj in objects:
+            tree.assign(obj)
+        for i, tag in [
+                (0, u'a.b'), (0, u'a.b.c'), (1, u'a.b.c'), (1, u'a.d'),
+                (2, u'a.d'), (3, u'h')]:
+            objects[i].add_tag(Tag(tag))
+
+        tree.rename_tag(Tag(u'a.b'), u'x')
+        self.assertRaises(KeyError, tree.get_tag_node, Tag(u'a.b'))
+        self.assertEqual(
+                tree.get_tag_node(Tag(u'a.x.c')).get_tag(), Tag(u'a.x.c'))
+        self.assertEqual(
+                list(tree.get_object_ids(Tag(u'a.x.c'))), [1, 2])
+        self.assertEqual(
+                sorted(unicode(tag) for tag in objects[0].get_tag_list()),
+                [u'a.x', u'a.x.c'])
+        self.assertTrue(objects[1].has_tag(Tag(u'a.x')))
+        self.assertEqual(tree.count(Tag(u'a')), 3)
+
+        tree.move_tag(Tag(u'a.x'), Tag(u'h.y.z'))
+        self.assertEqual(
+                tree.get_root_node().child_counts(), {u'a': 2, u'h': 3})
+        self.assertEqual(
+                list(tree.get_tag_node(Tag(u'a')).get_object_ids().items()),
+                [(2, 1), (3, 1)])
+        self.assertEqual(
+                list(tree.get_tag_node(Tag(u'h')).get_object_ids().items()),
+                [(1, 2), (2, 1), (4, 1)])
+        self.assertEqual(
+                sorted(unicode(tag) for tag in objects[1].get_tag_list()),
+                [u'a.d', u'h.y.z.c'])
+        objects[0].remove_tag(Tag(u'h.y.z.c'))
+        self.assertEqual(tree.count(Tag(u'h.y.z.c')), 1)
+
+        self.assertRaises(
+                IntegrityError, tree.move_tag, Tag(u'h.y'), Tag(u'h.y.z.w'))
+        self.assertRaises(KeyError, tree.move_tag, Tag(u'a.d'), Tag(u'h.y'))
+        # Rejected move does not create missing ancestors.
+        self.assertRaises(
+                IntegrityError, tree.move_tag, Tag(u'h.y'), Tag(u'h.y.q.r'))
+        self.assertFalse(
+                tree.get_tag_node(Tag(u'h.y')).has_child_node(u'q'))
+
+    def test_node_ids(self):
+
+        import transaction
+        from ZODB.DB import DB
+
+        database = DB(None)
+        connection = database.open()
+        tree = connection.root()['tree'] = TagTree()
+        tree.create_tag(Tag(u'a.b.c'))
+        obj = TaggedObject()
+        tree.assign(obj)
+        obj.add_tag(Tag(u'a.b.c'))
+        obj.add_tag(Tag(u'a'))
+        node = tree.get_tag_node(Tag(u'a.b.c'))
+        self.assertIs(tree.get_node(node.get_id()), node)
+        self.assertEqual(tree.get_root_node().get_id(), 0)
+        self.assertEqual(
+                sorted(obj._tags),
+                sorted([
+                    node.get_id(), tree.get_tag_node(Tag(u'a')).get_id()]))
+        transaction.commit()
+
+        # Moving tag does not change tagged objects.
+        tree.move_tag(Tag(u'a.b'), Tag(u'x'))
+        self.assertFalse(obj._p_changed)
+        self.assertEqual(obj.get_tag_list(), [Tag(u'a'), Tag(u'x.c')])
+        self.assertTrue(obj.has_tag(Tag(u'x')))
+        self.assertFalse(obj.has_tag(Tag(u'a.b')))
+        transaction.commit()
+
+        tree.delete_tag(Tag(u'x'))
+        self.assertRaises(KeyError, tree.get_node, node.get_id())
+        self.assertEqual(obj.get_tag_list(), [Tag(u'a')])
+        # Ids of deleted nodes are not reused.
+        tree.create_tag(Tag(u'y'))
+        self.assertTrue(
+                tree.get_tag_node(Tag(u'y')).get_id() > node.get_id())
+        transaction.abort()
+        database.close()
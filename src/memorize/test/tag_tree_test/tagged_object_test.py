@@ -46,6 +46,12 @@ class TaggedObjectTest(unittest.TestCase):
             """ Dummy TagNode.
             """
 
+            def get_id(self):
+                return 7
+
+            def get_tag(self):
+                return Tag(u'a.b')
+
             def add_object(self, obj):
                 pass
 
@@ -62,6 +68,10 @@ class TaggedObjectTest(unittest.TestCase):
                 DummyTree.parent.assertEqual(tag, Tag(u'a.b'))
                 return DummyNode()
 
+            def get_node(self, node_id):
+                DummyTree.parent.assertEqual(node_id, 7)
+                return DummyNode()
+
         tree = DummyTree()
         o = TaggedObject()
         o.initialize(1, tree)
@@ -69,6 +79,7 @@ class TaggedObjectTest(unittest.TestCase):
         self.assertEqual(o.get_id(), 1)
         o.add_tag(Tag([u'a', u'b']))
         self.assertRaises(KeyError, o.add_tag, Tag([u'a', u'b']))
+        self.assertEqual(list(o._tags), [7])
         self.assertEqual(o.get_tag_list(), [Tag(u'a.b')])
         o.remove_tag(Tag([u'a', u'b']))
         self.assertRaises(KeyError, o.remove_tag, Tag([u'a', u'b']))
@@ -0,0 +1,52 @@
+#!/usr/bin/python
+# -*- encoding: utf-8 -*-
+
+
+""" Tests for memorize.text.
+"""
+
+
+import unittest
+
+
+from memorize.text import normalize, trigrams, similarity, distance, matches
+
+
+class TextTest(unittest.TestCase):
+    """ Tests for text functions.
+    """
+
+    def test_normalize(self):
+
+        self.assertEqual(normalize(u'Über\tÖl  '), u'ueber oel')
+        self.assertEqual(normalize(u'Über', fold_umlauts=False), u'uber')
+        self.assertEqual(normalize(u'café'), u'cafe')
+        self.assertEqual(normalize(u''), u'')
+
+    def test_similarity(self):
+
+        self.assertEqual(trigrams(u''), set([u'  ']) - set([u'  ']))
+        self.assertEqual(trigrams(u'a'), set([u' a ']))
+        self.assertEqual(similarity(u'Straße', u'strasse'), 1.0)
+        self.assertEqual(similarity(u'abc', u'xyz'), 0.0)
+        self.assertTrue(
+                similarity(u'verstehen', u'verstehn') >
+                similarity(u'verstehen', u'vergehen'))
+
+    def test_matching(self):
+
+        self.assertEqual(distance(u'', u'abc'), 3)
+        self.assertEqual(distance(u'kitten', u'sitting'), 3)
+        self.assertEqual(distance(u'ab', u'ba'), 1)
+        self.assertEqual(distance(u'abc', u'abc'), 0)
+
+        self.assertTrue(matches(u'  Haus', u'haus'))
+        self.assertFalse(matches(u'Hau', u'Haus', max_distance=0))
+        self.assertTrue(matches(u'Hau', u'Haus'))
+        self.assertFalse(matches(u'Ei', u'Eis'))
+        self.assertTrue(matches(u'Mueller', u'Müller'))
+        self.assertFalse(matches(
+                u'Mueller', u'Müller', max_distance=0, fold_umlauts=False))
+        self.assertTrue(matches(u'verstehn', u'verstehen'))
+        self.assertTrue(matches(u'vesrtehn', u'verstehen'))
+        self.assertFalse(matches(u'vergessen', u'verstehen'))
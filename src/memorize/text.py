@@ -0,0 +1,142 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+
+""" Text normalization and fuzzy comparison of words.
+
+Words are compared after normalization, which lowercases them, folds
+German umlauts and removes other accents:
+
+>>> print normalize(u'  M\\xe4dchen  Stra\\xdfe ')
+maedchen strasse
+>>> print normalize(u'M\\xe4dchen', fold_umlauts=False)
+madchen
+
+Similarity of words is measured by their common trigrams:
+
+>>> sorted(trigrams(u'haus'))
+[u' ha', u'aus', u'hau', u'us ']
+>>> similarity(u'Haus', u'Haus')
+1.0
+>>> similarity(u'Haus', u'Maus')
+0.5
+
+Answers are matched tolerating typos, number of which depends on length
+of expected answer:
+
+>>> matches(u'Madchen', u'M\\xe4dchen')
+True
+>>> matches(u'Maedhcen', u'M\\xe4dchen')
+True
+>>> matches(u'Hand', u'Haus')
+False
+
+"""
+
+
+import re
+import unicodedata
+
+
+UMLAUTS = {
+    u'ä': u'ae',
+    u'ö': u'oe',
+    u'ü': u'ue',
+    u'ß': u'ss',
+    }
+UMLAUTS_RE = re.compile(u'|'.join(UMLAUTS), flags=re.UNICODE)
+WHITESPACE_RE = re.compile(ur'\s+', flags=re.UNICODE)
+
+
+def normalize(text, fold_umlauts=True):
+    """ Returns lowercased ``text`` without accents and with collapsed
+    whitespace. If ``fold_umlauts`` is True, German umlauts are
+    replaced by their two letter forms (``ä`` by ``ae``, etc.).
+    """
+
+    text = text.lower()
+    if fold_umlauts:
+        text = UMLAUTS_RE.sub(lambda match: UMLAUTS[match.group(0)], text)
+    text = u''.join([
+        character
+        for character in unicodedata.normalize('NFKD', text)
+        if not unicodedata.combining(character)])
+    return WHITESPACE_RE.sub(u' ', text).strip()
+
+
+def trigrams(text):
+    """ Returns set of trigrams of already normalized ``text``. Text is
+    padded by spaces, so beginning and end of word make own trigrams.
+    """
+
+    text = u' {0} '.format(text)
+    return set([text[i:i + 3] for i in range(len(text) - 2)])
+
+
+def dice(common, count1, count2):
+    """ Returns Dice coefficient of two sets of sizes ``count1`` and
+    ``count2`` with ``common`` common elements.
+    """
+
+    if count1 + count2 == 0:
+        return 1.0
+    return 2.0 * common / (count1 + count2)
+
+
+def similarity(text1, text2, fold_umlauts=True):
+    """ Returns trigram similarity of two texts (from 0.0 to 1.0).
+    """
+
+    trigrams1 = trigrams(normalize(text1, fold_umlauts))
+    trigrams2 = trigrams(normalize(text2, fold_umlauts))
+    return dice(len(trigrams1 & trigrams2), len(trigrams1), len(trigrams2))
+
+
+def distance(text1, text2):
+    """ Returns Damerau-Levenshtein distance (with adjacent
+    transpositions) between two texts.
+    """
+
+    previous2 = None
+    previous = range(len(text2) + 1)
+    for i, character1 in enumerate(text1):
+        current = [i + 1]
+        for j, character2 in enumerate(text2):
+            cost = min(
+                    previous[j + 1] + 1,
+                    current[j] + 1,
+                    previous[j] + (character1 != character2))
+            if (i > 0 and j > 0 and character1 == text2[j - 1] and
+                    text1[i - 1] == character2):
+                cost = min(cost, previous2[j - 1] + 1)
+            current.append(cost)
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def allowed_typos(text):
+    """ Returns number of typos tolerated in answer, when ``text`` is
+    expected.
+    """
+
+    if len(text) <= 3:
+        return 0
+    elif len(text) <= 7:
+        return 1
+    else:
+        return 2
+
+
+def matches(answer, expected, max_distance=None, fold_umlauts=True):
+    """ Returns True if ``answer`` matches ``expected`` answer with at
+    most ``max_distance`` typos (see :py:func:`allowed_typos` for
+    default) after normalization of both.
+    """
+
+    answer = normalize(answer, fold_umlauts)
+    expected = normalize(expected, fold_umlauts)
+    if max_distance is None:
+        max_distance = allowed_typos(expected)
+    if abs(len(answer) - len(expected)) > max_distance:
+        return False
+    return distance(answer, expected) <= max_distance